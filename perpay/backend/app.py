@@ -1,16 +1,67 @@
 # backend/app.py
+import gzip
+import hashlib
 import os
+import time
 from typing import Any, Dict, List, Optional
 
 import pandas as pd
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
 
-from search import CosineSearch
+import metrics
+from cache import request_key
+from dispatch import Saturated, SearchExecutor
+from recommend import CoPurchase
+from querylog import QueryLog
+from reload import EngineReloader
+from rerank import Reranker
+from search import SEARCH_DEFAULTS, CosineSearch
+from sharded import ShardedSearch
+from utils import dumps
 
 CSV_PATH = os.getenv("CSV_PATH", "/data/product_catalog.csv")
 NAME_COL = os.getenv("NAME_COL", "name")
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "full")   # "full" | "inverted"
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR") or None      # mmap-able index snapshots
+CATALOG_DIR = os.getenv("CATALOG_DIR") or None        # typed columnar catalog store (catalog_store.py)
+ENCODE_CACHE_SIZE = int(os.getenv("ENCODE_CACHE_SIZE", "4096"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+PAGE_CACHE_MB = float(os.getenv("PAGE_CACHE_MB", "64"))       # ranked arrays behind /search cursors
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "600"))
+PAGE_DEPTH = int(os.getenv("PAGE_DEPTH", "1000"))             # rows ranked for paging
+DENSE_INDEX = os.getenv("DENSE_INDEX", "0") == "1"      # LSA + IVF for engine="hybrid"
+DENSE_DIM = int(os.getenv("DENSE_DIM", "128"))
+DENSE_LISTS = int(os.getenv("DENSE_LISTS", "0")) or None  # 0 = ~sqrt(rows)
+DENSE_PROBES = int(os.getenv("DENSE_PROBES", "8"))
+DENSE_WEIGHT = float(os.getenv("DENSE_WEIGHT", "0.3"))
+SEARCH_SHARDS = int(os.getenv("SEARCH_SHARDS", "0"))   # >1: score on N worker processes
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "0")) or min(4, os.cpu_count() or 1)  # scoring threads
+SEARCH_QUEUE = int(os.getenv("SEARCH_QUEUE", "32"))     # admitted beyond the workers; then 503
+SPELL_CORRECT = os.getenv("SPELL_CORRECT", "1") == "1"  # fix out-of-vocabulary query words
+VECTORIZER = os.getenv("VECTORIZER", "exact")           # "exact" | "hashed" (bounded-memory, hashing.py)
+HASH_FEATURES = int(os.getenv("HASH_FEATURES", str(1 << 20)))  # hash buckets per text block
+ORDERS_PATHS = [p for p in os.getenv("ORDERS_PATH", "/data/user_order_history.csv").split(",") if p]
+RECO_NEIGHBORS = int(os.getenv("RECO_NEIGHBORS", "50"))  # co-purchase neighbours kept per product
+RECO_STATE = os.getenv("RECO_STATE") or (os.path.join(SNAPSHOT_DIR, "copurchase.npz") if SNAPSHOT_DIR else None)
+RETURN_RATES_PATH = os.getenv("RETURN_RATES_PATH", "/data/return_rates.pkl")
+CATALOG_WATCH_SECONDS = float(os.getenv("CATALOG_WATCH_SECONDS", "0"))  # >0: poll CSV_PATH and hot-reload
+RELOAD_WARM_QUERIES = int(os.getenv("RELOAD_WARM_QUERIES", "200"))     # recent /search bodies replayed before a swap
+RELOAD_GRACE_SECONDS = float(os.getenv("RELOAD_GRACE_SECONDS", "30"))  # replaced engine is closed after this
+SIMILAR_NEIGHBORS = int(os.getenv("SIMILAR_NEIGHBORS", "0"))   # >0: build the /similar kNN graph (similar.py)
+SIMILAR_WORKERS = int(os.getenv("SIMILAR_WORKERS", "0")) or None  # graph build processes (0 = one per CPU)
+QUERY_LOG_DIR = os.getenv("QUERY_LOG_DIR") or None       # append-only /search log (querylog.py); unset = off
+QUERY_LOG_MB = float(os.getenv("QUERY_LOG_MB", "16"))    # rotate the log file at this size
+QUERY_LOG_FILES = int(os.getenv("QUERY_LOG_FILES", "4"))  # rotated files kept
+QUERY_LOG_WARM = int(os.getenv("QUERY_LOG_WARM", "500"))  # most frequent logged bodies replayed on load / reload
+QUERY_LOG_WARM_HOURS = float(os.getenv("QUERY_LOG_WARM_HOURS", "24"))  # ... counted over this window
+RERANK_MODEL = os.getenv("RERANK_MODEL") or None         # `python -m rerank train` output; unset = stage 1 only
+RERANK_DEPTH = int(os.getenv("RERANK_DEPTH", "300"))     # stage-1 candidates the model re-orders
+RERANK_RETRIEVE_BUDGET_MS = float(os.getenv("RERANK_RETRIEVE_BUDGET_MS", "50"))  # stage 1 slower: skip stage 2 (0 = no limit)
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "15"))  # stage 2 time; caps its depth (0 = no limit)
 
 app = FastAPI(title="Cosine Similarity Backend")
 
@@ -23,12 +74,126 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    # label by route template (not raw path) to keep the series count bounded
+    route = request.scope.get("route")
+    metrics.HTTP_SECONDS.observe(
+        time.perf_counter() - t0,
+        route=getattr(route, "path", "unmatched"),
+        method=request.method,
+        status=str(response.status_code),
+    )
+    return response
+
+
+def _build_engine():
+    engine_kwargs = dict(
+        name_col=NAME_COL,
+        engine=SEARCH_ENGINE,
+        snapshot_dir=SNAPSHOT_DIR,
+        catalog_dir=CATALOG_DIR,
+        encode_cache_size=ENCODE_CACHE_SIZE,
+        result_cache_size=RESULT_CACHE_SIZE,
+        result_cache_ttl=RESULT_CACHE_TTL,
+        page_cache_bytes=int(PAGE_CACHE_MB * 2**20),
+        page_cache_ttl=PAGE_CACHE_TTL,
+        page_depth=PAGE_DEPTH,
+        spell_correct=SPELL_CORRECT,
+        vectorizer=VECTORIZER,
+        hash_features=HASH_FEATURES,
+        similar_neighbors=SIMILAR_NEIGHBORS,
+        similar_workers=SIMILAR_WORKERS,
+        reranker=reranker,
+    )
+    if SEARCH_SHARDS > 1:
+        return ShardedSearch(CSV_PATH, n_shards=SEARCH_SHARDS, **engine_kwargs)
+    return CosineSearch(
+        CSV_PATH,
+        dense=DENSE_INDEX,
+        dense_dim=DENSE_DIM,
+        dense_lists=DENSE_LISTS,
+        dense_probes=DENSE_PROBES,
+        dense_weight=DENSE_WEIGHT,
+        **engine_kwargs,
+    )
+
+
+def _swap_engine(new_engine) -> None:
+    # one reference assignment; handlers read `engine` once per request
+    global engine, startup_error
+    engine, startup_error = new_engine, ""
+
+
+def _close_engine(old_engine) -> None:
+    if isinstance(old_engine, ShardedSearch):
+        old_engine.close()
+
+
+# Served /search bodies -> rotating log; its most frequent recent bodies warm each new engine
+query_log = None
+if QUERY_LOG_DIR:
+    query_log = QueryLog(
+        QUERY_LOG_DIR,
+        defaults={**SEARCH_DEFAULTS, "engine": None},
+        max_bytes=int(QUERY_LOG_MB * 2**20),
+        keep=QUERY_LOG_FILES,
+    )
+
+
+def _logged_queries() -> List[Dict[str, Any]]:
+    return query_log.top(QUERY_LOG_WARM, QUERY_LOG_WARM_HOURS * 3600) if query_log is not None else []
+
+
+# Co-purchase recommender (/recommend); search keeps working without order history
+recommender = None
+reco_error = ""
+try:
+    recommender = CoPurchase.open(
+        [p for p in ORDERS_PATHS if os.path.exists(p)], RECO_STATE, n_neighbors=RECO_NEIGHBORS
+    )
+except Exception as e:
+    reco_error = str(e)
+
+# Second ranking stage for /search (rerank.py); reads order-history signals from the recommender
+reranker = None
+rerank_error = ""
+if RERANK_MODEL:
+    try:
+        reranker = Reranker.load(
+            RERANK_MODEL, recommender, depth=RERANK_DEPTH,
+            retrieve_budget_ms=RERANK_RETRIEVE_BUDGET_MS, rerank_budget_ms=RERANK_BUDGET_MS,
+        )
+    except Exception as e:
+        rerank_error = str(e)
+
 engine = None
 startup_error = ""
+reloader = EngineReloader(
+    _build_engine,
+    _swap_engine,
+    close=_close_engine,
+    watch_paths=[CSV_PATH, RETURN_RATES_PATH],
+    warm_queries=RELOAD_WARM_QUERIES,
+    grace_s=RELOAD_GRACE_SECONDS,
+    history=_logged_queries,
+)
 try:
-    engine = CosineSearch(CSV_PATH, name_col=NAME_COL)
+    reloader.load()
 except Exception as e:
     startup_error = str(e)
+if CATALOG_WATCH_SECONDS > 0:
+    reloader.watch(CATALOG_WATCH_SECONDS)
+
+executor = SearchExecutor(max_workers=SEARCH_WORKERS, max_queue=SEARCH_QUEUE)
+
+
+def json_response(payload: Any) -> Response:
+    # records are already JSON-native; skip response_model re-validation and encode once
+    return Response(content=dumps(payload), media_type="application/json")
 
 
 class SearchRequest(BaseModel):
@@ -44,10 +209,47 @@ class SearchRequest(BaseModel):
     category_name_2: Optional[str] = None
     category_name_3: Optional[str] = None
     category_any: Optional[str] = None
+    min_price: Optional[float] = Field(None, ge=0.0)   # current_price range, inclusive
+    max_price: Optional[float] = Field(None, ge=0.0)
+    in_stock: bool = False                    # only current_inventory > 0
+    current_status: Optional[str] = None      # e.g. "Enabled" (case-insensitive)
+    engine: Optional[str] = None              # override SEARCH_ENGINE per request
+    n_probes: Optional[int] = Field(None, ge=1)  # hybrid: IVF lists to scan (recall vs latency)
+    rerank: Optional[bool] = None             # second stage (RERANK_MODEL): None = on when loaded, False = off
+    debug_timings: bool = False               # return per-stage latency (ms) with the items
+    facets: bool = False                      # counts per brand / category_name_1..3 / price bucket
+    facet_size: int = Field(20, ge=1, le=1000)  # values per facet (price buckets: all)
+    page_size: Optional[int] = Field(None, ge=1, le=200)  # paging mode: top_k is ignored
+    cursor: Optional[str] = None              # next_cursor of the previous page
 
 
 class SearchResponse(BaseModel):
     items: List[Dict[str, Any]]
+    debug_timings: Optional[Dict[str, float]] = None
+    facets: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    next_cursor: Optional[str] = None
+    corrections: Optional[List[Dict[str, str]]] = None   # [{"from": "hedphones", "to": "headphones"}]
+
+
+class BatchSearchRequest(BaseModel):
+    requests: List[SearchRequest]
+    chunk_size: int = Field(256, ge=1, le=4096)   # queries per sparse product
+
+
+class BatchSearchResponse(BaseModel):
+    results: List[SearchResponse]
+
+
+class RecommendRequest(BaseModel):
+    user_id: Optional[int] = None             # history from the order extracts
+    product_ids: Optional[List[str]] = None   # and/or products in the cart / being viewed
+    top_k: int = Field(10, ge=1, le=100)
+    include_cols: Optional[List[str]] = None
+
+
+class RecommendResponse(BaseModel):
+    items: List[Dict[str, Any]]
+    source: str                               # "co_purchase" | "popular" | "none"
 
 
 # @app.get("/healthz")
@@ -64,20 +266,61 @@ class SearchResponse(BaseModel):
 
 @app.get("/healthz")
 def healthz():
-    if engine is None:
-        return {"status": "degraded", "error": startup_error}
+    eng = engine
+    if eng is None:
+        return {"status": "degraded", "error": startup_error, "catalog": reloader.stats()}
     return {
         "status": "ok",
-        "rows": len(engine.df),
-        "name_col": engine.name_col,
-        "biz_features": engine.biz_feature_names,   # shows ['profitability','return_rate', ...] if found
+        "rows": len(eng.df),
+        "name_col": eng.name_col,
+        "biz_features": eng.biz_feature_names,   # shows ['profitability','return_rate', ...] if found
         "alpha_default": 0.7,
+        "engine": eng.engine,
+        "vectorizer": eng.vectorizer,
+        "snapshot": eng.snapshot_path,
+        "catalog_store": eng.catalog_store.path if eng.catalog_store is not None else None,
+        "cache": eng.cache_stats(),
+        "dense": eng.dense_index.stats() if eng.dense_index is not None else None,
+        "similar": eng.similar_graph.stats() if eng.similar_graph is not None else None,
+        "shards": getattr(eng, "n_shards", 1),
+        "executor": executor.stats(),
+        "recommend": recommender.stats() if recommender is not None else {"error": reco_error},
+        "catalog": reloader.stats(),   # version, build_s, warm_s, built_at, state of the last reload
+        "query_log": query_log.stats() if query_log is not None else None,
+        "rerank": reranker.stats() if reranker is not None else ({"error": rerank_error} if rerank_error else None),
     }
 
-@app.get("/taxonomy")
-def taxonomy():
-    if engine is None:
-        raise HTTPException(status_code=500, detail=f"Engine not ready: {startup_error}")
+@app.on_event("shutdown")
+def stop_shards():
+    reloader.stop()
+    executor.shutdown()
+    if query_log is not None:
+        query_log.close()
+    _close_engine(engine)
+
+
+@app.post("/catalog/reload")
+def catalog_reload():
+    """Rebuild the index from CSV_PATH in the background; it is swapped in once warm."""
+    started = reloader.reload("admin")
+    return {"started": started, **reloader.stats()}
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# Taxonomy body, built once per catalog version: raw + gzip bytes and a content ETag.
+# Each build is a new dict swapped in whole, so a reader never mixes two versions.
+_taxonomy_cache: Dict[str, Any] = {}
+
+
+def _taxonomy_body(engine) -> Dict[str, Any]:
+    global _taxonomy_cache
+    body = _taxonomy_cache
+    if body.get("version") == engine.catalog_version:
+        return body
 
     def uniq(col):
         if col not in engine.df.columns:
@@ -86,30 +329,193 @@ def taxonomy():
             [x for x in engine.df[col].dropna().astype(str).str.strip().unique() if x]
         )
 
-    return {
+    raw = dumps({
         "category_name_1": uniq("category_name_1"),
         "category_name_2": uniq("category_name_2"),
         "category_name_3": uniq("category_name_3"),
         "brand": uniq("brand")[:2000],
+    })
+    body = {
+        "version": engine.catalog_version,
+        "etag": f'"{hashlib.sha256(raw).hexdigest()[:32]}"',
+        "raw": raw,
+        "gzip": gzip.compress(raw, compresslevel=6, mtime=0),
     }
+    _taxonomy_cache = body
+    return body
 
 
-@app.post("/search", response_model=SearchResponse)
-def search(req: SearchRequest):
+@app.get("/taxonomy")
+def taxonomy(request: Request):
+    eng = engine
+    if eng is None:
+        raise HTTPException(status_code=500, detail=f"Engine not ready: {startup_error}")
+    body = _taxonomy_body(eng)
+    headers = {"ETag": body["etag"], "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = [t.strip().removeprefix("W/") for t in request.headers.get("if-none-match", "").split(",")]
+    if body["etag"] in if_none_match or "*" in if_none_match:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=body["gzip"], media_type="application/json", headers=headers)
+    return Response(content=body["raw"], media_type="application/json", headers=headers)
+
+
+@app.get("/suggest")
+def suggest(
+    q: str = "",
+    limit: int = Query(10, ge=1, le=20),
+    types: Optional[str] = None,   # comma-separated subset of brand,category,product
+):
     if engine is None:
         raise HTTPException(status_code=500, detail=f"Engine not ready: {startup_error}")
-    items = engine.search(
-        req.query,
-        pos_terms=req.pos_terms,            # <-- pass the three terms
-        top_k=req.top_k,
-        alpha=req.alpha,
-        biz_weights=req.biz_weights,
-        brand=req.brand,
-        color=req.color,
-        object=req.object,
-        category_name_1=req.category_name_1,
-        category_name_2=req.category_name_2,
-        category_name_3=req.category_name_3,
-        category_any=req.category_any,
-    )
-    return {"items": items}
+    kinds = [t.strip() for t in types.split(",") if t.strip()] if types else None
+    return json_response({"query": q, "suggestions": engine.suggest(q, limit, kinds)})
+
+
+@app.get("/similar/{product_id}")
+def similar(
+    product_id: str,
+    top_k: int = Query(10, ge=1, le=100),
+    alpha: float = Query(0.7, ge=0.0, le=1.0),
+    biz_weights: Optional[str] = None,   # "profitability:0.6,return_rate:-0.4"
+    cols: Optional[str] = None,          # comma-separated include_cols
+):
+    eng = engine
+    if eng is None:
+        raise HTTPException(status_code=500, detail=f"Engine not ready: {startup_error}")
+    if eng.similar_graph is None:
+        raise HTTPException(status_code=500, detail="Similar-products graph not built; set SIMILAR_NEIGHBORS")
+    include_cols = [c.strip() for c in cols.split(",") if c.strip()] if cols else None
+    weights = None
+    if biz_weights:
+        try:
+            weights = {k.strip(): float(v) for k, v in (p.split(":") for p in biz_weights.split(",") if p.strip())}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="biz_weights must look like 'feature:weight,...'")
+    try:
+        items = eng.similar(product_id, top_k=top_k, alpha=alpha, biz_weights=weights, include_cols=include_cols)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    return json_response({"product_id": product_id, "items": items})
+
+
+def _overloaded(e: Saturated) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+FACET_ARGS = (
+    "pos_terms", "brand", "color", "object",
+    "category_name_1", "category_name_2", "category_name_3", "category_any",
+    "min_price", "max_price", "in_stock", "current_status",
+)
+
+
+def _run_search(engine, params: Dict[str, Any], debug: bool, facet_size: Optional[int], page: Optional[Dict[str, Any]]):
+    timings: Optional[Dict[str, float]] = {} if debug else None
+    corrections: List[Dict[str, str]] = []
+    next_cursor = None
+    if page is not None:
+        page_params = {k: v for k, v in params.items() if k != "top_k"}
+        items, next_cursor = engine.search_page(**page_params, **page, timings=timings, corrections=corrections)
+    else:
+        items = engine.search(**params, timings=timings, corrections=corrections)
+    facets = None
+    if facet_size:
+        facets = engine.facets(params["query"], size=facet_size, **{k: params[k] for k in FACET_ARGS})
+    return items, timings, facets, next_cursor, corrections
+
+
+@app.post("/search", response_model=SearchResponse)
+async def search(req: SearchRequest):
+    eng = engine  # this request stays on this index through a hot reload
+    if eng is None:
+        raise HTTPException(status_code=500, detail=f"Engine not ready: {startup_error}")
+    params = req.model_dump(exclude={"debug_timings", "facets", "facet_size", "page_size", "cursor"})
+    facet_size = req.facet_size if req.facets else None
+    page = None
+    if req.page_size is not None or req.cursor is not None:
+        page = {"page_size": req.page_size or req.top_k, "cursor": req.cursor}
+    # identical in-flight bodies share one computation (and, with debug on, its timings)
+    key = request_key({**params, "debug_timings": req.debug_timings, "facet_size": facet_size, "page": page})
+    try:
+        # joins only a computation on the same index: during a swap both versions are live
+        items, timings, facets, next_cursor, corrections = await executor.run(
+            (eng.catalog_version, key), _run_search, eng, params, req.debug_timings, facet_size, page
+        )
+    except Saturated as e:
+        raise _overloaded(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
+        reloader.remember(key, params)
+    if query_log is not None:
+        query_log.append(params)
+    return json_response({
+        "items": items, "debug_timings": timings, "facets": facets,
+        "next_cursor": next_cursor, "corrections": corrections,
+    })
+
+
+# per-query /search fields a batch item cannot honour (it returns items + corrections only)
+BATCH_UNSUPPORTED = ("debug_timings", "facets", "page_size", "cursor")
+
+
+def _run_batch(engine, reqs: List[Dict[str, Any]], chunk_size: int) -> List[Dict[str, Any]]:
+    corrections: List[List[Dict[str, str]]] = []
+    results = engine.search_many(reqs, chunk_size=chunk_size, corrections=corrections)
+    return [{"items": items, "corrections": fixes} for items, fixes in zip(results, corrections)]
+
+
+@app.post("/search/batch", response_model=BatchSearchResponse)
+async def search_batch(req: BatchSearchRequest):
+    eng = engine
+    if eng is None:
+        raise HTTPException(status_code=500, detail=f"Engine not ready: {startup_error}")
+    for i, r in enumerate(req.requests):
+        unsupported = [f for f in BATCH_UNSUPPORTED if getattr(r, f)]
+        if unsupported:
+            raise HTTPException(status_code=400, detail=f"requests[{i}]: {', '.join(unsupported)} not supported in batch")
+    reqs = [r.model_dump(exclude={"debug_timings", "facets", "facet_size", "page_size", "cursor"}) for r in req.requests]
+    try:
+        results = await executor.run(None, _run_batch, eng, reqs, req.chunk_size)
+    except Saturated as e:
+        raise _overloaded(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response({"results": results})
+
+
+@app.post("/recommend", response_model=RecommendResponse)
+def recommend(req: RecommendRequest):
+    if recommender is None:
+        raise HTTPException(status_code=500, detail=f"Recommender not ready: {reco_error}")
+    if req.user_id is None and not req.product_ids:
+        raise HTTPException(status_code=400, detail="Give a user_id and/or product_ids")
+    ids, scores, source = recommender.recommend(req.user_id, req.product_ids or (), top_k=req.top_k)
+    if engine is not None:
+        items = engine.product_records(ids.tolist(), {"score": scores}, req.include_cols)
+    else:
+        items = [{"product_id": str(p), "score": round(float(s), 4)} for p, s in zip(ids, scores)]
+    return json_response({"items": items, "source": source})
+
+
+def _refresh_recommender(paths: List[str]) -> Dict[str, Any]:
+    summary = recommender.update(paths)
+    if RECO_STATE and summary["new_rows"]:
+        recommender.save(RECO_STATE)
+    return {**summary, "version": recommender.version}
+
+
+@app.post("/recommend/refresh")
+async def recommend_refresh():
+    """Fold order lines appended to / added as ORDERS_PATH extracts into the recommender."""
+    if recommender is None:
+        raise HTTPException(status_code=500, detail=f"Recommender not ready: {reco_error}")
+    paths = [p for p in ORDERS_PATHS if os.path.exists(p)]
+    try:
+        return await executor.run("recommend-refresh", _refresh_recommender, paths)
+    except Saturated as e:
+        raise _overloaded(e)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -0,0 +1,8 @@
+# backend/bench/__init__.py
+# Synthetic catalogs + query replay for CosineSearch and the FastAPI app.
+#   python -m bench.run --sizes 10000 100000 --out bench_baseline.json
+#   python -m bench.run --sizes 10000 100000 --compare bench_baseline.json
+from bench.catalog import generate_catalog, generate_return_rates, write_catalog
+from bench.queries import query_mix
+
+__all__ = ["generate_catalog", "generate_return_rates", "write_catalog", "query_mix"]
@@ -0,0 +1,211 @@
+# backend/bench/catalog.py
+# Synthetic catalogs with the same 37 columns as data/product_catalog.csv.
+# The taxonomy (category_name_1..4 + request paths), vendors and per-leaf name vocabulary
+# come from a template catalog; brands, model numbers, prices and demand counters are
+# drawn so that vocabulary, filter selectivity and business features scale like a real
+# catalog instead of repeating the template rows.
+from __future__ import annotations
+
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CATALOG_COLUMNS = [
+    "product_id", "name", "product_added_date", "brand", "current_vendor",
+    "category_name_1", "request_path_1", "category_name_2", "request_path_2",
+    "category_name_3", "request_path_3", "category_name_4", "request_path_4",
+    "product_url", "parent_product_id", "current_price", "current_cost", "current_margin",
+    "current_ship_price", "msrp", "comparable_price", "current_inventory", "current_status",
+    "distinct_users_viewed_30", "distinct_users_viewed_60", "distinct_users_viewed_90",
+    "distinct_users_parent_carted_30", "distinct_users_parent_carted_60", "distinct_users_parent_carted_90",
+    "demand_30_days", "demand_90_days", "catalog_demand_30_days_rank", "catalog_demand_90_days_rank",
+    "revenue_30_days", "revenue_90_days", "catalog_revenue_30_days_rank", "catalog_revenue_90_days_rank",
+]
+
+TAXONOMY_COLS = [
+    "category_name_1", "request_path_1", "category_name_2", "request_path_2",
+    "category_name_3", "request_path_3", "category_name_4", "request_path_4",
+]
+
+DEFAULT_TEMPLATE = os.getenv(
+    "BENCH_TEMPLATE_CSV",
+    os.path.join(os.path.dirname(__file__), "..", "..", "data", "product_catalog.csv"),
+)
+
+COLORS = ["Black", "White", "Red", "Blue", "Navy", "Green", "Pink", "Purple", "Yellow", "Gray", "Silver", "Gold"]
+MODIFIERS = [
+    "Pro", "Max", "Mini", "Plus", "Classic", "Deluxe", "Premium", "Compact", "Wireless", "Portable",
+    "Heavy Duty", "Slim", "Ultra", "Smart", "Outdoor", "Indoor", "Kids", "Women's", "Men's", "Set of 2",
+]
+_SYLLABLES = [
+    "ar", "bel", "co", "dex", "en", "fro", "gal", "hal", "is", "jo", "ka", "lum", "mor", "nex", "or",
+    "pra", "qui", "ro", "sol", "tek", "ul", "vi", "wex", "xa", "yor", "zen",
+]
+_WORD = re.compile(r"[A-Za-z][A-Za-z'&]+")
+
+
+def _load_template(path: Optional[str]) -> pd.DataFrame:
+    path = path or DEFAULT_TEMPLATE
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Template catalog not found: {path} (set BENCH_TEMPLATE_CSV)")
+    return pd.read_csv(path)
+
+
+def _leaves(tpl: pd.DataFrame) -> Tuple[pd.DataFrame, List[List[str]], List[str]]:
+    """Distinct taxonomy paths, each with the name words seen under it, + a global word pool."""
+    cols = [c for c in TAXONOMY_COLS if c in tpl.columns]
+    leaves = tpl[cols].drop_duplicates().reset_index(drop=True)
+    key = tpl[cols].astype(str).agg("|".join, axis=1)
+    leaf_key = leaves.astype(str).agg("|".join, axis=1)
+    global_words: List[str] = []
+    vocab: List[List[str]] = []
+    for k in leaf_key:
+        names = tpl.loc[key == k, "name"].fillna("").astype(str)
+        # drop the "Brand - " prefix the catalog uses
+        words = [w for n in names for w in _WORD.findall(n.split(" - ", 1)[-1]) if len(w) > 2]
+        vocab.append(sorted(set(words)) or ["Item"])
+        global_words.extend(words)
+    return leaves, vocab, sorted(set(global_words))
+
+
+def _brand_names(rng: np.random.Generator, n: int) -> List[str]:
+    out, seen = [], set()
+    while len(out) < n:
+        b = "".join(rng.choice(_SYLLABLES, rng.integers(2, 4))).capitalize()
+        if b not in seen:
+            seen.add(b)
+            out.append(b)
+    return out
+
+
+def _zipf_choice(rng: np.random.Generator, k: int, n: int, a: float = 1.1) -> np.ndarray:
+    """n draws from range(k), rank-frequency ~ 1/r^a (a few leaves/brands dominate)."""
+    p = 1.0 / np.arange(1, k + 1) ** a
+    return rng.choice(k, size=n, p=p / p.sum())
+
+
+def generate_catalog(n: int, *, seed: int = 0, template_csv: Optional[str] = None) -> pd.DataFrame:
+    """`n` synthetic products with the template's 37-column schema."""
+    rng = np.random.default_rng(seed)
+    tpl = _load_template(template_csv)
+    leaves, leaf_vocab, global_words = _leaves(tpl)
+
+    # --- taxonomy + brands (each leaf has its own brand roster, sizes grow with n)
+    leaf = _zipf_choice(rng, len(leaves), n, a=0.8)
+    tpl_brands = tpl["brand"].dropna().astype(str).unique().tolist()
+    brands = tpl_brands + _brand_names(rng, max(50, n // 200))
+    per_leaf = max(5, min(len(brands), n // max(1, len(leaves) * 20)))
+    leaf_brands = [rng.choice(len(brands), per_leaf, replace=False) for _ in range(len(leaves))]
+    brand_rank = _zipf_choice(rng, per_leaf, n)
+    brand = [brands[leaf_brands[l][r]] for l, r in zip(leaf, brand_rank)]
+
+    # --- names: "Brand - <leaf words> [modifier] [color] [model no.]"
+    n_words = rng.integers(2, 6, n)
+    has_mod = rng.random(n) < 0.4
+    has_color = rng.random(n) < 0.35
+    has_model = rng.random(n) < 0.5
+    mods = rng.choice(MODIFIERS, n)
+    colors = rng.choice(COLORS, n)
+    models = rng.integers(10, 10000, n)
+    letters = rng.choice(list("ABCDEFGHJKLMNPRSTVXZ"), n)
+    from_global = rng.random(n) < 0.15
+    names = []
+    for i in range(n):
+        pool = global_words if from_global[i] else leaf_vocab[leaf[i]]
+        parts = [pool[j] for j in rng.choice(len(pool), min(n_words[i], len(pool)), replace=False)]
+        if has_mod[i]:
+            parts.insert(0, mods[i])
+        if has_color[i]:
+            parts.append(colors[i])
+        if has_model[i]:
+            parts.append(f"{letters[i]}{models[i]}")
+        names.append(f"{brand[i]} - {' '.join(parts)}")
+
+    df = pd.DataFrame({"product_id": np.arange(100000, 100000 + n, dtype=np.int64), "name": names})
+    days = rng.integers(0, 12 * 365, n)
+    df["product_added_date"] = (
+        pd.Timestamp("2013-01-01") + pd.to_timedelta(days, unit="D")
+    ).strftime("%-m/%-d/%Y")
+    df["brand"] = brand
+    vendors = tpl["current_vendor"].dropna().astype(str).unique()
+    df["current_vendor"] = vendors[_zipf_choice(rng, len(vendors), n)]
+    for c in TAXONOMY_COLS:
+        df[c] = leaves[c].to_numpy()[leaf] if c in leaves.columns else np.nan
+    df["product_url"] = "https://app.perpay.com/shop/product/" + df["product_id"].astype(str)
+    parent = df["product_id"].to_numpy() - rng.integers(1, 500, n)
+    df["parent_product_id"] = np.where(rng.random(n) < 0.3, parent, np.nan)
+
+    # --- prices (log-normal, ~$10-$5k like the template)
+    price = np.clip(np.round(rng.lognormal(4.8, 1.0, n)) - 0.01, 4.99, 9999.99)
+    cost = np.round(price * rng.uniform(0.35, 0.85, n), 2)
+    df["current_price"] = price
+    df["current_cost"] = cost
+    df["current_margin"] = np.round(price - cost, 2)
+    df["current_ship_price"] = rng.choice([2.99, 9.99, 14.99, 19.99, 29.99, 59.99], n, p=[.1, .2, .35, .2, .1, .05])
+    df["msrp"] = np.where(rng.random(n) < 0.9, np.round(price * rng.uniform(0.8, 1.3, n), 2), np.nan)
+    df["comparable_price"] = np.where(rng.random(n) < 0.3, np.round(price * rng.uniform(0.6, 1.0, n), 2), np.nan)
+    df["current_inventory"] = np.where(rng.random(n) < 0.3, rng.geometric(0.05, n), 0).astype(np.int64)
+    df["current_status"] = np.where(rng.random(n) < 0.15, "Enabled", "Disabled")
+
+    # --- demand: most products are never viewed; popularity is heavy-tailed
+    pop = np.where(rng.random(n) < 0.2, rng.pareto(1.5, n) * 5, 0.0)
+    v30 = rng.poisson(pop)
+    v60 = v30 + rng.poisson(pop)
+    v90 = v60 + rng.poisson(pop)
+    c30 = rng.binomial(v30, 0.07)
+    c60 = c30 + rng.binomial(v60 - v30, 0.07)
+    c90 = c60 + rng.binomial(v90 - v60, 0.07)
+    d30 = np.round(c30 * price * rng.uniform(0.5, 1.0, n), 2)
+    d90 = np.round(c90 * price * rng.uniform(0.5, 1.0, n), 2)
+    for c, v in [
+        ("distinct_users_viewed_30", v30), ("distinct_users_viewed_60", v60), ("distinct_users_viewed_90", v90),
+        ("distinct_users_parent_carted_30", c30), ("distinct_users_parent_carted_60", c60),
+        ("distinct_users_parent_carted_90", c90),
+    ]:
+        df[c] = v.astype(np.int64)
+    df["demand_30_days"] = d30
+    df["demand_90_days"] = d90
+    df["revenue_30_days"] = np.round(d30 * rng.uniform(0.2, 0.6, n), 2)
+    df["revenue_90_days"] = np.round(d90 * rng.uniform(0.2, 0.6, n), 2)
+
+    # ranks only exist for products that sold
+    def _rank(v: np.ndarray) -> np.ndarray:
+        r = pd.Series(-v).rank(method="min").to_numpy()
+        return np.where(v > 0, r, np.nan)
+
+    df["catalog_demand_30_days_rank"] = _rank(d30)
+    df["catalog_demand_90_days_rank"] = _rank(d90)
+    df["catalog_revenue_30_days_rank"] = _rank(df["revenue_30_days"].to_numpy())
+    df["catalog_revenue_90_days_rank"] = _rank(df["revenue_90_days"].to_numpy())
+    return df[CATALOG_COLUMNS]
+
+
+def generate_return_rates(df: pd.DataFrame, *, seed: int = 0, frac: float = 0.2) -> pd.DataFrame:
+    """Same shape as backend/return_rates.pkl: index product_id, refund_count/total_orders/return_rate."""
+    rng = np.random.default_rng(seed + 1)
+    ids = df["product_id"].to_numpy()
+    pick = ids[rng.random(len(ids)) < frac]
+    orders = rng.poisson(8, len(pick)) + 1
+    refunds = rng.binomial(orders, rng.beta(1.5, 12, len(pick)))
+    out = pd.DataFrame(
+        {"refund_count": refunds, "total_orders": orders, "return_rate": refunds / orders},
+        index=pd.Index(pick, name="product_id"),
+    )
+    return out.sort_values("return_rate", ascending=False)
+
+
+def write_catalog(n: int, out_dir: str, *, seed: int = 0, template_csv: Optional[str] = None) -> Dict[str, str]:
+    """Write catalog_<n>.csv + return_rates_<n>.pkl into out_dir (reused if already there)."""
+    os.makedirs(out_dir, exist_ok=True)
+    csv_path = os.path.join(out_dir, f"catalog_{n}_s{seed}.csv")
+    rr_path = os.path.join(out_dir, f"return_rates_{n}_s{seed}.pkl")
+    if not (os.path.exists(csv_path) and os.path.exists(rr_path)):
+        df = generate_catalog(n, seed=seed, template_csv=template_csv)
+        df.to_csv(csv_path + ".tmp", index=False)
+        generate_return_rates(df, seed=seed).to_pickle(rr_path + ".tmp")
+        os.replace(csv_path + ".tmp", csv_path)
+        os.replace(rr_path + ".tmp", rr_path)
+    return {"csv_path": csv_path, "return_rates_path": rr_path}
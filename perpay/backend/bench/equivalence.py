@@ -0,0 +1,126 @@
+# backend/bench/equivalence.py
+# Exactness regression check: every exact ranking path must return the same items, in the
+# same order and with the same scores, as engine="full" (the exhaustive scorer). Compared
+# per request over a query mix (filters, pos_terms, biz weights, alphas), for each
+# vectorizer mode:
+# - engine="inverted" (posting-list walk + MaxScore pruning)
+# - an engine loaded from its index snapshot (built and saved by a first engine)
+# - ShardedSearch, engine "full" and "inverted"
+# engine="hybrid" is approximate by design and is covered by bench.eval instead.
+# Exits 1 on any mismatch and prints the first few.
+#
+#   cd perpay/backend
+#   python -m bench.equivalence --csv ../data/product_catalog.csv --return-rates return_rates.pkl
+#   python -m bench.equivalence --size 5000          # synthetic catalog (bench.catalog)
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from bench.run import BACKEND_DIR
+
+MODES = ["exact", "hashed"]
+
+
+def _diff(want: List[dict], got: List[dict]) -> Optional[str]:
+    """None when both result lists are identical, else a short description of the first difference."""
+    if len(want) != len(got):
+        return f"{len(got)} items, expected {len(want)}"
+    for i, (a, b) in enumerate(zip(want, got)):
+        if a != b:
+            return f"item {i}: {b.get('product_id')} score {b.get('score')}, expected {a.get('product_id')} score {a.get('score')}"
+    return None
+
+
+def compare(name: str, reqs: List[Dict], want: List[List[dict]], search: Callable[[Dict], List[dict]],
+            failures: List[str]) -> int:
+    """Replays `reqs` through `search`; appends one line per mismatching request to `failures`."""
+    bad = 0
+    for r, w in zip(reqs, want):
+        d = _diff(w, search(r))
+        if d is not None:
+            bad += 1
+            failures.append(f"{name}: {r} -> {d}")
+    print(f"[equivalence] {name}: {len(reqs) - bad}/{len(reqs)} identical", file=sys.stderr)
+    return bad
+
+
+def check_mode(csv_path: str, mode: str, reqs: List[Dict], shards: int, workdir: str) -> List[str]:
+    from search import CosineSearch
+    from sharded import ShardedSearch
+
+    kw = {"vectorizer": mode, "result_cache_size": 0, "page_cache_bytes": 0}
+    failures: List[str] = []
+    ref = CosineSearch(csv_path, **kw)
+    want = [ref.search(**r, engine="full") for r in reqs]
+    compare(f"{mode}/inverted", reqs, want, lambda r: ref.search(**r, engine="inverted"), failures)
+    del ref
+
+    snap_dir = tempfile.mkdtemp(prefix=f"equivalence-{mode}-", dir=workdir)
+    CosineSearch(csv_path, snapshot_dir=snap_dir, **kw)           # builds and saves the snapshot
+    loaded = CosineSearch(csv_path, snapshot_dir=snap_dir, **kw)
+    if not loaded.warm_pages():
+        failures.append(f"{mode}/snapshot: the second engine did not load the snapshot")
+    compare(f"{mode}/snapshot", reqs, want, lambda r: loaded.search(**r, engine="full"), failures)
+    del loaded
+
+    if shards > 1:
+        sharded = ShardedSearch(csv_path, n_shards=shards, **kw)
+        try:
+            for engine in ("full", "inverted"):
+                compare(f"{mode}/shards{shards}/{engine}", reqs, want,
+                        lambda r: sharded.search(**r, engine=engine), failures)
+        finally:
+            sharded.close()
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Check that the exact ranking paths match engine=full item for item")
+    ap.add_argument("--csv", default=None, help="catalog CSV (default: a synthetic catalog of --size rows)")
+    ap.add_argument("--return-rates", default=None, help="RETURN_RATES_PATH for the engines")
+    ap.add_argument("--size", type=int, default=5000)
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    ap.add_argument("--shards", type=int, default=2, help="ShardedSearch shards (0/1 to skip)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "perpay-bench"))
+    ap.add_argument("--show", type=int, default=5, help="mismatches to print")
+    args = ap.parse_args(argv)
+
+    sys.path.insert(0, BACKEND_DIR)
+    from bench.queries import query_mix
+
+    os.makedirs(args.workdir, exist_ok=True)
+    csv_path = args.csv
+    if csv_path is None:
+        from bench.catalog import write_catalog
+        paths = write_catalog(args.size, args.workdir, seed=args.seed)
+        csv_path = paths["csv_path"]
+        os.environ["RETURN_RATES_PATH"] = paths["return_rates_path"]
+    if args.return_rates:
+        os.environ["RETURN_RATES_PATH"] = args.return_rates
+
+    df = pd.read_csv(csv_path, low_memory=False)
+    reqs = query_mix(df, args.queries, seed=args.seed)
+    del df
+
+    failures: List[str] = []
+    for mode in args.modes:
+        failures += check_mode(csv_path, mode, reqs, args.shards, args.workdir)
+    for line in failures[: args.show]:
+        print(line)
+    if failures:
+        print(f"[equivalence] {len(failures)} mismatching requests", file=sys.stderr)
+        return 1
+    print("[equivalence] all paths identical", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+# backend/bench/eval.py
+# Offline relevance + latency regression check for the search engines. A golden set is a
+# JSONL file, one judged query per line:
+#
+#   {"id": "q0001", "request": {"query": "usb charger", "brand": "anker"}, "relevant": {"123": 2, "456": 1}}
+#
+# `request` holds CosineSearch.search keywords (= /search body, top_k is set by --k);
+# `relevant` maps product_id -> graded gain (a plain list of product_ids means gain 1).
+# Every target (engine/full, engine/inverted, engine/hybrid, shardsN/full, ...) replays the
+# set and reports recall@k, nDCG@k and MRR next to p50/p99 latency.
+#
+#   cd perpay/backend
+#   python -m bench.eval make --csv ../data/product_catalog.csv --queries 300 --out golden.jsonl
+#   python -m bench.eval run --csv ../data/product_catalog.csv --golden golden.jsonl \
+#       --engines full inverted hybrid --shards 4 --out eval_baseline.json
+#   python -m bench.eval run ... --compare eval_baseline.json
+#   python -m bench.eval run ... --engines full hybrid --probes 1 2 4 8 16 --reference none
+#
+# `run` exits 1 when a target's quality falls more than --quality-tolerance (absolute)
+# below the --reference target of the same run (default engine/full, the exact scorer),
+# or below the --compare baseline; with --compare, p50/p99 growing more than
+# --latency-tolerance (relative) also fails.
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from bench.run import BACKEND_DIR, latency_stats
+
+QUALITY = ["recall", "ndcg", "mrr"]
+LATENCY = ["p50_ms", "p99_ms"]
+
+
+# ---------- metrics ----------
+def recall_at_k(ranked: Sequence[str], relevant: Dict[str, float], k: int) -> float:
+    if not relevant:
+        return 0.0
+    return sum(1 for pid in ranked[:k] if pid in relevant) / len(relevant)
+
+
+def ndcg_at_k(ranked: Sequence[str], relevant: Dict[str, float], k: int) -> float:
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    gains = np.asarray([relevant.get(pid, 0.0) for pid in ranked[:k]], dtype=float)
+    dcg = float(gains @ discounts[:len(gains)])
+    ideal = np.sort(np.asarray(list(relevant.values()), dtype=float))[::-1][:k]
+    idcg = float(ideal @ discounts[:len(ideal)])
+    return dcg / idcg if idcg > 0 else 0.0
+
+
+def reciprocal_rank(ranked: Sequence[str], relevant: Dict[str, float]) -> float:
+    for i, pid in enumerate(ranked):
+        if pid in relevant:
+            return 1.0 / (i + 1)
+    return 0.0
+
+
+# ---------- golden set ----------
+def load_golden(path: str) -> List[Dict]:
+    golden = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            rel = item.get("relevant") or {}
+            if isinstance(rel, list):
+                rel = {str(pid): 1.0 for pid in rel}
+            item["relevant"] = {str(pid): float(g) for pid, g in rel.items() if float(g) > 0}
+            if not item.get("request", {}).get("query") or not item["relevant"]:
+                raise ValueError(f"{path}:{n + 1}: needs a request.query and at least one relevant product_id")
+            item.setdefault("id", f"q{n:04d}")
+            golden.append(item)
+    return golden
+
+
+_FILTER_COLS = ["brand", "category_name_1", "category_name_2", "category_name_3"]
+
+
+def make_golden(df: pd.DataFrame, n: int, *, seed: int = 0, max_relevant: int = 20) -> List[Dict]:
+    """
+    Known-item queries judged by the catalog alone, not by any engine. A query is 1-3
+    words of a product's name, sometimes with that product's brand/category as a filter.
+    The product itself has gain 2; every other product passing the filters whose name
+    holds all the query words has gain 1. Queries matching more than `max_relevant`
+    products are dropped (too vague to judge).
+    """
+    sys.path.insert(0, BACKEND_DIR)
+    from search import _norm_text
+
+    rng = np.random.default_rng(seed)
+    pids = df["product_id"].astype(str).str.replace(r"[,\s]", "", regex=True).str.strip().to_numpy()
+    words = [set(_norm_text(s).split()) for s in df["name"].fillna("").astype(str)]
+    cols = {c: df[c].astype(object).fillna("").astype(str).str.strip().str.lower().to_numpy()
+            for c in _FILTER_COLS if c in df.columns}
+    alpha_word = re.compile(r"^[a-z][a-z']+$")
+
+    golden: List[Dict] = []
+    for _ in range(n * 20):
+        if len(golden) >= n:
+            break
+        i = int(rng.integers(0, len(df)))
+        toks = sorted(t for t in words[i] if alpha_word.match(t) and len(t) > 2)
+        if not toks:
+            continue
+        q = [str(t) for t in rng.choice(toks, min(len(toks), int(rng.integers(1, 4))), replace=False)]
+        request: Dict = {"query": " ".join(q)}
+        mask = np.ones(len(df), dtype=bool)
+        for col, p in (("brand", 0.2), ("category_name_1", 0.2), ("category_name_3", 0.1)):
+            if col in cols and cols[col][i] and rng.random() < p:
+                request[col] = cols[col][i]
+                mask &= cols[col] == cols[col][i]
+        need = set(q)
+        hits = [j for j in np.flatnonzero(mask) if need <= words[j]]
+        if len(hits) > max_relevant:
+            continue
+        relevant = {pids[j]: 1.0 for j in hits}
+        relevant[pids[i]] = 2.0
+        golden.append({"id": f"q{len(golden):04d}", "request": request, "relevant": relevant})
+    return golden
+
+
+# ---------- replay ----------
+def evaluate(call, golden: List[Dict], ks: List[int], warmup: int) -> Dict[str, float]:
+    """`call(request) -> ranked product_ids`; quality means over the set plus latency stats."""
+    for item in golden[:warmup]:
+        call(item["request"])
+    sums: Dict[str, float] = {}
+    lat = []
+    for item in golden:
+        t0 = time.perf_counter()
+        ranked = call(item["request"])
+        lat.append(time.perf_counter() - t0)
+        rel = item["relevant"]
+        for k in ks:
+            sums[f"recall@{k}"] = sums.get(f"recall@{k}", 0.0) + recall_at_k(ranked, rel, k)
+            sums[f"ndcg@{k}"] = sums.get(f"ndcg@{k}", 0.0) + ndcg_at_k(ranked, rel, k)
+        sums["mrr"] = sums.get("mrr", 0.0) + reciprocal_rank(ranked, rel)
+    out = {m: round(v / max(1, len(golden)), 4) for m, v in sums.items()}
+    stats = latency_stats(lat)
+    out.update({m: stats[m] for m in LATENCY})
+    return out
+
+
+def run_targets(cfg: Dict, golden: List[Dict]) -> Dict[str, Dict[str, float]]:
+    sys.path.insert(0, BACKEND_DIR)
+    if cfg.get("return_rates"):
+        os.environ["RETURN_RATES_PATH"] = cfg["return_rates"]
+    from search import CosineSearch
+
+    top_k = max(cfg["k"])
+    results: Dict[str, Dict[str, float]] = {}
+
+    def _ranked(eng, engine: str, n_probes: Optional[int] = None):
+        def call(request: Dict) -> List[str]:
+            body = {**request, "top_k": top_k, "include_cols": ["product_id"], "engine": engine}
+            if n_probes is not None:
+                body["n_probes"] = n_probes
+            return [str(r["product_id"]) for r in eng.search(**body)]
+        return call
+
+    eng = CosineSearch(cfg["csv"], result_cache_size=0, dense="hybrid" in cfg["engines"])
+    for name in cfg["engines"]:
+        results[f"engine/{name}"] = evaluate(_ranked(eng, name), golden, cfg["k"], cfg["warmup"])
+        print(f"[eval] engine/{name} done", file=sys.stderr)
+    if "hybrid" in cfg["engines"]:
+        for p in cfg.get("probes") or []:
+            results[f"hybrid/p{p}"] = evaluate(_ranked(eng, "hybrid", p), golden, cfg["k"], cfg["warmup"])
+            print(f"[eval] hybrid/p{p} done", file=sys.stderr)
+    del eng
+
+    if cfg.get("shards", 0) > 1:
+        from sharded import SHARD_ENGINES, ShardedSearch
+
+        sharded = ShardedSearch(cfg["csv"], n_shards=cfg["shards"], result_cache_size=0)
+        try:
+            for name in cfg["engines"]:
+                if name not in SHARD_ENGINES:
+                    continue
+                target = f"shards{cfg['shards']}/{name}"
+                results[target] = evaluate(_ranked(sharded, name), golden, cfg["k"], cfg["warmup"])
+                print(f"[eval] {target} done", file=sys.stderr)
+        finally:
+            sharded.close()
+    return results
+
+
+# ---------- regression checks ----------
+def _is_quality(metric: str) -> bool:
+    return metric.split("@")[0] in QUALITY
+
+
+def check_reference(results: Dict[str, Dict[str, float]], reference: str, tolerance: float) -> List[str]:
+    ref = results.get(reference)
+    if ref is None:
+        return []
+    failures = []
+    for target, metrics in results.items():
+        if target == reference:
+            continue
+        for m, v in metrics.items():
+            if _is_quality(m) and m in ref and v < ref[m] - tolerance:
+                failures.append(f"{target} {m}: {v} vs {reference} {ref[m]}")
+    return failures
+
+
+def compare(baseline: Dict, current: Dict, quality_tol: float, latency_tol: float) -> List[str]:
+    failures = []
+    for target, metrics in current["results"].items():
+        ref = baseline["results"].get(target)
+        if ref is None:
+            continue
+        for m, v in metrics.items():
+            b = ref.get(m)
+            if b is None:
+                continue
+            if _is_quality(m) and v < b - quality_tol:
+                failures.append(f"{target} {m}: {b} -> {v}")
+            elif m in LATENCY and v > b * (1 + latency_tol):
+                failures.append(f"{target} {m}: {b} -> {v}")
+    return failures
+
+
+def _print_table(results: Dict[str, Dict[str, float]]) -> None:
+    metrics = list(next(iter(results.values())).keys()) if results else []
+    print(f"{'target':<18} " + " ".join(f"{m:>10}" for m in metrics))
+    for target, row in results.items():
+        print(f"{target:<18} " + " ".join(f"{row.get(m, '')!s:>10}" for m in metrics))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Relevance + latency regression check for CosineSearch engines")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    mk = sub.add_parser("make", help="bootstrap a known-item golden set from a catalog")
+    mk.add_argument("--csv", required=True)
+    mk.add_argument("--queries", type=int, default=300)
+    mk.add_argument("--max-relevant", type=int, default=20)
+    mk.add_argument("--seed", type=int, default=0)
+    mk.add_argument("--out", required=True)
+
+    rn = sub.add_parser("run", help="replay a golden set against every target")
+    rn.add_argument("--csv", required=True)
+    rn.add_argument("--golden", required=True)
+    rn.add_argument("--return-rates", default=None, help="RETURN_RATES_PATH for the engines")
+    rn.add_argument("--engines", nargs="+", default=["full", "inverted"])
+    rn.add_argument("--shards", type=int, default=0, help="also replay against ShardedSearch(n_shards)")
+    rn.add_argument("--probes", type=int, nargs="+", default=None,
+                    help="with engine hybrid: one hybrid/pN target per n_probes value")
+    rn.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    rn.add_argument("--warmup", type=int, default=20)
+    rn.add_argument("--reference", default="engine/full", help="target the others must match ('none' to skip)")
+    rn.add_argument("--out", default=None, help="write results JSON (baseline) here")
+    rn.add_argument("--compare", default=None, help="baseline JSON to check against")
+    rn.add_argument("--quality-tolerance", type=float, default=0.02, help="allowed absolute metric drop")
+    rn.add_argument("--latency-tolerance", type=float, default=0.25, help="allowed relative p50/p99 growth")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "make":
+        df = pd.read_csv(args.csv, low_memory=False)
+        golden = make_golden(df, args.queries, seed=args.seed, max_relevant=args.max_relevant)
+        with open(args.out, "w", encoding="utf-8") as f:
+            for item in golden:
+                f.write(json.dumps(item) + "\n")
+        print(f"[eval] wrote {len(golden)} queries to {args.out}", file=sys.stderr)
+        return 0
+
+    golden = load_golden(args.golden)
+    results = run_targets(vars(args), golden)
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "golden": os.path.basename(args.golden),
+            "queries": len(golden),
+            "k": args.k,
+        },
+        "results": results,
+    }
+    _print_table(results)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[eval] wrote {args.out}", file=sys.stderr)
+
+    failures = []
+    if args.reference != "none":
+        failures += check_reference(results, args.reference, args.quality_tolerance)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            failures += compare(json.load(f), report, args.quality_tolerance, args.latency_tolerance)
+    if failures:
+        print(f"[eval] {len(failures)} regression(s):")
+        for r in failures:
+            print("  " + r)
+        return 1
+    print("[eval] no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
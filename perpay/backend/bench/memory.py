@@ -0,0 +1,123 @@
+# backend/bench/memory.py
+# RSS before / after loading a synthetic catalog, read_csv vs the typed columnar store.
+# Each (size, loader) pair runs in a fresh spawned process; the store is converted in
+# its own process first so conversion cost does not count against the load.
+#
+#   cd perpay/backend
+#   python -m bench.memory --sizes 100000 --workdir /tmp/perpay-bench
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from bench.run import BACKEND_DIR, peak_rss_mb
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size now (Linux /proc); falls back to the peak elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+
+def _convert(cfg: Dict) -> Dict:
+    sys.path.insert(0, BACKEND_DIR)
+    from bench.catalog import write_catalog
+    from catalog_store import CatalogStore
+
+    paths = write_catalog(cfg["size"], cfg["workdir"], seed=cfg["seed"], template_csv=cfg["template"])
+    t0 = time.perf_counter()
+    store = CatalogStore.open(paths["csv_path"], cfg["store_dir"])
+    return {
+        "convert_s": round(time.perf_counter() - t0, 3),
+        "csv_mb": round(os.path.getsize(paths["csv_path"]) / 2**20, 2),
+        "store_mb": round(store.disk_bytes() / 2**20, 2),
+    }
+
+
+def _measure(cfg: Dict) -> Dict:
+    """RSS around one engine build (loader = "csv" | "store"). Runs inside a spawned child."""
+    sys.path.insert(0, BACKEND_DIR)
+    from bench.catalog import write_catalog
+
+    paths = write_catalog(cfg["size"], cfg["workdir"], seed=cfg["seed"], template_csv=cfg["template"])
+    os.environ["RETURN_RATES_PATH"] = paths["return_rates_path"]
+    from search import CosineSearch   # import cost (numpy/sklearn) is part of "before"
+
+    gc.collect()
+    before = current_rss_mb()
+    t0 = time.perf_counter()
+    catalog_dir = cfg["store_dir"] if cfg["loader"] == "store" else None
+    eng = CosineSearch(paths["csv_path"], catalog_dir=catalog_dir, snapshot_dir=cfg["snapshot_dir"],
+                       result_cache_size=0)
+    build_s = time.perf_counter() - t0
+    gc.collect()
+    after = current_rss_mb()
+    return {
+        "size": cfg["size"],
+        "loader": cfg["loader"],
+        "build_s": round(build_s, 3),
+        "rss_before_mb": before,
+        "rss_after_mb": after,
+        "rss_delta_mb": round(after - before, 1) if before is not None and after is not None else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "df_mb": round(eng.df.memory_usage(deep=True).sum() / 2**20, 2),
+        "df_columns": len(eng.df.columns),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Catalog memory: read_csv vs typed columnar store")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100000])
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "perpay-bench"))
+    ap.add_argument("--template", default=None)
+    ap.add_argument("--snapshot-dir", default=None,
+                    help="also load the TF-IDF index from snapshots (warm restarts); build it once first")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args(argv)
+
+    ctx = mp.get_context("spawn")
+    store_dir = os.path.join(args.workdir, "catalog-store")
+    rows = []
+    for size in args.sizes:
+        base = {"size": size, "seed": args.seed, "workdir": args.workdir, "template": args.template,
+                "store_dir": store_dir, "snapshot_dir": args.snapshot_dir}
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            conv = pool.submit(_convert, base).result()
+        for loader in ("csv", "store"):
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                res = pool.submit(_measure, {**base, "loader": loader}).result()
+            if loader == "store":
+                res.update(conv)
+            rows.append(res)
+        print(f"[memory] size={size} done", file=sys.stderr)
+
+    print(f"{'size':>9} {'loader':>7} {'build_s':>8} {'rss_before':>11} {'rss_after':>10} "
+          f"{'delta':>8} {'peak':>8} {'df_mb':>8}")
+    for r in rows:
+        print(f"{r['size']:>9} {r['loader']:>7} {r['build_s']:>8} {r['rss_before_mb']!s:>11} "
+              f"{r['rss_after_mb']!s:>10} {r['rss_delta_mb']!s:>8} {r['peak_rss_mb']!s:>8} {r['df_mb']:>8}")
+    for r in rows:
+        if r["loader"] == "store":
+            print(f"{r['size']:>9} csv {r['csv_mb']} MB -> store {r['store_mb']} MB on disk, "
+                  f"ready in {r['convert_s']}s (near 0 when already converted)")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# backend/bench/queries.py
+# Deterministic query mix shaped like the frontend's traffic: free text drawn from real
+# product names, three pos_terms, optional brand/category/color/object filters and
+# biz_weights. Every request is a dict of CosineSearch.search keywords (= /search body).
+from __future__ import annotations
+
+import re
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+_TOKEN = re.compile(r"[a-z][a-z']+")
+
+BIZ_WEIGHT_CHOICES = [
+    None,
+    {"profitability": 1.0},
+    {"return_rate": -1.0},
+    {"profitability": 0.6, "return_rate": -0.4},
+]
+COLOR_CHOICES = ["black", "white", "red", "blue", "green", "pink", "gray", "silver"]
+
+
+def query_mix(df: pd.DataFrame, n: int, *, seed: int = 0) -> List[Dict]:
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(df), n)
+    names = df["name"].fillna("").astype(str).str.lower().to_numpy()
+    cols = {c: df[c].to_numpy() if c in df.columns else None for c in (
+        "brand", "category_name_1", "category_name_2", "category_name_3",
+    )}
+
+    def _val(col: str, i: int):
+        arr = cols[col]
+        v = arr[i] if arr is not None else None
+        return v if isinstance(v, str) and v else None
+
+    out: List[Dict] = []
+    for i in rows:
+        toks = _TOKEN.findall(names[i].split(" - ", 1)[-1]) or ["item"]
+        q = " ".join(rng.choice(toks, min(len(toks), int(rng.integers(1, 4))), replace=False))
+        r: Dict = {
+            "query": q,
+            "top_k": int(rng.choice([5, 10, 20])),
+            "alpha": float(rng.choice([0.5, 0.7, 0.9, 1.0])),
+        }
+        if rng.random() < 0.3:
+            r["pos_terms"] = [str(t) for t in rng.choice(toks, 3)]
+        w = BIZ_WEIGHT_CHOICES[int(rng.integers(0, len(BIZ_WEIGHT_CHOICES)))]
+        if w is not None:
+            r["biz_weights"] = dict(w)
+        # filters: independent coins, so some requests stack several
+        if rng.random() < 0.15:
+            r["brand"] = _val("brand", i)
+        if rng.random() < 0.15:
+            r["category_name_1"] = _val("category_name_1", i)
+        if rng.random() < 0.08:
+            r["category_name_2"] = _val("category_name_2", i)
+        if rng.random() < 0.05:
+            r["category_name_3"] = _val("category_name_3", i)
+        if rng.random() < 0.10:
+            r["category_any"] = _val(str(rng.choice(["category_name_2", "category_name_3"])), i)
+        if rng.random() < 0.08:
+            r["color"] = str(rng.choice(COLOR_CHOICES))
+        if rng.random() < 0.08:
+            r["object"] = str(rng.choice(toks))
+        out.append({k: v for k, v in r.items() if v is not None})
+    return out
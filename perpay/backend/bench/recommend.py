@@ -0,0 +1,184 @@
+# backend/bench/recommend.py
+# Co-purchase recommender at growing order volumes: build time, table size, lookup
+# latency (should stay flat: a lookup only touches history x N table entries) and the
+# cost of folding in a 1% delta extract.
+# --check-swap instead verifies that a lookup racing an update() scores against one tables
+# snapshot: the tables are swapped right after recommend() first reads them, and every
+# answer must still equal the one computed on the old tables. Exits 1 on any mismatch.
+#
+#   cd perpay/backend
+#   python -m bench.recommend --orders 10000 100000 1000000 --out bench_recommend.json
+#   python -m bench.recommend --check-swap
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from bench.catalog import _zipf_choice
+from bench.run import BACKEND_DIR, latency_stats, peak_rss_mb
+
+ORDER_COLUMNS = [
+    "user_id", "order_id", "order_carted_date", "order_checkout_date", "order_denied_date",
+    "order_approved_date", "order_in_repayment_date", "order_refunded_date",
+    "order_canceled_date", "order_complete_date", "product_id",
+]
+
+
+def generate_orders(n: int, *, n_products: int, seed: int = 0, first_order: int = 0) -> pd.DataFrame:
+    """n order lines shaped like user_order_history.csv: ~3 lines per user, Zipf products."""
+    rng = np.random.default_rng(seed)
+    users = rng.integers(0, max(1, n // 3), n)
+    products = 100000 + _zipf_choice(rng, n_products, n, a=0.9)
+    outcome = rng.random(n)
+    date = "6/30/2025"
+    df = pd.DataFrame({c: pd.Series([None] * n, dtype=object) for c in ORDER_COLUMNS})
+    df["user_id"] = users
+    df["order_id"] = first_order + np.arange(n)
+    df["product_id"] = products
+    df["order_carted_date"] = date
+    df.loc[outcome < 0.05, "order_denied_date"] = date
+    df.loc[(outcome >= 0.05) & (outcome < 0.25), "order_canceled_date"] = date
+    df.loc[outcome >= 0.25, "order_approved_date"] = date
+    return df
+
+
+def bench_volume(n: int, cfg: Dict) -> Dict:
+    sys.path.insert(0, BACKEND_DIR)
+    from recommend import CoPurchase
+
+    path = os.path.join(cfg["workdir"], f"orders_{n}_s{cfg['seed']}.csv")
+    generate_orders(n, n_products=cfg["products"], seed=cfg["seed"]).to_csv(path, index=False)
+    t0 = time.perf_counter()
+    reco = CoPurchase(n_neighbors=cfg["neighbors"])
+    reco.update([path])
+    build_s = time.perf_counter() - t0
+
+    rng = np.random.default_rng(cfg["seed"] + 1)
+    t = reco.tables
+    with_history = np.flatnonzero(np.diff(t.X.indptr))
+    users = t.user_ids[rng.choice(with_history, cfg["lookups"])]
+    for u in users[:50]:
+        reco.recommend(int(u), top_k=10)
+    lat = []
+    for u in users:
+        t1 = time.perf_counter()
+        reco.recommend(int(u), top_k=10)
+        lat.append(time.perf_counter() - t1)
+
+    delta = generate_orders(max(1, n // 100), n_products=cfg["products"], seed=cfg["seed"] + 2, first_order=n)
+    delta.to_csv(path, mode="a", header=False, index=False)
+    update = reco.update([path])
+    stats = reco.stats()
+    return {
+        "orders": n,
+        "users": stats["users"],
+        "products": stats["products"],
+        "build_s": round(build_s, 3),
+        "table_mb": stats["table_mb"],
+        "delta_rows": update["new_rows"],
+        "delta_s": update["seconds"],
+        "delta_refreshed": update["refreshed_products"],
+        "peak_rss_mb": peak_rss_mb(),
+        **{k: v for k, v in latency_stats(lat).items() if k in ("p50_ms", "p95_ms", "p99_ms")},
+    }
+
+
+def check_swap(cfg: Dict, n: int = 20000, lookups: int = 200) -> List[str]:
+    """Lookups whose tables are swapped mid-call; one line per answer that differs from the old tables'."""
+    sys.path.insert(0, BACKEND_DIR)
+    from recommend import CoPurchase
+
+    class Swapping(CoPurchase):
+        # the first read of `tables` returns the current snapshot, every later read the next one:
+        # what a concurrent update() looks like to a lookup in flight
+        pending = None
+
+        @property
+        def tables(self):
+            t = self._t
+            if self.pending is not None:
+                self._t, self.pending = self.pending, None
+            return t
+
+        @tables.setter
+        def tables(self, t):
+            self._t = t
+
+    old_path = os.path.join(cfg["workdir"], f"swap_old_s{cfg['seed']}.csv")
+    new_path = os.path.join(cfg["workdir"], f"swap_new_s{cfg['seed']}.csv")
+    generate_orders(n, n_products=cfg["products"], seed=cfg["seed"]).to_csv(old_path, index=False)
+    # new products with lower ids and new users: every item and user position shifts
+    delta = generate_orders(n // 10, n_products=cfg["products"], seed=cfg["seed"] + 3, first_order=n)
+    delta["product_id"] -= 50000
+    delta["user_id"] += n
+    delta.to_csv(new_path, index=False)
+
+    old = CoPurchase(n_neighbors=cfg["neighbors"])
+    old.update([old_path])
+    new = CoPurchase(n_neighbors=cfg["neighbors"])
+    new.update([old_path, new_path])
+    racing = Swapping(n_neighbors=cfg["neighbors"])
+    racing.tables = old.tables
+
+    rng = np.random.default_rng(cfg["seed"] + 4)
+    users = old.tables.user_ids[rng.choice(len(old.tables.user_ids), lookups)]
+    failures = []
+    for u in users:
+        want = old.recommend(int(u), top_k=10)
+        racing.tables, racing.pending = old.tables, new.tables
+        try:
+            got = racing.recommend(int(u), top_k=10)
+        except IndexError as e:
+            failures.append(f"user {u}: {e!r}")
+            continue
+        if got[2] != want[2] or not np.array_equal(got[0], want[0]) or not np.allclose(got[1], want[1]):
+            failures.append(f"user {u}: {got[0][:5].tolist()} ({got[2]}), expected {want[0][:5].tolist()} ({want[2]})")
+    print(f"[recommend] swap check: {lookups - len(failures)}/{lookups} identical", file=sys.stderr)
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Co-purchase recommender: lookup latency vs order volume")
+    ap.add_argument("--orders", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--products", type=int, default=20000)
+    ap.add_argument("--neighbors", type=int, default=50)
+    ap.add_argument("--lookups", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "perpay-bench"))
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--check-swap", action="store_true", help="check lookups racing a tables swap, then exit")
+    args = ap.parse_args(argv)
+    os.makedirs(args.workdir, exist_ok=True)
+
+    cfg = vars(args)
+    if args.check_swap:
+        failures = check_swap(cfg)
+        for line in failures[:5]:
+            print(line)
+        return 1 if failures else 0
+    rows = []
+    for n in args.orders:
+        rows.append(bench_volume(n, cfg))
+        print(f"[recommend] orders={n} done", file=sys.stderr)
+
+    cols = ["orders", "users", "products", "build_s", "table_mb", "p50_ms", "p95_ms", "p99_ms",
+            "delta_rows", "delta_s", "delta_refreshed"]
+    print(" ".join(f"{c:>15}" for c in cols))
+    for r in rows:
+        print(" ".join(f"{r[c]!s:>15}" for c in cols))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
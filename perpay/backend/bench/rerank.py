@@ -0,0 +1,182 @@
+# backend/bench/rerank.py
+# Two-stage ranking on a synthetic catalog: trains each rank model kind from synthetic
+# order history, then replays a query mix at several rerank depths and reports per-stage
+# latency — retrieve (stage 1), features, model, total — next to stage 1 alone, the
+# model's held-out nDCG@10 against the stage-1 order, and how often the default latency
+# budgets skipped stage 2 at the deepest depth.
+# Orders go to a small "sellable" share of the products, with a Zipf-skewed appeal that
+# no catalog column carries, plus a little uniform noise; the set partly changes where
+# the label window starts. So the labels are sparse (a few percent of the candidates),
+# only the order-history features (buyers, co-purchase) can learn them, and the history
+# predicts them only in part.
+#
+#   cd perpay/backend
+#   python -m bench.rerank --size 20000 --orders 100000 --depths 100 300 1000 --out bench_rerank.json
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from bench.recommend import ORDER_COLUMNS
+from bench.run import BACKEND_DIR
+
+REPORTED_STAGES = ("features", "rerank", "finalize")
+
+
+def demand_orders(
+    df: pd.DataFrame,
+    n: int,
+    *,
+    sellable: float = 0.02,
+    drift: float = 0.5,
+    change_at: float = 0.7,
+    noise: float = 0.02,
+    zipf: float = 0.8,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    n order lines, ~3 per user. A `sellable` share of the products (random, with a
+    Zipf-skewed appeal independent of every catalog column) takes all but a `noise` share
+    of them. The set changes once, `change_at` of the way through the lines (default: where
+    rerank.train's label window starts): the late set swaps a `drift` share of the early
+    one for other products and reshuffles the appeal of the rest.
+    """
+    rng = np.random.default_rng(seed)
+    m = max(1, int(round(len(df) * sellable)))
+    appeal = 1.0 / np.arange(1, m + 1) ** zipf
+    pool = rng.permutation(len(df))
+    early = pool[:m]
+    swap = int(round(m * drift))
+    late = rng.permutation(np.concatenate([early[swap:], pool[m: m + swap]]))
+    products = np.empty(n, dtype=np.int64)
+    is_late = np.arange(n) >= int(round(n * change_at))
+    for mask, hot in ((~is_late, early), (is_late, late)):
+        w = np.full(len(df), noise / len(df))
+        w[hot] += (1.0 - noise) * appeal / appeal.sum()
+        products[mask] = rng.choice(len(df), int(mask.sum()), p=w / w.sum())
+    products = df["product_id"].to_numpy()[products]
+    date = "6/30/2025"
+    out = pd.DataFrame({c: pd.Series([None] * n, dtype=object) for c in ORDER_COLUMNS})
+    out["user_id"] = rng.integers(0, max(1, n // 3), n)
+    out["order_id"] = np.arange(n)
+    out["product_id"] = products
+    out["order_carted_date"] = out["order_checkout_date"] = date
+    outcome = rng.random(n)
+    out.loc[outcome < 0.05, "order_denied_date"] = date
+    out.loc[(outcome >= 0.05) & (outcome < 0.15), "order_canceled_date"] = date
+    out.loc[outcome >= 0.15, "order_approved_date"] = date
+    return out
+
+
+def _pct(ms: List[float], q: float) -> float:
+    return round(float(np.percentile(ms, q)), 3) if ms else 0.0
+
+
+def replay(eng, reqs: List[Dict], rerank: bool) -> Dict[str, float]:
+    """Per-stage p50/p99 (ms) over `reqs`; retrieve = every stage before the rerank."""
+    for r in reqs[:20]:
+        eng.search(**r, rerank=rerank)
+    out: Dict[str, List[float]] = {"retrieve": [], "features": [], "model": [], "total": []}
+    for r in reqs:
+        t: Dict[str, float] = {}
+        eng.search(**r, rerank=rerank, timings=t)
+        out["retrieve"].append(t["total"] - sum(t.get(s, 0.0) for s in REPORTED_STAGES))
+        out["features"].append(t.get("features", 0.0))
+        out["model"].append(t.get("rerank", 0.0))
+        out["total"].append(t["total"])
+    return {f"{k}_{p}": _pct(v, q) for k, v in out.items() for p, q in (("p50", 50), ("p99", 99))}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Retrieve-then-rerank: per-stage latency and nDCG by depth")
+    ap.add_argument("--size", type=int, default=20000)
+    ap.add_argument("--orders", type=int, default=100000)
+    ap.add_argument("--sellable", type=float, default=0.02, help="share of products that take most orders")
+    ap.add_argument("--drift", type=float, default=0.5, help="share of those products swapped in the label window")
+    ap.add_argument("--noise", type=float, default=0.02, help="share of orders spread over all products")
+    ap.add_argument("--depths", type=int, nargs="+", default=[100, 300, 1000])
+    ap.add_argument("--kinds", nargs="+", default=["linear", "gbm"])
+    ap.add_argument("--requests", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "perpay-bench"))
+    ap.add_argument("--template", default=None, help="catalog CSV to take taxonomy/vocabulary from")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args(argv)
+
+    sys.path.insert(0, BACKEND_DIR)
+    from bench.catalog import write_catalog
+    from bench.queries import query_mix
+
+    paths = write_catalog(args.size, args.workdir, seed=args.seed, template_csv=args.template)
+    os.environ["RETURN_RATES_PATH"] = paths["return_rates_path"]
+    from recommend import CoPurchase
+    from rerank import Reranker, RankModel, train
+    from search import CosineSearch
+
+    run_dir = tempfile.mkdtemp(prefix="rerank-", dir=args.workdir)
+    orders_path = os.path.join(run_dir, "orders.csv")
+    df = pd.read_csv(paths["csv_path"])
+    demand_orders(df, args.orders, sellable=args.sellable, drift=args.drift, noise=args.noise, seed=args.seed).to_csv(orders_path, index=False)
+    reqs = [{**r, "top_k": 10} for r in query_mix(df, args.requests, seed=args.seed)]
+    del df
+
+    copurchase = CoPurchase()
+    copurchase.update([orders_path])
+    models, summaries = {}, {}
+    for kind in args.kinds:
+        model_path = os.path.join(run_dir, f"model_{kind}.npz")
+        try:
+            summaries[kind] = train(paths["csv_path"], [orders_path], model_path, kind=kind, seed=args.seed)
+        except ValueError as e:   # e.g. it does not beat stage 1: nothing to serve or time
+            print(f"[rerank] skipping {kind}: {e}", file=sys.stderr)
+            continue
+        models[kind] = RankModel.load(model_path)
+        print(f"[rerank] trained {kind}", file=sys.stderr)
+    kinds = [k for k in args.kinds if k in models]
+    if not kinds:
+        print("[rerank] no model was trained", file=sys.stderr)
+        return 1
+
+    # one engine; each run swaps in a reranker (the catalog features do not depend on it)
+    eng = CosineSearch(paths["csv_path"], result_cache_size=0, reranker=Reranker(models[kinds[0]]))
+    for r in reqs:   # fill the query encode cache once, so no run pays for it
+        eng.search(**r, rerank=False)
+    rows = [{"kind": "stage1", "depth": 0, **replay(eng, reqs, False)}]
+    for kind in kinds:
+        for depth in args.depths:
+            eng.reranker = Reranker(models[kind], copurchase, depth=depth, retrieve_budget_ms=None, rerank_budget_ms=None)
+            rows.append({
+                "kind": kind, "depth": depth, **replay(eng, reqs, True),
+                "positive_rate": round(summaries[kind]["positives"] / max(1, summaries[kind]["rows"]), 4),
+                "ndcg@10_stage1": summaries[kind]["ndcg@10_stage1"],
+                "ndcg@10_reranked": summaries[kind]["ndcg@10_reranked"],
+            })
+            print(f"[rerank] kind={kind} depth={depth} done", file=sys.stderr)
+        # default budgets at the deepest depth: how often stage 2 was skipped
+        eng.reranker = Reranker(models[kind], copurchase, depth=max(args.depths))
+        replay(eng, reqs, True)
+        rows[-1]["budget_outcomes"] = eng.reranker.stats()["outcomes"]
+
+    cols = ["kind", "depth", "retrieve_p50", "retrieve_p99", "features_p50", "features_p99",
+            "model_p50", "model_p99", "total_p50", "total_p99", "positive_rate", "ndcg@10_stage1", "ndcg@10_reranked"]
+    print(" ".join(f"{c:>16}" for c in cols))
+    for r in rows:
+        print(" ".join(f"{r.get(c, '')!s:>16}" for c in cols))
+    for r in rows:
+        if "budget_outcomes" in r:
+            print(f"{r['kind']} depth={r['depth']} default budgets: {r['budget_outcomes']}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# backend/bench/run.py
+# Query-replay benchmark. Each catalog size runs in a fresh (spawned) process so build
+# time and peak RSS are not polluted by the previous size.
+#
+#   cd perpay/backend
+#   python -m bench.run --sizes 1000 10000 100000 --queries 500 --out bench_baseline.json
+#   python -m bench.run --sizes 1000 10000 100000 --queries 500 --compare bench_baseline.json
+#
+# --compare exits 1 when any latency / build / memory figure grows (or QPS drops) by more
+# than --tolerance relative to the baseline.
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # non-POSIX: no peak RSS
+    resource = None
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# metric -> True when bigger is worse
+TRACKED = {
+    "build_s": True, "peak_rss_mb": True, "index_mb": True,
+    "p50_ms": True, "p95_ms": True, "p99_ms": True, "qps": False,
+}
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, KiB elsewhere
+    return round(kb / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def latency_stats(lat_s: List[float]) -> Dict[str, float]:
+    ms = np.asarray(lat_s) * 1000.0
+    total = float(np.sum(lat_s))
+    return {
+        "n": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "qps": round(len(ms) / total, 1) if total > 0 else 0.0,
+    }
+
+
+def _replay(call, reqs: List[Dict], warmup: int) -> Dict[str, float]:
+    for r in reqs[:warmup]:
+        call(r)
+    lat = []
+    for r in reqs[warmup:]:
+        t0 = time.perf_counter()
+        call(r)
+        lat.append(time.perf_counter() - t0)
+    return latency_stats(lat)
+
+
+def _array_mb(arrays: Dict[str, np.ndarray]) -> float:
+    return round(sum(a.nbytes for a in arrays.values()) / 2**20, 2)
+
+
+def bench_size(cfg: Dict) -> Dict:
+    """One catalog size, engine + app targets. Runs inside a spawned child."""
+    sys.path.insert(0, BACKEND_DIR)
+    from bench.catalog import write_catalog
+    from bench.queries import query_mix
+
+    paths = write_catalog(cfg["size"], cfg["workdir"], seed=cfg["seed"], template_csv=cfg["template"])
+    os.environ["RETURN_RATES_PATH"] = paths["return_rates_path"]
+    rss_before = peak_rss_mb()
+
+    from search import CosineSearch
+
+    t0 = time.perf_counter()
+    eng = CosineSearch(paths["csv_path"], result_cache_size=0)
+    build_s = time.perf_counter() - t0
+    arrays, _ = eng._index_arrays()
+    out: Dict = {
+        "size": cfg["size"],
+        "rows": len(eng.df),
+        "build_s": round(build_s, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_before_build_mb": rss_before,
+        "index_mb": _array_mb(arrays),
+        "catalog_mb": round(eng.df.memory_usage(deep=True).sum() / 2**20, 2),
+        "n_features": int(eng.X.shape[1]),
+        "targets": [],
+    }
+    del arrays
+
+    reqs = query_mix(eng.df, cfg["queries"] + cfg["warmup"], seed=cfg["seed"])
+    for name in cfg["engines"]:
+        stats = _replay(lambda r: eng.search(engine=name, **r), reqs, cfg["warmup"])
+        out["targets"].append({"target": "engine", "engine": name, **stats})
+    # engine-only peak: build + replay, before the app loads its own copy
+    out["peak_rss_mb"] = peak_rss_mb()
+
+    if cfg.get("shards", 0) > 1:
+        from sharded import ShardedSearch
+
+        sharded = ShardedSearch(paths["csv_path"], n_shards=cfg["shards"], result_cache_size=0)
+        try:
+            for name in cfg["engines"]:
+                if name not in ("full", "inverted"):
+                    continue
+                stats = _replay(lambda r: sharded.search(engine=name, **r), reqs, cfg["warmup"])
+                out["targets"].append({"target": f"shards{cfg['shards']}", "engine": name, **stats})
+        finally:
+            sharded.close()
+
+    if cfg["app"]:
+        del eng
+        gc.collect()
+        try:
+            from fastapi.testclient import TestClient   # needs httpx
+        except Exception as e:
+            out["app_error"] = f"TestClient unavailable: {e}"
+        else:
+            os.environ.update({"CSV_PATH": paths["csv_path"], "RESULT_CACHE_SIZE": "0"})
+            import app as app_module
+
+            if app_module.engine is None:
+                out["app_error"] = app_module.startup_error
+            else:
+                client = TestClient(app_module.app)
+
+                def _post(body: Dict) -> None:
+                    resp = client.post("/search", json=body)
+                    if resp.status_code != 200:
+                        raise RuntimeError(f"/search {resp.status_code}: {resp.text[:200]}")
+
+                for name in cfg["engines"]:
+                    stats = _replay(lambda r: _post({**r, "engine": name}), reqs, cfg["warmup"])
+                    out["targets"].append({"target": "app", "engine": name, **stats})
+
+    out["peak_rss_total_mb"] = peak_rss_mb()
+    return out
+
+
+# ---------- baseline ----------
+def flatten(results: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """{"<size>/<target>/<engine>": {metric: value}} for comparison."""
+    flat: Dict[str, Dict[str, float]] = {}
+    for res in results:
+        size_metrics = {k: res[k] for k in ("build_s", "peak_rss_mb", "index_mb") if res.get(k) is not None}
+        flat[f"{res['size']}/build"] = size_metrics
+        for t in res["targets"]:
+            flat[f"{res['size']}/{t['target']}/{t['engine']}"] = {
+                k: t[k] for k in ("p50_ms", "p95_ms", "p99_ms", "qps")
+            }
+    return flat
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float) -> List[str]:
+    old, new = flatten(baseline["results"]), flatten(current["results"])
+    regressions = []
+    for key, metrics in new.items():
+        ref = old.get(key)
+        if ref is None:
+            continue
+        for m, v in metrics.items():
+            b = ref.get(m)
+            if b is None or v is None or m not in TRACKED:
+                continue
+            worse = v > b * (1 + tolerance) if TRACKED[m] else v < b / (1 + tolerance)
+            if worse:
+                regressions.append(f"{key} {m}: {b} -> {v}")
+    return regressions
+
+
+def _print_table(results: List[Dict]) -> None:
+    print(f"{'size':>9} {'build_s':>8} {'rss_mb':>8} {'index_mb':>9}  target/engine     "
+          f"{'p50':>8} {'p95':>8} {'p99':>8} {'qps':>8}")
+    for res in results:
+        head = f"{res['size']:>9} {res['build_s']:>8} {res['peak_rss_mb']!s:>8} {res['index_mb']:>9}"
+        for t in res["targets"]:
+            print(f"{head}  {t['target'] + '/' + t['engine']:<17} "
+                  f"{t['p50_ms']:>8} {t['p95_ms']:>8} {t['p99_ms']:>8} {t['qps']:>8}")
+            head = " " * len(head)
+        if res.get("app_error"):
+            print(f"{'':>9} app skipped: {res['app_error']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Synthetic catalog + query replay benchmark for CosineSearch")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--queries", type=int, default=500, help="timed queries per target")
+    ap.add_argument("--warmup", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--engines", nargs="+", default=["full", "inverted"])
+    ap.add_argument("--no-app", dest="app", action="store_false", help="skip the FastAPI replay")
+    ap.add_argument("--shards", type=int, default=0, help="also replay against ShardedSearch(n_shards)")
+    ap.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "perpay-bench"),
+                    help="where generated catalogs are cached")
+    ap.add_argument("--template", default=None, help="catalog CSV to take taxonomy/vocabulary from")
+    ap.add_argument("--out", default=None, help="write results JSON (baseline) here")
+    ap.add_argument("--compare", default=None, help="baseline JSON to check against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = ap.parse_args(argv)
+
+    ctx = mp.get_context("spawn")
+    results = []
+    for size in args.sizes:
+        cfg = {
+            "size": size, "queries": args.queries, "warmup": args.warmup, "seed": args.seed,
+            "engines": args.engines, "app": args.app, "workdir": args.workdir, "template": args.template,
+            "shards": args.shards,
+        }
+        # an executor worker (not a daemonic Pool worker) may start the shard processes
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            results.append(pool.submit(bench_size, cfg).result())
+        print(f"[bench] size={size} done", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "queries": args.queries,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    _print_table(results)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[bench] wrote {args.out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance)
+        if regressions:
+            print(f"[bench] {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for r in regressions:
+                print("  " + r)
+            return 1
+        print(f"[bench] no regressions beyond {args.tolerance:.0%} vs {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
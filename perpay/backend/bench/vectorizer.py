@@ -0,0 +1,131 @@
+# backend/bench/vectorizer.py
+# Exact-vocabulary vs hashed TF-IDF index at growing catalog sizes: build time, peak RSS,
+# index and vocabulary size, query latency, and quality. Quality is measured two ways:
+# known-item recall/nDCG/MRR (bench.eval's catalog-judged golden set) and the overlap of
+# each query's top 10 with the exact index's. Each (size, mode) builds in a fresh
+# spawned process so RSS figures do not leak between runs.
+#
+#   cd perpay/backend
+#   python -m bench.vectorizer --sizes 10000 100000 1000000 --out bench_vectorizer.json
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from bench.run import BACKEND_DIR, _array_mb, latency_stats, peak_rss_mb
+
+MODES = ["exact", "hashed"]
+
+
+def _vocab_mb(eng) -> float:
+    """Resident size of the vectorizers' term dictionaries (keys + table)."""
+    total = 0
+    for vec in (eng.v_name, eng.v_cat):
+        vocab = getattr(vec, "vocabulary_", None)
+        if vocab is not None:
+            total += sys.getsizeof(vocab) + sum(sys.getsizeof(t) for t in vocab)
+        elif getattr(vec, "fitted", False):
+            total += sum(a.nbytes for a in vec.to_arrays("v").values())
+    return round(total / 2**20, 2)
+
+
+def bench_mode(cfg: Dict) -> Dict:
+    """One catalog size with one vectorizer. Runs inside a spawned child."""
+    sys.path.insert(0, BACKEND_DIR)
+    from bench.catalog import write_catalog
+    from bench.eval import evaluate, make_golden
+    from bench.queries import query_mix
+
+    paths = write_catalog(cfg["size"], cfg["workdir"], seed=cfg["seed"], template_csv=cfg["template"])
+    os.environ["RETURN_RATES_PATH"] = paths["return_rates_path"]
+    from search import CosineSearch
+
+    t0 = time.perf_counter()
+    eng = CosineSearch(paths["csv_path"], result_cache_size=0, vectorizer=cfg["mode"],
+                       hash_features=cfg["hash_features"])
+    build_s = time.perf_counter() - t0
+    rss = peak_rss_mb()
+    arrays, _ = eng._index_arrays()
+
+    reqs = query_mix(eng.df, cfg["queries"], seed=cfg["seed"])
+    top10, lat = [], []
+    for r in reqs:
+        body = {**r, "top_k": 10, "include_cols": ["product_id"]}
+        t1 = time.perf_counter()
+        items = eng.search(**body)
+        lat.append(time.perf_counter() - t1)
+        top10.append([str(x["product_id"]) for x in items])
+
+    golden = make_golden(eng.df, cfg["golden"], seed=cfg["seed"])
+    quality = evaluate(
+        lambda r: [str(x["product_id"]) for x in eng.search(**r, top_k=10, include_cols=["product_id"])],
+        golden, [10], 0,
+    )
+    stats = latency_stats(lat)
+    return {
+        "size": cfg["size"],
+        "mode": cfg["mode"],
+        "build_s": round(build_s, 3),
+        "peak_rss_mb": rss,
+        "index_mb": _array_mb(arrays),
+        "vocab_mb": _vocab_mb(eng),
+        "columns": int(eng.X.shape[1]),
+        "nnz": int(eng.X.nnz),
+        "p50_ms": stats["p50_ms"],
+        "p99_ms": stats["p99_ms"],
+        **{k: v for k, v in quality.items() if k in ("recall@10", "ndcg@10", "mrr")},
+        "top10": top10,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Exact vs hashed TF-IDF index: memory, build time, recall")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    ap.add_argument("--hash-features", type=int, default=1 << 20)
+    ap.add_argument("--queries", type=int, default=300, help="query mix for latency + top-10 overlap")
+    ap.add_argument("--golden", type=int, default=300, help="known-item queries for recall/nDCG/MRR")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "perpay-bench"))
+    ap.add_argument("--template", default=None, help="catalog CSV to take taxonomy/vocabulary from")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args(argv)
+
+    ctx = mp.get_context("spawn")
+    rows = []
+    for size in args.sizes:
+        ref = None
+        for mode in MODES:
+            cfg = {**vars(args), "size": size, "mode": mode}
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                res = pool.submit(bench_mode, cfg).result()
+            top10 = res.pop("top10")
+            if ref is None:
+                ref = top10
+            res["overlap@10"] = round(float(np.mean([
+                len(set(a) & set(b)) / len(a) if a else 1.0 for a, b in zip(ref, top10)
+            ])), 4)
+            rows.append(res)
+            print(f"[vectorizer] size={size} mode={mode} done", file=sys.stderr)
+
+    cols = ["size", "mode", "build_s", "peak_rss_mb", "index_mb", "vocab_mb", "columns", "nnz",
+            "p50_ms", "p99_ms", "recall@10", "ndcg@10", "mrr", "overlap@10"]
+    print(" ".join(f"{c:>11}" for c in cols))
+    for r in rows:
+        print(" ".join(f"{r[c]!s:>11}" for c in cols))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
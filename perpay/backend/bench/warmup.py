@@ -0,0 +1,159 @@
+# backend/bench/warmup.py
+# Time to steady state after a deploy, with and without query-log warm-up. A "previous
+# deployment" serves a Zipf-skewed stream of /search bodies into a QueryLog; then a
+# fresh engine is loaded from the index snapshot (as a restarted pod would) either cold
+# or warmed with the log's top-N bodies (EngineReloader history), and replays the next
+# stream from the same distribution. Reports p99 per window of requests and how many
+# requests it takes until a window's p99 is within --steady-ratio of the steady p99
+# (median window p99 over the second half of the replay).
+# Each mode runs in a fresh spawned process. The OS page cache is not dropped (needs
+# root), so the page-touch part of the warm-up only shows on a cold host.
+#
+#   cd perpay/backend
+#   python -m bench.warmup --size 100000 --distinct 1000 --zipf 1.3 --requests 4000 --warm 500
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from bench.run import BACKEND_DIR
+
+MODES = ["cold", "warm"]
+
+
+def zipf_stream(reqs: List[Dict], n: int, s: float, seed: int) -> List[Dict]:
+    """n draws from `reqs` with P(rank r) ~ 1 / r**s (a few queries dominate, long tail)."""
+    w = 1.0 / np.arange(1, len(reqs) + 1) ** s
+    picks = np.random.default_rng(seed).choice(len(reqs), n, p=w / w.sum())
+    return [reqs[i] for i in picks]
+
+
+def _prebuild(cfg: Dict) -> None:
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ["RETURN_RATES_PATH"] = cfg["rr_path"]
+    from search import CosineSearch
+    CosineSearch(cfg["csv_path"], snapshot_dir=cfg["snapshot_dir"])
+
+
+def bench_mode(cfg: Dict) -> Dict:
+    """One restart + replay. Runs inside a spawned child."""
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ["RETURN_RATES_PATH"] = cfg["rr_path"]
+    from querylog import QueryLog
+    from reload import EngineReloader
+    from search import CosineSearch
+
+    log = QueryLog(cfg["log_dir"], keep=cfg["log_files"]) if cfg["mode"] == "warm" else None
+    reloader = EngineReloader(
+        lambda: CosineSearch(cfg["csv_path"], snapshot_dir=cfg["snapshot_dir"]),
+        lambda eng: None,
+        warm_queries=0,
+        history=(lambda: log.top(cfg["warm"])) if log is not None else None,
+    )
+    t0 = time.perf_counter()
+    eng = reloader.load()
+    startup_s = time.perf_counter() - t0
+    if log is not None:
+        log.close()
+
+    lat = []
+    for r in cfg["stream"]:
+        t1 = time.perf_counter()
+        eng.search(**r)
+        lat.append(time.perf_counter() - t1)
+    ms = np.asarray(lat) * 1000.0
+    w = cfg["window"]
+    windows = [round(float(np.percentile(ms[i: i + w], 99)), 3) for i in range(0, len(ms) - w + 1, w)]
+    steady = float(np.median(windows[len(windows) // 2:]))   # the last windows' own noise averaged out
+    settle = next((i for i, p in enumerate(windows) if p <= steady * cfg["steady_ratio"]), len(windows) - 1)
+    return {
+        "mode": cfg["mode"],
+        "startup_s": round(startup_s, 3),
+        "warmed": reloader.status["warmed"],
+        "warm_s": reloader.status["warm_s"],
+        f"p99_first{w}_ms": windows[0],
+        "p99_steady_ms": round(steady, 3),
+        "requests_to_steady": settle * w,
+        "ms_to_steady": round(float(ms[: settle * w].sum()), 1),
+        "p99_all_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "window_p99_ms": windows,
+        "cache": eng.cache_stats()["results"],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Restart warm-up from the query log: time to steady-state p99")
+    ap.add_argument("--size", type=int, default=100000)
+    ap.add_argument("--distinct", type=int, default=1000, help="distinct /search bodies in the traffic")
+    ap.add_argument("--zipf", type=float, default=1.3, help="popularity skew of those bodies")
+    ap.add_argument("--history", type=int, default=20000, help="requests logged by the previous deployment")
+    ap.add_argument("--requests", type=int, default=4000, help="requests replayed after the restart")
+    ap.add_argument("--warm", type=int, default=500, help="top-N logged bodies replayed at startup")
+    ap.add_argument("--window", type=int, default=200)
+    ap.add_argument("--steady-ratio", type=float, default=1.2)
+    ap.add_argument("--log-files", type=int, default=4)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "perpay-bench"))
+    ap.add_argument("--template", default=None, help="catalog CSV to take taxonomy/vocabulary from")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args(argv)
+
+    sys.path.insert(0, BACKEND_DIR)
+    import pandas as pd
+
+    from bench.catalog import write_catalog
+    from bench.queries import query_mix
+    from querylog import QueryLog
+    from search import SEARCH_DEFAULTS
+
+    paths = write_catalog(args.size, args.workdir, seed=args.seed, template_csv=args.template)
+    df = pd.read_csv(paths["csv_path"], usecols=["name", "brand", "category_name_1", "category_name_2", "category_name_3"])
+    reqs = query_mix(df, args.distinct, seed=args.seed)
+    del df
+
+    run_dir = tempfile.mkdtemp(prefix="warmup-", dir=args.workdir)
+    log_dir = os.path.join(run_dir, "querylog")
+    log = QueryLog(log_dir, defaults={**SEARCH_DEFAULTS, "engine": None}, keep=args.log_files)
+    for r in zipf_stream(reqs, args.history, args.zipf, args.seed + 1):
+        log.append(r)
+    log.close()
+
+    ctx = mp.get_context("spawn")
+    base = {
+        "csv_path": paths["csv_path"], "rr_path": paths["return_rates_path"],
+        "snapshot_dir": os.path.join(run_dir, "snapshots"), "log_dir": log_dir,
+        "log_files": args.log_files, "warm": args.warm, "window": args.window,
+        "steady_ratio": args.steady_ratio,
+        "stream": zipf_stream(reqs, args.requests, args.zipf, args.seed + 2),
+    }
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        pool.submit(_prebuild, base).result()
+    rows = []
+    for mode in MODES:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            rows.append(pool.submit(bench_mode, {**base, "mode": mode}).result())
+        print(f"[warmup] size={args.size} mode={mode} done", file=sys.stderr)
+
+    cols = ["mode", "startup_s", "warmed", f"p99_first{args.window}_ms", "p99_steady_ms",
+            "requests_to_steady", "ms_to_steady", "p99_all_ms", "mean_ms"]
+    print(" ".join(f"{c:>18}" for c in cols))
+    for r in rows:
+        print(" ".join(f"{r[c]!s:>18}" for c in cols))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# backend/cache.py
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe bounded LRU with an optional TTL and a version stamp.
+
+    Every get/put carries the catalog version it was computed against; the first
+    call with a different version drops all entries, so a reloaded catalog can
+    never be served stale results. maxsize=0 disables the cache.
+
+    With `max_bytes`, entries are also evicted (least recently used first) until
+    the sum of `sizeof(value)` fits the budget.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self._sizeof = sizeof if sizeof is not None else (lambda v: 0)
+        self.version: Optional[str] = None
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def _sync(self, version: Optional[str]) -> None:
+        if version != self.version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self.bytes = 0
+            self.version = version
+
+    def _drop(self, key: Hashable) -> None:
+        value, _, size = self._data.pop(key)
+        self.bytes -= size
+
+    def get(self, key: Hashable, version: Optional[str] = None, default: Any = None) -> Any:
+        if not self.maxsize:
+            return default
+        with self._lock:
+            self._sync(version)
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires, _ = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._drop(key)
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any, version: Optional[str] = None) -> None:
+        if not self.maxsize:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        size = int(self._sizeof(value)) if self.max_bytes else 0
+        with self._lock:
+            self._sync(version)
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, expires, size)
+            self.bytes += size
+            while self._data and (
+                len(self._data) > self.maxsize or (self.max_bytes and self.bytes > self.max_bytes)
+            ):
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def canonical_text(s: Optional[str]) -> Optional[str]:
+    """Lowercase + collapse whitespace; `_norm_text` would do the same anyway."""
+    return " ".join(s.lower().split()) if isinstance(s, str) else s
+
+
+def request_key(params: Dict[str, Any]) -> str:
+    """Stable key for a search request: sorted keys, weights sorted, text canonicalized."""
+    p = dict(params)
+    p["query"] = canonical_text(p.get("query"))
+    if p.get("pos_terms") is not None:
+        p["pos_terms"] = [canonical_text(t) for t in p["pos_terms"]]
+    if p.get("biz_weights") is not None:
+        p["biz_weights"] = sorted((str(k), float(v)) for k, v in p["biz_weights"].items())
+    if p.get("alpha") is not None:
+        p["alpha"] = float(p["alpha"])
+    return json.dumps(p, sort_keys=True, default=str)
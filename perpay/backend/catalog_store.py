@@ -0,0 +1,136 @@
+# backend/catalog_store.py
+# Typed columnar copy of the catalog CSV. The CSV is parsed once per content hash into a
+# directory of flat .npy files + meta.json (same layout, atomic write and build lock as
+# snapshot.py); afterwards columns are memory-mapped and only the ones a caller asks for
+# are ever paged in.
+#   - text columns: dictionary-encoded, int32 codes (-1 = missing) + the packed values
+#   - numeric columns: int32 when every value is a whole number that fits, else float32;
+#     id-like columns (`*_id`) keep their int64/float64 so ids stay exact
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+import snapshot
+
+STORE_VERSION = 1
+
+# text columns with more distinct values than this share of the rows (names, urls) are
+# served as plain object columns; below it they become pandas categoricals
+CATEGORICAL_MAX_RATIO = 0.5
+
+_I32 = np.iinfo(np.int32)
+
+
+def _encode_text(s: pd.Series) -> Dict[str, np.ndarray]:
+    codes, uniques = pd.factorize(s.to_numpy(dtype=object), sort=True)
+    return {
+        "codes": codes.astype(np.int32),
+        "values": snapshot.pack_strings(str(u) for u in uniques),
+    }
+
+
+def _encode_numeric(name: str, s: pd.Series) -> np.ndarray:
+    a = s.to_numpy()
+    if a.dtype == bool or name.endswith("_id"):
+        return a
+    finite = np.isfinite(a)
+    if finite.all() and (a == np.round(a)).all() and (a.size == 0 or (a.min() >= _I32.min and a.max() <= _I32.max)):
+        return a.astype(np.int32)
+    return a.astype(np.float32)
+
+
+def convert(csv_path: str, path: str) -> None:
+    """Parse `csv_path` once and write the typed columns to `path`."""
+    df = pd.read_csv(csv_path)
+    arrays: Dict[str, np.ndarray] = {}
+    columns: List[Dict] = []
+    for i, col in enumerate(df.columns):
+        s = df[col]
+        if s.dtype == object:
+            enc = _encode_text(s)
+            arrays[f"c{i}.codes"] = enc["codes"]
+            arrays[f"c{i}.values"] = enc["values"]
+            n_values = int(enc["codes"].max()) + 1 if len(enc["codes"]) else 0
+            columns.append({"name": col, "kind": "text", "n_values": n_values})
+        else:
+            arr = arrays[f"c{i}.data"] = _encode_numeric(col, s)
+            columns.append({"name": col, "kind": "numeric", "dtype": arr.dtype.str})
+    meta = {"rows": len(df), "columns": columns, "store_version": STORE_VERSION}
+    snapshot.save(path, arrays, meta)
+
+
+class CatalogStore:
+    """Read side of a converted catalog: `column()` / `frame()` over memory-mapped arrays."""
+
+    def __init__(self, path: str, mmap: bool = True):
+        self.path = path
+        self._arrays, meta = snapshot.load(path, mmap=mmap)
+        if meta.get("store_version") != STORE_VERSION:
+            raise ValueError(f"Catalog store version {meta.get('store_version')} != {STORE_VERSION}")
+        self.rows = int(meta["rows"])
+        self._meta = {c["name"]: dict(c, slot=f"c{i}") for i, c in enumerate(meta["columns"])}
+        self.columns: List[str] = [c["name"] for c in meta["columns"]]
+
+    @classmethod
+    def open(cls, csv_path: str, store_dir: str) -> "CatalogStore":
+        """The store for this CSV's content under `store_dir`, converting it on first use."""
+        key = snapshot.snapshot_key([csv_path], {"catalog_store": STORE_VERSION})
+        path = snapshot.path_for(store_dir, f"catalog-{key}")
+        with snapshot.build_lock(path):
+            if not snapshot.exists(path):
+                convert(csv_path, path)
+        return cls(path)
+
+    def __contains__(self, col: str) -> bool:
+        return col in self._meta
+
+    def _values(self, slot: str) -> List[str]:
+        return snapshot.unpack_strings(self._arrays[f"{slot}.values"])
+
+    def column(self, col: str, categorical: Optional[bool] = None) -> pd.Series:
+        """
+        One column as a Series. Numerics are zero-copy views of the memmap. Text comes
+        back as a categorical (low cardinality, or `categorical=True`) or as an object
+        column with NaN for missing values, like `pd.read_csv` gives.
+        """
+        m = self._meta[col]
+        slot = m["slot"]
+        if m["kind"] == "numeric":
+            return pd.Series(self._arrays[f"{slot}.data"], name=col, copy=False)
+        codes = self._arrays[f"{slot}.codes"]
+        values = self._values(slot)
+        if categorical is None:
+            categorical = len(values) <= CATEGORICAL_MAX_RATIO * max(self.rows, 1)
+        if categorical:
+            return pd.Series(pd.Categorical.from_codes(codes, categories=values), name=col)
+        lut = np.asarray(values + [np.nan], dtype=object)   # code -1 -> the NaN slot
+        return pd.Series(lut[codes], name=col)
+
+    def frame(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """The requested columns that exist (all by default), in the CSV's order."""
+        wanted = set(self.columns if columns is None else columns)
+        cols = [c for c in self.columns if c in wanted]
+        # copy=False keeps numeric columns as memmap views instead of consolidating them
+        return pd.DataFrame({c: self.column(c) for c in cols}, copy=False)
+
+    def memory_report(self, columns: Optional[Sequence[str]] = None) -> Dict[str, Dict]:
+        """Per column: kind, on-disk bytes and in-memory bytes of `column()`."""
+        out: Dict[str, Dict] = {}
+        for col in (self.columns if columns is None else columns):
+            m = self._meta[col]
+            slot = m["slot"]
+            disk = sum(a.nbytes for k, a in self._arrays.items() if k.startswith(f"{slot}."))
+            s = self.column(col)
+            out[col] = {
+                "kind": "categorical" if isinstance(s.dtype, pd.CategoricalDtype) else str(s.dtype),
+                "disk_bytes": int(disk),
+                "memory_bytes": int(s.memory_usage(index=False, deep=True)),
+            }
+        return out
+
+    def disk_bytes(self) -> int:
+        return int(sum(os.path.getsize(os.path.join(self.path, f)) for f in os.listdir(self.path)))
@@ -0,0 +1,115 @@
+# backend/dense.py
+from __future__ import annotations
+
+import math
+from typing import Dict, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+
+# above this many rows k-means runs in mini-batches
+_MINIBATCH_ROWS = 50_000
+
+
+def _unit_rows(M: np.ndarray) -> np.ndarray:
+    n = np.linalg.norm(M, axis=1, keepdims=True)
+    n[n == 0] = 1.0
+    return M / n
+
+
+class DenseIndex:
+    """
+    LSA projection of the normalized TF-IDF rows + a k-means inverted file (IVF).
+
+    - `Z`: N x dim float32 unit rows (TruncatedSVD of Xn, then re-normalized).
+    - `proj`: F x dim float32, the SVD components transposed. Encoding a sparse query
+      only gathers the rows of its non-zero terms, so a memory-mapped `proj` only pages
+      in what queries touch.
+    - `centroids` (n_lists x dim) + `list_rows` / `list_ptr`: rows grouped by their
+      nearest centroid. A query scores the centroids, probes the best `n_probes` lists
+      and only scores the rows in them; n_probes = n_lists is exhaustive.
+    """
+
+    def __init__(self, Xn: csr_matrix, dim: int = 128, n_lists: Optional[int] = None, seed: int = 0):
+        n_rows, n_feat = Xn.shape
+        dim = max(1, min(int(dim), n_feat - 1, n_rows - 1))
+        # float32 halves memory and time of the randomized SVD; 3 power iterations keep
+        # ~99% of the explained variance of the default 5 on catalog text
+        svd = TruncatedSVD(n_components=dim, algorithm="randomized", n_iter=3, random_state=seed)
+        Z = svd.fit_transform(Xn.astype(np.float32))
+        self.proj = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+        self.Z = _unit_rows(Z).astype(np.float32)
+
+        n_lists = int(n_lists) if n_lists else int(round(math.sqrt(n_rows)))
+        n_lists = max(1, min(n_lists, n_rows))
+        km_cls = MiniBatchKMeans if n_rows > _MINIBATCH_ROWS else KMeans
+        km_kw = {"batch_size": 4096} if km_cls is MiniBatchKMeans else {}
+        km = km_cls(n_clusters=n_lists, random_state=seed, n_init=1, **km_kw).fit(self.Z)
+        self.centroids = _unit_rows(km.cluster_centers_).astype(np.float32)
+        self._set_lists(km.labels_.astype(np.int64))
+
+    def _set_lists(self, labels: np.ndarray) -> None:
+        order = np.argsort(labels, kind="stable")
+        self.list_rows = order.astype(np.int32)
+        self.list_ptr = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=len(self.centroids)), out=self.list_ptr[1:])
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    # ---------- snapshot support ----------
+    def to_arrays(self, prefix: str = "dense") -> Dict[str, np.ndarray]:
+        return {
+            f"{prefix}.Z": self.Z,
+            f"{prefix}.proj": self.proj,
+            f"{prefix}.centroids": self.centroids,
+            f"{prefix}.list_rows": self.list_rows,
+            f"{prefix}.list_ptr": self.list_ptr,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str = "dense") -> "DenseIndex":
+        self = cls.__new__(cls)
+        for name in ("Z", "proj", "centroids", "list_rows", "list_ptr"):
+            setattr(self, name, arrays[f"{prefix}.{name}"])
+        return self
+
+    # ---------- query ----------
+    def encode(self, qn: csr_matrix) -> np.ndarray:
+        """Unit dense vector for a (normalized, 1-row) sparse query; zeros if it has no terms."""
+        if not qn.nnz:
+            return np.zeros(self.proj.shape[1], dtype=np.float32)
+        qd = qn.data.astype(np.float32) @ self.proj[qn.indices]
+        n = float(np.linalg.norm(qd))
+        return qd / n if n > 0 else qd
+
+    def probe(self, qd: np.ndarray, n_probes: int) -> np.ndarray:
+        """Sorted row ids in the `n_probes` lists whose centroids are closest to qd."""
+        n_probes = max(1, min(int(n_probes), self.n_lists))
+        if n_probes >= self.n_lists:
+            return np.arange(len(self.Z), dtype=np.int64)
+        cs = self.centroids @ qd
+        lists = np.argpartition(-cs, n_probes - 1)[:n_probes]
+        rows = np.concatenate([self.list_rows[self.list_ptr[l]: self.list_ptr[l + 1]] for l in lists])
+        return np.sort(rows).astype(np.int64)
+
+    def scores(self, qd: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        return (self.Z[rows] @ qd).astype(np.float64)
+
+    def stats(self) -> Dict[str, int]:
+        sizes = np.diff(self.list_ptr)
+        return {
+            "dim": int(self.Z.shape[1]),
+            "n_lists": self.n_lists,
+            "max_list": int(sizes.max()) if len(sizes) else 0,
+            "bytes": int(self.Z.nbytes + self.proj.nbytes + self.centroids.nbytes + self.list_rows.nbytes),
+        }
+
+
+def fuse(sparse: np.ndarray, dense: np.ndarray, dense_weight: float) -> np.ndarray:
+    """Convex mix of sparse and dense cosine; applied before the business blend."""
+    return (1.0 - dense_weight) * sparse + dense_weight * dense
+
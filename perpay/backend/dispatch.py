@@ -0,0 +1,79 @@
+# backend/dispatch.py
+# Runs CPU-bound search calls off the event loop on a dedicated, bounded thread pool.
+# - single-flight: concurrent calls with the same key share one computation
+# - load shedding: once `max_workers + max_queue` computations are admitted, new ones
+#   fail fast with Saturated (the API turns that into a 503) instead of queuing forever
+# All bookkeeping happens on the event loop thread, so it needs no lock.
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from metrics import SEARCH_DISPATCH
+
+
+class Saturated(RuntimeError):
+    """The executor already holds as many computations as it admits."""
+
+
+class SearchExecutor:
+    def __init__(self, max_workers: int = 4, max_queue: int = 64):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="search")
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._admitted = 0
+        self.computed = self.coalesced = self.shed = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    async def run(self, key: Optional[Hashable], fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Await fn(*args, **kwargs) on the pool. With a key, joins an identical in-flight
+        call when there is one. Raises Saturated when the pool is full.
+        """
+        if key is not None:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.coalesced += 1
+                SEARCH_DISPATCH.inc(outcome="coalesced")
+                # shield: one caller going away must not cancel the shared computation
+                return await asyncio.shield(fut)
+        if self._admitted >= self.capacity:
+            self.shed += 1
+            SEARCH_DISPATCH.inc(outcome="shed")
+            raise Saturated(f"search executor saturated ({self._admitted} in flight)")
+
+        loop = asyncio.get_running_loop()
+        fut = loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+        self._admitted += 1
+        self.computed += 1
+        SEARCH_DISPATCH.inc(outcome="computed")
+        if key is not None:
+            self._inflight[key] = fut
+        fut.add_done_callback(functools.partial(self._done, key))
+        return await asyncio.shield(fut)
+
+    def _done(self, key: Optional[Hashable], fut: asyncio.Future) -> None:
+        self._admitted -= 1
+        if key is not None and self._inflight.get(key) is fut:
+            del self._inflight[key]
+        if not fut.cancelled():
+            fut.exception()   # mark retrieved even if every waiter went away
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._admitted,
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+            "shed": self.shed,
+        }
@@ -0,0 +1,120 @@
+# backend/facets.py
+# Facet counts (brand, category_name_1..3, price bucket) for a candidate set without
+# DataFrame groupbys. Every facet value keeps a packed bitmap of its rows (np.packbits,
+# one bit per row); a count is popcount(value bitmap & candidate bitmap). Facets with
+# more than MAX_BITMAP_VALUES distinct values (brand on a large catalog) would need
+# values x rows/8 bytes of bitmaps, so they keep int32 codes and count with bincount.
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from snapshot import pack_strings, unpack_strings
+
+FACET_COLS = ["brand", "category_name_1", "category_name_2", "category_name_3"]
+# upper edges in dollars; the last bucket is open-ended
+PRICE_EDGES = [25, 50, 100, 250, 500, 1000]
+MAX_BITMAP_VALUES = 256
+
+# bits set in each byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def price_bucket_labels(edges: Sequence[float] = PRICE_EDGES) -> List[str]:
+    bounds = [0] + list(edges)
+    labels = [f"{lo:g}-{hi:g}" for lo, hi in zip(bounds[:-1], bounds[1:])]
+    return labels + [f"{bounds[-1]:g}+"]
+
+
+def _text_codes(s: pd.Series):
+    norm = s.astype(object).where(s.notna(), "").astype(str).str.strip()
+    # cleaned catalog text turns a missing value into "nan"; neither is a facet value
+    norm = norm.where(~norm.isin(["", "nan"]), None)
+    codes, uniques = pd.factorize(norm.to_numpy(dtype=object), sort=True)
+    return codes.astype(np.int32), [str(u) for u in uniques]
+
+
+class Facet:
+    """One facet: value labels + row codes (-1 = no value), and bitmaps when small enough."""
+
+    def __init__(self, codes: np.ndarray, values: List[str]):
+        self.codes = codes
+        self.values = values
+        self._set_bitmaps()
+
+    def _set_bitmaps(self) -> None:
+        self.bitmaps: Optional[np.ndarray] = None
+        if len(self.values) <= MAX_BITMAP_VALUES:
+            onehot = np.zeros((len(self.values), len(self.codes)), dtype=bool)
+            has = self.codes >= 0
+            onehot[self.codes[has], np.flatnonzero(has)] = True
+            self.bitmaps = np.packbits(onehot, axis=1)
+
+    def counts(self, cand_bits: np.ndarray, cand_rows: Optional[np.ndarray]) -> np.ndarray:
+        if self.bitmaps is not None:
+            return _POPCOUNT[self.bitmaps & cand_bits].sum(axis=1, dtype=np.int64)
+        codes = self.codes if cand_rows is None else self.codes[cand_rows]
+        return np.bincount(codes[codes >= 0], minlength=len(self.values))[: len(self.values)]
+
+
+class FacetIndex:
+    def __init__(self, df: pd.DataFrame, price_col: str = "current_price"):
+        self.n_rows = len(df)
+        self.facets: Dict[str, Facet] = {}
+        for col in FACET_COLS:
+            if col in df.columns:
+                self.facets[col] = Facet(*_text_codes(df[col]))
+        if price_col in df.columns:
+            price = pd.to_numeric(df[price_col], errors="coerce").to_numpy(dtype=float)
+            codes = np.searchsorted(PRICE_EDGES, price, side="right").astype(np.int32)
+            codes[~np.isfinite(price)] = -1
+            self.facets["price_bucket"] = Facet(codes, price_bucket_labels())
+
+    # ---------- snapshot support ----------
+    def to_arrays(self, prefix: str = "facets") -> Dict[str, np.ndarray]:
+        out: Dict[str, np.ndarray] = {
+            f"{prefix}.n_rows": np.asarray([self.n_rows], dtype=np.int64),
+            f"{prefix}.names": pack_strings(self.facets),
+        }
+        for name, f in self.facets.items():
+            out[f"{prefix}.{name}.codes"] = f.codes
+            out[f"{prefix}.{name}.values"] = pack_strings(f.values)
+            if f.bitmaps is not None:
+                out[f"{prefix}.{name}.bitmaps"] = f.bitmaps
+        return out
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str = "facets") -> "FacetIndex":
+        self = cls.__new__(cls)
+        self.n_rows = int(arrays[f"{prefix}.n_rows"][0])
+        self.facets = {}
+        for name in unpack_strings(arrays[f"{prefix}.names"]):
+            f = Facet.__new__(Facet)
+            f.codes = arrays[f"{prefix}.{name}.codes"]
+            f.values = unpack_strings(arrays[f"{prefix}.{name}.values"])
+            f.bitmaps = arrays.get(f"{prefix}.{name}.bitmaps")
+            self.facets[name] = f
+        return self
+
+    # ---------- query ----------
+    def counts(self, rows: Optional[np.ndarray], size: int = 20) -> Dict[str, List[Dict]]:
+        """
+        {facet: [{"value", "count"}, ...]} over `rows` (None = every row); values with a
+        zero count are left out, the rest sorted by count desc (price buckets keep their order).
+        """
+        if rows is None:
+            cand_bits = np.packbits(np.ones(self.n_rows, dtype=bool))
+        else:
+            mask = np.zeros(self.n_rows, dtype=bool)
+            mask[rows] = True
+            cand_bits = np.packbits(mask)
+        out: Dict[str, List[Dict]] = {}
+        for name, f in self.facets.items():
+            c = f.counts(cand_bits, rows)
+            nz = np.flatnonzero(c)
+            if name != "price_bucket":
+                nz = nz[np.argsort(-c[nz], kind="stable")][: max(0, int(size))]
+            out[name] = [{"value": f.values[i], "count": int(c[i])} for i in nz]
+        return out
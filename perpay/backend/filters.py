@@ -0,0 +1,387 @@
+# backend/filters.py
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from snapshot import pack_strings, unpack_strings
+
+# Same tokenizers the per-request filters used to run over the concatenated text
+OBJ_TOKEN = re.compile(r"[a-z0-9]+")
+WORD_SPLIT = re.compile(r"[^\w]+")
+
+_MEMO_CAP = 4096
+
+
+class CategoricalColumn:
+    """
+    One column dictionary-encoded on its normalized value (str -> strip -> lower).
+    An equality filter is a single int32 compare instead of a string pipeline.
+    """
+
+    def __init__(self, series: pd.Series):
+        norm = series.astype(str).str.strip().str.lower()
+        codes, uniques = pd.factorize(norm.to_numpy(), sort=True)
+        self.codes = codes.astype(np.int32)
+        self.values: List[str] = [str(u) for u in uniques]
+        self.lookup: Dict[str, int] = {v: i for i, v in enumerate(self.values)}
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {f"{prefix}.codes": self.codes, f"{prefix}.values": pack_strings(self.values)}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str) -> "CategoricalColumn":
+        self = cls.__new__(cls)
+        self.codes = arrays[f"{prefix}.codes"]
+        self.values = unpack_strings(arrays[f"{prefix}.values"])
+        self.lookup = {v: i for i, v in enumerate(self.values)}
+        return self
+
+    def code(self, val: str) -> int:
+        return self.lookup.get((val or "").strip().lower(), -1)
+
+    def mask(self, val: str) -> np.ndarray:
+        c = self.code(val)
+        if c < 0:
+            return np.zeros(len(self.codes), dtype=bool)
+        return self.codes == c
+
+
+class StatusColumn(CategoricalColumn):
+    """
+    CategoricalColumn for a low-cardinality column (current_status): one row bitmap per
+    value, built once, so an equality filter ANDs a ready bitmap instead of comparing codes.
+    """
+
+    def __init__(self, series: pd.Series):
+        super().__init__(series)
+        self._set_bitmaps()
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str) -> "StatusColumn":
+        self = super().from_arrays(arrays, prefix)
+        self._set_bitmaps()
+        return self
+
+    def _set_bitmaps(self) -> None:
+        self.bitmaps = [self.codes == c for c in range(len(self.values))]
+
+    def mask(self, val: str) -> np.ndarray:
+        c = self.code(val)
+        if c < 0:
+            return np.zeros(len(self.codes), dtype=bool)
+        return self.bitmaps[c]
+
+
+class RangeColumn:
+    """
+    Numeric column as its finite values sorted ascending + their row ids. A [lo, hi]
+    filter is two searchsorted calls and one scatter of the rows in between; rows with
+    no value never match. Values are rounded to 1e-4 so float32 store columns compare
+    like the CSV's (19.99 stays 19.99).
+    """
+
+    def __init__(self, series: pd.Series, n_rows: int):
+        vals = np.round(pd.to_numeric(series, errors="coerce").to_numpy(dtype=float), 4)
+        rows = np.flatnonzero(np.isfinite(vals))
+        order = rows[np.argsort(vals[rows], kind="stable")]
+        self.n_rows = n_rows
+        self.values = vals[order]
+        self.rows = order.astype(np.int32)
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {f"{prefix}.values": self.values, f"{prefix}.rows": self.rows}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str, n_rows: int) -> "RangeColumn":
+        self = cls.__new__(cls)
+        self.n_rows = n_rows
+        self.values = arrays[f"{prefix}.values"]
+        self.rows = arrays[f"{prefix}.rows"]
+        return self
+
+    def mask(self, lo: Optional[float], hi: Optional[float]) -> np.ndarray:
+        start = 0 if lo is None else int(np.searchsorted(self.values, lo, side="left"))
+        stop = len(self.values) if hi is None else int(np.searchsorted(self.values, hi, side="right"))
+        m = np.zeros(self.n_rows, dtype=bool)
+        m[self.rows[start:stop]] = True
+        return m
+
+
+class TokenIndex:
+    """
+    token -> posting list (sorted int32 row ids), stored CSR-style.
+
+    Exact lookups are a dict hit + slice. Substring lookups scan the vocabulary
+    (not the rows): every token is joined into one NUL-separated blob so
+    `str.find` does the work in C, and results are memoized per needle.
+    """
+
+    def __init__(self, token_sets: Sequence[Iterable[str]]):
+        self.n_rows = len(token_sets)
+        lens = np.empty(self.n_rows, dtype=np.int64)
+        flat: List[str] = []
+        for i, toks in enumerate(token_sets):
+            toks = {t for t in toks if t}
+            lens[i] = len(toks)
+            flat.extend(toks)
+
+        rows = np.repeat(np.arange(self.n_rows, dtype=np.int64), lens)
+        if flat:
+            codes, uniques = pd.factorize(np.asarray(flat, dtype=object), sort=True)
+        else:
+            codes, uniques = np.zeros(0, dtype=np.int64), np.asarray([], dtype=object)
+        order = np.lexsort((rows, codes))
+
+        self.vocab: List[str] = [str(u) for u in uniques]
+        self.rows = rows[order].astype(np.int32)
+        self.indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(self.vocab)), out=self.indptr[1:])
+        self._finish()
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {
+            f"{prefix}.vocab": pack_strings(self.vocab),
+            f"{prefix}.rows": self.rows,
+            f"{prefix}.indptr": self.indptr,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str, n_rows: int) -> "TokenIndex":
+        self = cls.__new__(cls)
+        self.n_rows = n_rows
+        self.vocab = unpack_strings(arrays[f"{prefix}.vocab"])
+        self.rows = arrays[f"{prefix}.rows"]
+        self.indptr = arrays[f"{prefix}.indptr"]
+        self._finish()
+        return self
+
+    def _finish(self) -> None:
+        self.lookup: Dict[str, int] = {t: i for i, t in enumerate(self.vocab)}
+
+        # substring support: "tok0\0tok1\0..." + start offset of each token
+        self._blob = "\0".join(self.vocab)
+        self._starts = [0] * len(self.vocab)
+        pos = 0
+        for i, t in enumerate(self.vocab):
+            self._starts[i] = pos
+            pos += len(t) + 1
+        self._memo: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.vocab)
+
+    def postings(self, tok_id: int) -> np.ndarray:
+        return self.rows[self.indptr[tok_id]: self.indptr[tok_id + 1]]
+
+    def rows_for(self, tok: str) -> np.ndarray:
+        i = self.lookup.get(tok)
+        return self.postings(i) if i is not None else np.zeros(0, dtype=np.int32)
+
+    def ids_containing(self, needle: str) -> List[int]:
+        if not needle or "\0" in needle:
+            return []
+        out, start = [], 0
+        while True:
+            hit = self._blob.find(needle, start)
+            if hit < 0:
+                return out
+            i = bisect_right(self._starts, hit) - 1
+            out.append(i)
+            start = self._starts[i] + len(self.vocab[i]) + 1   # jump to next token
+
+    def rows_containing(self, needle: str) -> np.ndarray:
+        hit = self._memo.get(needle)
+        if hit is not None:
+            return hit
+        ids = self.ids_containing(needle)
+        if ids:
+            hit = np.unique(np.concatenate([self.postings(i) for i in ids]))
+        else:
+            hit = np.zeros(0, dtype=np.int32)
+        if len(self._memo) >= _MEMO_CAP:
+            self._memo.clear()
+        self._memo[needle] = hit
+        return hit
+
+    def mask(self, rows: np.ndarray) -> np.ndarray:
+        m = np.zeros(self.n_rows, dtype=bool)
+        m[rows] = True
+        return m
+
+
+class FilterIndex:
+    """
+    Everything `_build_candidate_idx` needs, computed once at construction:
+      - categorical codes for brand / category_name_1..4 (normalized equality)
+      - `obj_index`: [a-z0-9]+ tokens of name + categories + request paths
+        (object filter = substring of any token, same as `tok in text`)
+      - `word_index`: \\w words of name + categories (color-alias filter)
+      - `price`: current_price sorted for min_price / max_price ranges
+      - `in_stock` bitmap (current_inventory > 0) and `status` bitmaps per current_status
+    Price, stock and status are hard filters (HARD_KEYS): never dropped, even when the
+    other filters are relaxed because nothing matched.
+    """
+
+    CATEGORICAL_COLS = ["brand", "category_name_1", "category_name_2", "category_name_3", "category_name_4"]
+    OBJ_TEXT_COLS = [
+        "category_name_1", "category_name_2", "category_name_3", "category_name_4",
+        "request_path_1", "request_path_2", "request_path_3", "request_path_4",
+    ]
+    WORD_TEXT_COLS = ["category_name_1", "category_name_2", "category_name_3", "category_name_4"]
+    ANY_CATEGORY_COLS = ["category_name_1", "category_name_2", "category_name_3", "category_name_4"]
+    PRICE_COL = "current_price"
+    STOCK_COL = "current_inventory"
+    STATUS_COL = "current_status"
+    HARD_KEYS = ("min_price", "max_price", "in_stock", "status")
+
+    def __init__(self, df: pd.DataFrame, name_col: str):
+        self.n_rows = len(df)
+        self.categorical: Dict[str, CategoricalColumn] = {
+            col: CategoricalColumn(df[col]) for col in self.CATEGORICAL_COLS if col in df.columns
+        }
+
+        def _texts(cols: List[str]) -> List[List[str]]:
+            cols = [name_col] + [c for c in cols if c in df.columns]
+            # astype(object) first: fillna("") is not allowed on a categorical column
+            return [df[c].astype(object).fillna("").astype(str).str.lower().tolist() for c in cols if c in df.columns]
+
+        obj_cols = _texts(self.OBJ_TEXT_COLS)
+        self.obj_index = TokenIndex([
+            {t for text in row for t in OBJ_TOKEN.findall(text)} for row in zip(*obj_cols)
+        ] if obj_cols else [()] * self.n_rows)
+
+        word_cols = _texts(self.WORD_TEXT_COLS)
+        self.word_index = TokenIndex([
+            {w for text in row for w in WORD_SPLIT.split(text)} for row in zip(*word_cols)
+        ] if word_cols else [()] * self.n_rows)
+
+        self.price = RangeColumn(df[self.PRICE_COL], self.n_rows) if self.PRICE_COL in df.columns else None
+        self.in_stock = None
+        if self.STOCK_COL in df.columns:
+            self.in_stock = (pd.to_numeric(df[self.STOCK_COL], errors="coerce") > 0).to_numpy()
+        self.status = StatusColumn(df[self.STATUS_COL]) if self.STATUS_COL in df.columns else None
+
+    # ---------- snapshot support ----------
+    def to_arrays(self, prefix: str = "filters") -> Dict[str, np.ndarray]:
+        out: Dict[str, np.ndarray] = {f"{prefix}.n_rows": np.asarray([self.n_rows], dtype=np.int64)}
+        for col, cc in self.categorical.items():
+            out.update(cc.to_arrays(f"{prefix}.cat.{col}"))
+        out.update(self.obj_index.to_arrays(f"{prefix}.obj"))
+        out.update(self.word_index.to_arrays(f"{prefix}.word"))
+        if self.price is not None:
+            out.update(self.price.to_arrays(f"{prefix}.price"))
+        if self.in_stock is not None:
+            out[f"{prefix}.in_stock"] = np.packbits(self.in_stock)
+        if self.status is not None:
+            out.update(self.status.to_arrays(f"{prefix}.status"))
+        return out
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str = "filters") -> "FilterIndex":
+        self = cls.__new__(cls)
+        self.n_rows = int(arrays[f"{prefix}.n_rows"][0])
+        self.categorical = {
+            col: CategoricalColumn.from_arrays(arrays, f"{prefix}.cat.{col}")
+            for col in cls.CATEGORICAL_COLS if f"{prefix}.cat.{col}.codes" in arrays
+        }
+        self.obj_index = TokenIndex.from_arrays(arrays, f"{prefix}.obj", self.n_rows)
+        self.word_index = TokenIndex.from_arrays(arrays, f"{prefix}.word", self.n_rows)
+        self.price = None
+        if f"{prefix}.price.values" in arrays:
+            self.price = RangeColumn.from_arrays(arrays, f"{prefix}.price", self.n_rows)
+        self.in_stock = None
+        if f"{prefix}.in_stock" in arrays:
+            self.in_stock = np.unpackbits(arrays[f"{prefix}.in_stock"], count=self.n_rows).astype(bool)
+        self.status = None
+        if f"{prefix}.status.codes" in arrays:
+            self.status = StatusColumn.from_arrays(arrays, f"{prefix}.status")
+        return self
+
+    # ---------- mask builders ----------
+    def eq(self, col: str, val: Optional[str]) -> Optional[np.ndarray]:
+        """Normalized equality mask, or None if the column is not indexed."""
+        cc = self.categorical.get(col)
+        return cc.mask(val) if cc is not None else None
+
+    def eq_any(self, cols: Sequence[str], val: str) -> Optional[np.ndarray]:
+        parts = [self.categorical[c].mask(val) for c in cols if c in self.categorical]
+        if not parts:
+            return None
+        out = parts[0]
+        for p in parts[1:]:
+            out |= p
+        return out
+
+    def contains_any(self, toks: Iterable[str]) -> np.ndarray:
+        """Rows whose obj-text contains any of `toks` as a substring."""
+        hits = [self.obj_index.rows_containing(t) for t in toks]
+        return self.obj_index.mask(np.concatenate(hits) if hits else np.zeros(0, dtype=np.int32))
+
+    def has_word(self, words: Iterable[str]) -> np.ndarray:
+        """Rows whose name/category text contains any of `words` as a whole word."""
+        hits = [self.word_index.rows_for(w) for w in words]
+        return self.word_index.mask(np.concatenate(hits) if hits else np.zeros(0, dtype=np.int32))
+
+    def has_value(self, col: str, val: str) -> bool:
+        cc = self.categorical.get(col)
+        return cc is not None and cc.code(val) >= 0
+
+    def candidate_mask(
+        self,
+        *,
+        brand: Optional[str] = None,
+        eq: Optional[Dict[str, str]] = None,
+        category_any: Optional[str] = None,
+        obj_toks: Optional[Iterable[str]] = None,
+        color_words: Optional[Iterable[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+        status: Optional[str] = None,
+        soft: bool = True,
+    ) -> np.ndarray:
+        """
+        AND of all given filters. With `soft`, brand / category_any are dropped when they
+        match no row of this index. A sharded caller decides that on the global value
+        dictionaries instead and passes soft=False to every shard.
+        The hard filters go first: they are array lookups and shrink the mask the
+        token filters are ANDed into.
+        """
+        mask = np.ones(self.n_rows, dtype=bool)
+        if (min_price is not None or max_price is not None) and self.price is not None:
+            mask &= self.price.mask(min_price, max_price)
+        if in_stock and self.in_stock is not None:
+            mask &= self.in_stock
+        if status and self.status is not None:
+            mask &= self.status.mask(status)
+        if brand:
+            bmask = self.eq("brand", brand)
+            if bmask is not None and (bmask.any() or not soft):
+                mask &= bmask
+        for col, val in (eq or {}).items():
+            cmask = self.eq(col, val)
+            if cmask is not None:
+                mask &= cmask
+        if category_any:
+            anymask = self.eq_any(self.ANY_CATEGORY_COLS, category_any)
+            if anymask is not None and (anymask.any() or not soft):
+                mask &= anymask
+        if obj_toks:
+            mask &= self.contains_any(obj_toks)
+        if color_words:
+            mask &= self.has_word(color_words)
+        return mask
+
+
+def hard_spec(spec: Dict) -> Optional[Dict]:
+    """The hard filters of a `candidate_mask` spec (None if it has none): what is left
+    when the soft filters are relaxed."""
+    hard = {k: spec.get(k) for k in FilterIndex.HARD_KEYS}
+    if hard["min_price"] is None and hard["max_price"] is None and not hard["in_stock"] and not hard["status"]:
+        return None
+    return hard
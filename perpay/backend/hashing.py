@@ -0,0 +1,148 @@
+# backend/hashing.py
+# Bounded-memory TF-IDF (CosineSearch(vectorizer="hashed")). Terms are hashed with a
+# signed murmurhash into `n_features` buckets, so there is no n-gram vocabulary: memory
+# is capped by the bucket budget, not by the catalog.
+# - Unigrams and 2..3-grams are hashed separately, so rare n-grams can be pruned (an
+#   n-gram bucket seen in fewer than NGRAM_MIN_DF documents is dropped) without losing
+#   unigrams: a model number seen once still matches.
+# - Only buckets that survive (seen in 1..max_df documents) become matrix columns, kept
+#   as one sorted int32 array; a query's buckets map onto them with a searchsorted.
+#   Unused buckets cost nothing downstream, and unseen query terms are ignored like
+#   out-of-vocabulary words.
+# - IDF is computed per bucket after pruning. Everything is float32 with int32 indices.
+# Signed hashing gives negative weights; InvertedIndexScorer bounds them with col_min.
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.utils import murmurhash3_32
+
+HASH_VERSION = 1
+NGRAM_MIN_DF = 2        # hashed 2..3-gram buckets seen in fewer documents are pruned
+
+
+class HashedTfidf:
+    """TfidfVectorizer stand-in (`fit_transform` / `transform`) over hashed buckets."""
+
+    def __init__(self, n_features: int = 1 << 20, *, lowercase: bool = True, stop_words="english",
+                 strip_accents="unicode", ngram_range=(1, 3), sublinear_tf: bool = True,
+                 smooth_idf: bool = True, min_df=1, max_df=1.0, ngram_min_df: int = NGRAM_MIN_DF):
+        """Takes TfidfVectorizer's keywords (CosineSearch.TFIDF_PARAMS) plus the bucket budget."""
+        self.n_features = int(n_features)
+        self.text_params = dict(lowercase=lowercase, stop_words=stop_words, strip_accents=strip_accents)
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.sublinear_tf = sublinear_tf
+        self.smooth_idf = smooth_idf
+        self.max_df = max_df
+        self.ngram_min_df = int(ngram_min_df)
+        self.columns_: Optional[np.ndarray] = None      # sorted bucket ids that are matrix columns
+        self.idf_: Optional[np.ndarray] = None          # per column
+        self.ngram_keep_: Optional[np.ndarray] = None   # per bucket: n-grams seen in >= ngram_min_df docs
+        self.term_df_: Dict[str, int] = {}              # unigram -> df, build time only
+        self._analyzer = None
+        self._hasher = FeatureHasher(n_features=self.n_features, input_type="string",
+                                     alternate_sign=True, dtype=np.float32)
+
+    @property
+    def fitted(self) -> bool:
+        return self.columns_ is not None
+
+    def _tokens(self, texts) -> List[List[str]]:
+        if self._analyzer is None:
+            # built once: sklearn re-validates the stop list on every build_analyzer()
+            self._analyzer = HashingVectorizer(ngram_range=self.ngram_range, **self.text_params).build_analyzer()
+        return [self._analyzer(t) for t in texts]
+
+    # ---------- fit ----------
+    def fit_transform(self, texts) -> csr_matrix:
+        n = len(texts)
+        # unigrams through a (temporary) vocabulary: one pass gives both the hashed
+        # counts and the word document frequencies the spelling index needs
+        cv = CountVectorizer(ngram_range=(1, 1), dtype=np.float32, **self.text_params)
+        C = cv.fit_transform(texts)
+        terms = cv.get_feature_names_out()
+        h = np.fromiter((murmurhash3_32(str(t), seed=0) for t in terms), dtype=np.int64, count=len(terms))
+        P = csr_matrix(
+            (np.where(h < 0, -1.0, 1.0).astype(np.float32), (np.arange(len(terms)), np.abs(h) % self.n_features)),
+            shape=(len(terms), self.n_features),
+        )
+        X = (C @ P).tocsr()
+        self.term_df_ = {str(t): int(d) for t, d in zip(terms, np.diff(C.tocsc().indptr))}
+        del C, P, cv
+
+        if self.ngram_range[1] >= 2:
+            lo = max(2, self.ngram_range[0])
+            G = HashingVectorizer(n_features=self.n_features, alternate_sign=True, norm=None,
+                                  ngram_range=(lo, self.ngram_range[1]), dtype=np.float32,
+                                  **self.text_params).transform(texts)
+            G.eliminate_zeros()
+            self.ngram_keep_ = np.bincount(G.indices, minlength=self.n_features) >= self.ngram_min_df
+            X = X + self._prune_ngrams(G)
+        X = X.tocsr()
+        X.eliminate_zeros()
+
+        # corpus-wide buckets carry no signal (TfidfVectorizer's max_df)
+        df = np.bincount(X.indices, minlength=self.n_features)
+        max_df = self.max_df if isinstance(self.max_df, int) else self.max_df * n
+        self.columns_ = np.flatnonzero((df > 0) & (df <= max_df)).astype(np.int32)
+        smooth = int(self.smooth_idf)
+        self.idf_ = (np.log((n + smooth) / (df[self.columns_] + smooth)) + 1.0).astype(np.float32)
+        return self._weight(self._to_columns(X))
+
+    def _prune_ngrams(self, G: csr_matrix) -> csr_matrix:
+        G = G.tocsr(copy=True)
+        G.data[~self.ngram_keep_[G.indices]] = 0.0
+        G.eliminate_zeros()
+        return G
+
+    def _to_columns(self, X: csr_matrix) -> csr_matrix:
+        """Bucket ids -> column positions; buckets that are not columns are dropped."""
+        cols = self.columns_
+        pos = np.searchsorted(cols, X.indices)
+        hit = pos < len(cols)
+        hit[hit] = cols[pos[hit]] == X.indices[hit]
+        rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+        return csr_matrix((X.data[hit], (rows[hit], pos[hit])), shape=(X.shape[0], len(cols)), dtype=np.float32)
+
+    def _weight(self, X: csr_matrix) -> csr_matrix:
+        if self.sublinear_tf:
+            X.data = np.sign(X.data) * (1.0 + np.log(np.abs(X.data)))
+        X.data *= self.idf_[X.indices]
+        X = normalize(X, norm="l2", copy=False)
+        X.indices = X.indices.astype(np.int32, copy=False)
+        X.indptr = X.indptr.astype(np.int32, copy=False)
+        return X
+
+    # ---------- transform ----------
+    def transform(self, texts) -> csr_matrix:
+        if not self.fitted:
+            return csr_matrix((len(texts), 0), dtype=np.float32)
+        toks = self._tokens(texts)
+        X = self._hasher.transform([[t for t in ts if " " not in t] for ts in toks])
+        if self.ngram_keep_ is not None:
+            X = X + self._prune_ngrams(self._hasher.transform([[t for t in ts if " " in t] for ts in toks]))
+        X = X.tocsr()
+        X.eliminate_zeros()
+        return self._weight(self._to_columns(X))
+
+    def pop_term_df(self) -> Dict[str, int]:
+        out, self.term_df_ = self.term_df_, {}
+        return out
+
+    # ---------- snapshot support ----------
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        out = {f"{prefix}.columns": self.columns_, f"{prefix}.idf": self.idf_}
+        if self.ngram_keep_ is not None:
+            out[f"{prefix}.ngram_keep"] = np.packbits(self.ngram_keep_)
+        return out
+
+    def load_arrays(self, arrays: Dict[str, np.ndarray], prefix: str) -> None:
+        self.columns_ = np.asarray(arrays[f"{prefix}.columns"])
+        self.idf_ = np.asarray(arrays[f"{prefix}.idf"])
+        if f"{prefix}.ngram_keep" in arrays:
+            self.ngram_keep_ = np.unpackbits(arrays[f"{prefix}.ngram_keep"], count=self.n_features).astype(bool)
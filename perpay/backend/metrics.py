@@ -0,0 +1,179 @@
+# backend/metrics.py
+# Minimal in-process metrics rendered in the Prometheus text exposition format.
+# Histograms use fixed cumulative buckets so an observe() is a bisect + two adds under
+# a lock; no client library needed. One module-level REGISTRY per process.
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds; 100us .. 10s
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# rows
+SIZE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(labels)} {_fmt_num(v)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, n) in sorted(self._series.items()):
+                cum = 0
+                for le, c in zip(self.buckets + (float("inf"),), counts):
+                    cum += c
+                    lines.append(f"{self.name}_bucket{_fmt_labels(labels, ('le', _fmt_num(le)))} {cum}")
+                lines.append(f"{self.name}_sum{_fmt_labels(labels)} {_fmt_num(total)}")
+                lines.append(f"{self.name}_count{_fmt_labels(labels)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, **kw):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, help, **kw)
+            return m
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get(Counter, name, help)
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SEARCH_STAGE_SECONDS = REGISTRY.histogram(
+    "search_stage_seconds", "Time spent in each stage of CosineSearch.search"
+)
+SEARCH_CANDIDATES = REGISTRY.histogram(
+    "search_candidates", "Candidate rows left after filtering", buckets=SIZE_BUCKETS
+)
+SEARCH_RESULTS = REGISTRY.histogram(
+    "search_results", "Items returned per search", buckets=SIZE_BUCKETS
+)
+SEARCH_CACHE = REGISTRY.counter("search_result_cache_total", "Result cache lookups by outcome")
+SEARCH_DISPATCH = REGISTRY.counter(
+    "search_dispatch_total", "Search executor admissions by outcome (computed, coalesced, shed)"
+)
+HTTP_SECONDS = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency by route")
+CATALOG_RELOADS = REGISTRY.counter(
+    "catalog_reloads_total", "Catalog hot reloads by outcome (swapped, unchanged, failed)"
+)
+QUERY_LOG_ENTRIES = REGISTRY.counter(
+    "query_log_entries_total", "Query log entries by outcome (written, dropped)"
+)
+SEARCH_RERANK = REGISTRY.counter(
+    "search_rerank_total", "Second-stage reranks by outcome (reranked, or why the stage-1 order was served)"
+)
+
+
+class StageTimer:
+    """
+    Lap timer for the search hot path: `lap(stage)` charges the time since the previous
+    lap to `stage`. Only perf_counter() calls and a dict update per stage.
+    """
+
+    __slots__ = ("stages", "n_candidates", "_t0", "_t")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.n_candidates: Optional[int] = None
+        self._t0 = self._t = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._t)
+        self._t = now
+
+    def total(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def record(self, n_results: Optional[int] = None) -> Dict[str, float]:
+        """Push the laps (+ total) into the histograms; returns them in milliseconds."""
+        total = self.total()
+        for stage, sec in self.stages.items():
+            SEARCH_STAGE_SECONDS.observe(sec, stage=stage)
+        SEARCH_STAGE_SECONDS.observe(total, stage="total")
+        if self.n_candidates is not None:
+            SEARCH_CANDIDATES.observe(self.n_candidates)
+        if n_results is not None:
+            SEARCH_RESULTS.observe(n_results)
+        out = {k: round(v * 1000.0, 3) for k, v in self.stages.items()}
+        out["total"] = round(total * 1000.0, 3)
+        return out
@@ -0,0 +1,238 @@
+# backend/order_features.py
+# Per-product order-outcome features (the RETURN_RATES_PATH file the engine merges),
+# built from user_order_history.csv extracts by streaming them in chunks.
+# Running counters live in a small state file (.npz): one row per product plus, per
+# extract, the byte offset already counted. A rerun therefore only reads what is new —
+# extra extract files, or rows appended to one it has seen.
+#
+#   cd perpay/backend
+#   python -m order_features ../data/user_order_history.csv --state /tmp/order_state.npz \
+#       --out return_rates.pkl
+#
+# Each extract row is one order line; extracts are expected to hold disjoint lines
+# (a daily / incremental dump). Use --rebuild after rewriting an extract in place.
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+STATE_VERSION = 1
+CHUNK_ROWS = 200_000
+# products with fewer order lines than this are left out of the feature file
+MIN_ORDERS = 6
+
+# counter -> lifecycle column whose date marks the outcome ("total_orders" counts every line)
+OUTCOMES = {
+    "approved_count": "order_approved_date",
+    "denied_count": "order_denied_date",
+    "canceled_count": "order_canceled_date",
+    "refund_count": "order_refunded_date",
+    "complete_count": "order_complete_date",
+}
+COUNTERS = ["total_orders"] + list(OUTCOMES)
+# feature -> numerator counter, over total_orders
+RATES = {
+    "return_rate": "refund_count",
+    "cancel_rate": "canceled_count",
+    "denial_rate": "denied_count",
+}
+
+_FINGERPRINT_BYTES = 1 << 16
+
+
+class OrderCounts:
+    """Running per-product counters (int64 [n_products, len(COUNTERS)], sorted by product_id)."""
+
+    def __init__(self, product_ids: Optional[np.ndarray] = None, counts: Optional[np.ndarray] = None):
+        self.product_ids = np.zeros(0, dtype=np.int64) if product_ids is None else product_ids
+        self.counts = np.zeros((0, len(COUNTERS)), dtype=np.int64) if counts is None else counts
+
+    def add(self, product_ids: np.ndarray, counts: np.ndarray) -> None:
+        ids = np.concatenate([self.product_ids, product_ids])
+        uniq, inv = np.unique(ids, return_inverse=True)
+        both = np.concatenate([self.counts, counts])
+        merged = np.empty((len(uniq), len(COUNTERS)), dtype=np.int64)
+        for j in range(len(COUNTERS)):
+            merged[:, j] = np.bincount(inv, weights=both[:, j], minlength=len(uniq))
+        self.product_ids, self.counts = uniq, merged
+
+    def add_chunk(self, chunk: pd.DataFrame) -> int:
+        """Count one chunk of extract rows; returns the number of rows."""
+        pid = pd.to_numeric(chunk["product_id"], errors="coerce")
+        chunk = chunk[pid.notna()]
+        pid = pid[pid.notna()].to_numpy(dtype=np.int64)
+        if not len(pid):
+            return 0
+        uniq, inv = np.unique(pid, return_inverse=True)
+        counts = np.empty((len(uniq), len(COUNTERS)), dtype=np.int64)
+        counts[:, 0] = np.bincount(inv, minlength=len(uniq))
+        for j, col in enumerate(OUTCOMES.values(), start=1):
+            hit = chunk[col].notna().to_numpy() if col in chunk.columns else np.zeros(len(pid), dtype=bool)
+            counts[:, j] = np.bincount(inv[hit], minlength=len(uniq))
+        self.add(uniq, counts)
+        return len(pid)
+
+    def features(self, min_orders: int = MIN_ORDERS) -> pd.DataFrame:
+        """The feature frame: index product_id, counters + rates, sorted by return_rate desc."""
+        df = pd.DataFrame(self.counts, columns=COUNTERS, index=pd.Index(self.product_ids, name="product_id"))
+        df = df[df["total_orders"] >= max(1, int(min_orders))]
+        for rate, num in RATES.items():
+            df[rate] = df[num] / df["total_orders"]
+        df[COUNTERS] = df[COUNTERS].astype(np.int32)
+        cols = ["refund_count", "total_orders", "return_rate"]
+        df = df[cols + [c for c in df.columns if c not in cols]]
+        return df.sort_values("return_rate", ascending=False, kind="stable")
+
+
+# ---------- state file ----------
+def load_state(path: Optional[str]) -> Tuple[OrderCounts, Dict[str, Dict]]:
+    """Counters and the per-extract progress ({abs path: {offset, fingerprint, rows}})."""
+    if not path or not os.path.exists(path):
+        return OrderCounts(), {}
+    with np.load(path, allow_pickle=False) as z:
+        meta = json.loads(str(z["meta"]))
+        if meta.get("state_version") != STATE_VERSION or meta.get("counters") != COUNTERS:
+            raise ValueError(f"Order state {path} was written by another version; rerun with --rebuild")
+        return OrderCounts(z["product_ids"], z["counts"]), meta["sources"]
+
+
+def save_state(path: str, counts: OrderCounts, sources: Dict[str, Dict]) -> None:
+    meta = {"state_version": STATE_VERSION, "counters": COUNTERS, "sources": sources}
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, product_ids=counts.product_ids, counts=counts.counts, meta=np.asarray(json.dumps(meta)))
+    os.replace(tmp, path)
+
+
+def _fingerprint(path: str, offset: int) -> str:
+    """Hash of the head and of the bytes just before `offset`: detects a rewritten extract."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        h.update(f.read(min(offset, _FINGERPRINT_BYTES)))
+        f.seek(max(0, offset - _FINGERPRINT_BYTES))
+        h.update(f.read(min(offset, _FINGERPRINT_BYTES)))
+    return h.hexdigest()[:32]
+
+
+class _Window(io.RawIOBase):
+    """Read-only view of bytes [start, end) of an open binary file."""
+
+    def __init__(self, fh, start: int, end: int):
+        self._fh, self._left = fh, end - start
+        fh.seek(start)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        n = self._fh.readinto(memoryview(buf)[: min(len(buf), self._left)])
+        self._left -= n
+        return n
+
+
+def _complete_end(fh, size: int) -> int:
+    """Offset just past the last newline: a partially written last row waits for the next run."""
+    pos = size
+    while pos > 0:
+        step = min(pos, 1 << 16)
+        fh.seek(pos - step)
+        nl = fh.read(step).rfind(b"\n")
+        if nl >= 0:
+            return pos - step + nl + 1
+        pos -= step
+    return 0
+
+
+def read_new(path: str, source: Dict, usecols: Sequence[str],
+             chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Chunks (all str columns) of the rows of `path` past `source["offset"]`, limited to the
+    `usecols` the extract has. Once exhausted, advances `source` (offset, fingerprint).
+    """
+    offset = source.get("offset", 0)
+    if offset and _fingerprint(path, offset) != source.get("fingerprint"):
+        raise ValueError(f"{path} changed before offset {offset}; rerun with --rebuild")
+    with open(path, "rb") as fh:
+        header = fh.readline()
+        names = pd.read_csv(io.BytesIO(header), nrows=0).columns.tolist()
+        if "product_id" not in names:
+            raise ValueError(f"{path} has no product_id column")
+        start = max(offset, len(header))
+        end = _complete_end(fh, os.fstat(fh.fileno()).st_size)
+        if end > start:
+            window = io.BufferedReader(_Window(fh, start, end), buffer_size=1 << 20)
+            yield from pd.read_csv(window, header=None, names=names, dtype=str,
+                                   usecols=[c for c in usecols if c in names],
+                                   chunksize=max(1, int(chunk_rows)))
+        source["offset"] = max(end, offset)
+    source["fingerprint"] = _fingerprint(path, source["offset"])
+
+
+def ingest(path: str, counts: OrderCounts, source: Optional[Dict], chunk_rows: int = CHUNK_ROWS) -> Dict:
+    """Count the rows of `path` past `source["offset"]`; returns the updated source entry."""
+    source = dict(source or {"offset": 0, "rows": 0})
+    for chunk in read_new(path, source, ["product_id"] + list(OUTCOMES.values()), chunk_rows):
+        source["rows"] += counts.add_chunk(chunk)
+    return source
+
+
+def write_features(df: pd.DataFrame, out: str) -> None:
+    tmp = f"{out}.tmp"
+    df.to_pickle(tmp)
+    os.replace(tmp, out)   # the engine may be reading the old file
+
+
+def run(orders: Sequence[str], state_path: Optional[str], out: str, *, rebuild: bool = False,
+        chunk_rows: int = CHUNK_ROWS, min_orders: int = MIN_ORDERS) -> Dict:
+    """Fold new extract rows into the state and rewrite the feature file; returns a summary."""
+    t0 = time.perf_counter()
+    counts, sources = (OrderCounts(), {}) if rebuild else load_state(state_path)
+    new_rows = 0
+    for p in orders:
+        key = os.path.abspath(p)
+        before = sources.get(key, {}).get("rows", 0)
+        sources[key] = ingest(p, counts, sources.get(key), chunk_rows=chunk_rows)
+        new_rows += sources[key]["rows"] - before
+    if state_path:
+        save_state(state_path, counts, sources)
+    df = counts.features(min_orders)
+    write_features(df, out)
+    return {
+        "new_rows": new_rows,
+        "total_rows": sum(s["rows"] for s in sources.values()),
+        "products": len(counts.product_ids),
+        "written": len(df),
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Per-product return / cancel rates from order extracts")
+    ap.add_argument("orders", nargs="+", help="user_order_history.csv extract(s)")
+    ap.add_argument("--state", default=None, help="running counters; reruns only read new rows")
+    ap.add_argument("--out", default=os.getenv("RETURN_RATES_PATH", "return_rates.pkl"))
+    ap.add_argument("--rebuild", action="store_true", help="ignore the state and recount everything")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--min-orders", type=int, default=MIN_ORDERS)
+    args = ap.parse_args(argv)
+    try:
+        summary = run(args.orders, args.state, args.out, rebuild=args.rebuild,
+                      chunk_rows=args.chunk_rows, min_orders=args.min_orders)
+    except ValueError as e:
+        print(f"[order_features] {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
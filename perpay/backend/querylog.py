@@ -0,0 +1,173 @@
+# backend/querylog.py
+# Append-only log of served /search bodies, used to warm a fresh engine's caches.
+# `append` never blocks the request: it drops the body into a bounded queue (or drops
+# the body itself when the writer has fallen that far behind). One writer thread drains
+# the queue in batches and appends them as compact JSON lines (`{"t": epoch_s, "q":
+# body-without-defaults}`) with a single write per batch. Files rotate by size:
+# queries.log -> queries.log.1 -> ... -> queries.log.<keep>, oldest deleted.
+# `top(n)` reads the files back and returns the n most frequent recent bodies.
+from __future__ import annotations
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from metrics import QUERY_LOG_ENTRIES
+from utils import dumps
+
+LOG_NAME = "queries.log"
+
+
+class QueryLog:
+    def __init__(
+        self,
+        directory: str,
+        *,
+        defaults: Optional[Dict[str, Any]] = None,
+        max_bytes: int = 16 << 20,
+        keep: int = 4,
+        flush_s: float = 1.0,
+        batch: int = 1024,
+        queue_size: int = 10000,
+    ):
+        """
+        Keys of a body whose value equals `defaults[key]` are not written (and come back
+        as the caller's defaults on replay).
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, LOG_NAME)
+        self.defaults = dict(defaults or {})
+        self.max_bytes = max(1, int(max_bytes))
+        self.keep = max(0, int(keep))
+        self.flush_s = float(flush_s)
+        self.batch = max(1, int(batch))
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._stopped = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self._writer = threading.Thread(target=self._run, name="query-log", daemon=True)
+        self._writer.start()
+
+    # ---------- request side ----------
+    def append(self, body: Dict[str, Any]) -> bool:
+        """Queue one body for the writer; False when it was dropped (queue full / closed)."""
+        if self._stopped.is_set():
+            return False
+        q = {k: v for k, v in body.items() if k not in self.defaults or v != self.defaults[k]}
+        try:
+            self._queue.put_nowait(dumps({"t": int(time.time()), "q": q}) + b"\n")
+        except queue.Full:
+            self.dropped += 1
+            QUERY_LOG_ENTRIES.inc(outcome="dropped")
+            return False
+        return True
+
+    # ---------- writer thread ----------
+    def _run(self) -> None:
+        done = False
+        while not done:
+            try:
+                first = self._queue.get(timeout=self.flush_s)
+            except queue.Empty:
+                continue
+            lines = []
+            item = first
+            while True:
+                if item is None:       # close() sentinel: write what we have, then exit
+                    done = True
+                    break
+                lines.append(item)
+                if len(lines) >= self.batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if lines:
+                self._write(lines)
+
+    def _write(self, lines: List[bytes]) -> None:
+        try:
+            with open(self.path, "ab") as f:
+                f.write(b"".join(lines))
+                size = f.tell()
+        except OSError:
+            self.dropped += len(lines)
+            QUERY_LOG_ENTRIES.inc(len(lines), outcome="dropped")
+            return
+        self.written += len(lines)
+        QUERY_LOG_ENTRIES.inc(len(lines), outcome="written")
+        if size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        if self.keep == 0:
+            os.remove(self.path)
+            return
+        oldest = f"{self.path}.{self.keep}"
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for i in range(self.keep - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush what is queued and stop the writer."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._writer.join(timeout)
+
+    # ---------- replay ----------
+    def files(self) -> List[str]:
+        """Log files, oldest first."""
+        paths = [f"{self.path}.{i}" for i in range(self.keep, 0, -1)] + [self.path]
+        return [p for p in paths if os.path.exists(p)]
+
+    def top(self, n: int, max_age_s: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        The `n` most frequent bodies logged in the last `max_age_s` seconds (all files
+        when None), most frequent first; ties go to the more recent body.
+        """
+        if n <= 0:
+            return []
+        cutoff = time.time() - max_age_s if max_age_s else None
+        counts: Counter = Counter()
+        last: Dict[str, int] = {}
+        bodies: Dict[str, Dict[str, Any]] = {}
+        seq = 0
+        for path in self.files():
+            if cutoff is not None and os.path.getmtime(path) < cutoff:
+                continue   # every line in it is older
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue   # torn last line after a crash
+                    if cutoff is not None and rec.get("t", 0) < cutoff:
+                        continue
+                    key = json.dumps(rec["q"], sort_keys=True)
+                    counts[key] += 1
+                    last[key] = seq
+                    bodies[key] = rec["q"]
+                    seq += 1
+        ranked = sorted(counts, key=lambda k: (-counts[k], -last[k]))
+        return [bodies[k] for k in ranked[:n]]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory, "written": self.written, "dropped": self.dropped,
+            "queued": self._queue.qsize(), "files": len(self.files()),
+        }
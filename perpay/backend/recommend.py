@@ -0,0 +1,304 @@
+# backend/recommend.py
+# Co-purchase ("bought together") recommendations from user_order_history.csv.
+#   X      user x product purchase counts (CSR); denied or canceled lines do not count
+#   C      co-purchase counts between products, Xb.T @ Xb over the binary X (CSR)
+#   table  each product's top-N neighbours by cosine C[i,j] / sqrt(C[i,i] * C[j,j]),
+#          CSR with int32 columns and float32 scores, best first
+# A lookup gathers the table rows of the user's products and sums them, so it costs about
+# history x N whatever the order volume. `update()` reads only new extract rows (byte
+# offsets, as in order_features), adds their effect to C and recomputes just the table
+# rows whose neighbours could have moved. Readers keep the previous tables until the new
+# ones are swapped in as one object.
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from order_features import CHUNK_ROWS, read_new
+from scoring import topk_order
+
+STATE_VERSION = 1
+N_NEIGHBORS = 50
+# products of one user that feed a lookup (the most often bought ones)
+MAX_HISTORY = 50
+# order lines with one of these dates set are not purchases
+EXCLUDED_OUTCOMES = ("order_denied_date", "order_canceled_date")
+
+
+class Tables(NamedTuple):
+    user_ids: np.ndarray   # sorted int64
+    item_ids: np.ndarray   # sorted int64
+    X: csr_matrix          # users x items, int32 line counts
+    C: csr_matrix          # items x items, int32 co-purchase counts (diagonal = buyers)
+    table: csr_matrix      # items x items, float32 top-N neighbours per row
+    buyers: np.ndarray     # per item, users who bought it (the diagonal of C)
+    popular: np.ndarray    # item positions by buyers desc (cold-start fallback)
+
+
+def _empty_tables() -> Tables:
+    ids = np.zeros(0, dtype=np.int64)
+    return Tables(ids, ids, csr_matrix((0, 0), dtype=np.int32), csr_matrix((0, 0), dtype=np.int32),
+                  csr_matrix((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64))
+
+
+def _binary(m: csr_matrix) -> csr_matrix:
+    b = m.copy()
+    b.data = np.ones_like(b.data)
+    return b
+
+
+def _remap(m: csr_matrix, row_map: np.ndarray, col_map: np.ndarray, shape: Tuple[int, int]) -> csr_matrix:
+    """`m` re-indexed into a bigger id space; the maps are increasing, so row order is kept."""
+    lengths = np.zeros(shape[0], dtype=np.int64)
+    lengths[row_map] = np.diff(m.indptr)
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    return csr_matrix((m.data, col_map[m.indices].astype(np.int32), indptr), shape=shape)
+
+
+def _ranges(indptr: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Positions of every stored entry of `rows`, row after row."""
+    starts, lengths = indptr[rows], indptr[rows + 1] - indptr[rows]
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+
+def neighbors(C: csr_matrix, rows: np.ndarray, n: int) -> csr_matrix:
+    """Top-`n` cosine neighbours of each of `rows` (one output row each), ties by position."""
+    deg = C.diagonal().astype(np.float64)
+    sub = C[rows].tocoo()
+    keep = rows[sub.row] != sub.col
+    r, c = sub.row[keep], sub.col[keep]
+    sim = sub.data[keep] / np.sqrt(deg[rows][r] * deg[c])
+    order = np.lexsort((c, -sim, r))
+    r, c, sim = r[order], c[order], sim[order]
+    rank = np.arange(len(r)) - np.searchsorted(r, r)
+    keep = rank < n
+    counts = np.bincount(r[keep], minlength=len(rows))
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+    return csr_matrix((sim[keep].astype(np.float32), c[keep].astype(np.int32), indptr),
+                      shape=(len(rows), C.shape[1]))
+
+
+def _splice(table: csr_matrix, rows: np.ndarray, new: csr_matrix) -> csr_matrix:
+    """`table` with `rows` replaced by the rows of `new` (in the same order)."""
+    n = table.shape[0]
+    replaced = np.zeros(n, dtype=bool)
+    replaced[rows] = True
+    lengths = np.diff(table.indptr)
+    lengths[rows] = np.diff(new.indptr)
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    indices = np.empty(indptr[-1], dtype=np.int32)
+    data = np.empty(indptr[-1], dtype=np.float32)
+
+    old_rows = np.repeat(np.arange(n), np.diff(table.indptr))
+    kept = ~replaced[old_rows]
+    dest = indptr[old_rows] + np.arange(len(old_rows)) - table.indptr[old_rows]
+    indices[dest[kept]], data[dest[kept]] = table.indices[kept], table.data[kept]
+
+    local = np.repeat(np.arange(len(rows)), np.diff(new.indptr))
+    dest = indptr[rows[local]] + np.arange(len(local)) - new.indptr[local]
+    indices[dest], data[dest] = new.indices, new.data
+    return csr_matrix((data, indices, indptr), shape=table.shape)
+
+
+class CoPurchase:
+    def __init__(self, n_neighbors: int = N_NEIGHBORS, max_history: int = MAX_HISTORY):
+        self.n_neighbors = max(1, int(n_neighbors))
+        self.max_history = max(1, int(max_history))
+        self.tables = _empty_tables()
+        self.sources: Dict[str, Dict] = {}
+        self.version = 0
+        self.last_update: Dict = {}
+        self._update_lock = threading.Lock()
+
+    # ---------- build / incremental update ----------
+    def _read(self, paths: Sequence[str], sources: Dict[str, Dict],
+              chunk_rows: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        users, items, n_rows = [], [], 0
+        for p in paths:
+            key = os.path.abspath(p)
+            src = sources[key] = dict(sources.get(key) or {"offset": 0, "rows": 0})
+            for chunk in read_new(p, src, ["user_id", "product_id", *EXCLUDED_OUTCOMES], chunk_rows):
+                src["rows"] += len(chunk)
+                n_rows += len(chunk)
+                if "user_id" not in chunk.columns:
+                    raise ValueError(f"{p} has no user_id column")
+                u = pd.to_numeric(chunk["user_id"], errors="coerce")
+                pid = pd.to_numeric(chunk["product_id"], errors="coerce")
+                keep = u.notna() & pid.notna()
+                for col in EXCLUDED_OUTCOMES:
+                    if col in chunk.columns:
+                        keep &= chunk[col].isna()
+                users.append(u[keep].to_numpy(dtype=np.int64))
+                items.append(pid[keep].to_numpy(dtype=np.int64))
+        if not users:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), n_rows
+        return np.concatenate(users), np.concatenate(items), n_rows
+
+    def update(self, paths: Sequence[str], chunk_rows: int = CHUNK_ROWS) -> Dict:
+        """Fold the extract rows not seen yet into the tables; returns a summary."""
+        with self._update_lock:
+            t0 = time.perf_counter()
+            sources = {k: dict(v) for k, v in self.sources.items()}
+            u, it, n_rows = self._read(paths, sources, chunk_rows)
+            t = self.tables
+            refreshed = 0
+            if len(u):
+                user_ids, item_ids = np.union1d(t.user_ids, u), np.union1d(t.item_ids, it)
+                umap, imap = np.searchsorted(user_ids, t.user_ids), np.searchsorted(item_ids, t.item_ids)
+                n_items = len(item_ids)
+                X = _remap(t.X, umap, imap, (len(user_ids), n_items))
+                C = _remap(t.C, imap, imap, (n_items, n_items))
+                table = _remap(t.table, imap, imap, (n_items, n_items))
+
+                D = csr_matrix((np.ones(len(u), dtype=np.int32),
+                                (np.searchsorted(user_ids, u), np.searchsorted(item_ids, it))), shape=X.shape)
+                touched = np.flatnonzero(np.diff(D.indptr))
+                before = _binary(X[touched])
+                X = (X + D).tocsr()
+                after = _binary(X[touched])
+                dC = (after.T @ after - before.T @ before).tocsr()
+                dC.eliminate_zeros()
+                C = (C + dC).tocsr()
+                C.eliminate_zeros()
+
+                # a row moves when its co-counts change, or when a neighbour's buyer count does
+                changed = np.flatnonzero(np.diff(dC.indptr))
+                new_buyers = changed[dC.diagonal()[changed] != 0]
+                affected = np.union1d(changed, C[new_buyers].indices)
+                table = _splice(table, affected, neighbors(C, affected, self.n_neighbors))
+                buyers = C.diagonal().astype(np.int32)
+                popular = np.argsort(-buyers, kind="stable")
+                self.tables = Tables(user_ids, item_ids, X, C, table, buyers, popular)
+                refreshed = len(affected)
+            self.sources = sources
+            self.version += 1
+            self.last_update = {
+                "new_rows": n_rows,
+                "purchases": int(len(u)),
+                "refreshed_products": int(refreshed),
+                "seconds": round(time.perf_counter() - t0, 3),
+            }
+            return self.last_update
+
+    # ---------- lookup ----------
+    def history(self, user_id: Optional[int] = None, product_ids: Sequence = ()) -> np.ndarray:
+        """Item positions of the user's most bought products plus the known `product_ids`."""
+        return self._history(self.tables, user_id, product_ids)
+
+    def _history(self, t: Tables, user_id: Optional[int], product_ids: Sequence) -> np.ndarray:
+        # positions index `t` only: callers hand in the tables they score with
+        parts = []
+        if user_id is not None:
+            r = np.searchsorted(t.user_ids, user_id)
+            if r < len(t.user_ids) and t.user_ids[r] == user_id:
+                lo, hi = t.X.indptr[r], t.X.indptr[r + 1]
+                cols, counts = t.X.indices[lo:hi], t.X.data[lo:hi]
+                if len(cols) > self.max_history:
+                    cols = cols[topk_order(counts.astype(np.float64), cols, self.max_history)]
+                parts.append(cols.astype(np.int64))
+        ids = pd.to_numeric(pd.Series(list(product_ids), dtype=object), errors="coerce").dropna()
+        if len(ids) and len(t.item_ids):
+            ids = ids.to_numpy(dtype=np.int64)
+            pos = np.minimum(np.searchsorted(t.item_ids, ids), len(t.item_ids) - 1)
+            parts.append(pos[t.item_ids[pos] == ids])
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+    def recommend(self, user_id: Optional[int] = None, product_ids: Sequence = (),
+                  top_k: int = 10) -> Tuple[np.ndarray, np.ndarray, str]:
+        """
+        (product ids, scores, source). source "co_purchase": summed neighbour cosines over
+        the history; "popular" (no usable history): buyer counts; "none": no orders loaded.
+        Products already in the history are never returned.
+        """
+        t = self.tables   # one read: an update swaps the tables, positions would not match
+        hist = self._history(t, user_id, product_ids)
+        if len(hist):
+            pos = _ranges(t.table.indptr, hist)
+            cand, inv = np.unique(t.table.indices[pos], return_inverse=True)
+            score = np.bincount(inv, weights=t.table.data[pos].astype(np.float64))
+            keep = ~np.isin(cand, hist)
+            cand, score = cand[keep], score[keep]
+            if len(cand):
+                order = topk_order(score, cand, top_k)
+                return t.item_ids[cand[order]], score[order], "co_purchase"
+        if not len(t.popular):
+            return np.zeros(0, dtype=np.int64), np.zeros(0), "none"
+        pop = t.popular[: top_k + len(hist)]
+        pop = pop[~np.isin(pop, hist)][:top_k]
+        return t.item_ids[pop], t.buyers[pop].astype(np.float64), "popular"
+
+    # ---------- state file ----------
+    def save(self, path: str) -> None:
+        t = self.tables
+        meta = {"state_version": STATE_VERSION, "n_neighbors": self.n_neighbors, "sources": self.sources}
+        arrays = {"user_ids": t.user_ids, "item_ids": t.item_ids, "buyers": t.buyers, "popular": t.popular,
+                  "meta": np.asarray(json.dumps(meta))}
+        for name in ("X", "C", "table"):
+            m = getattr(t, name)
+            arrays.update({f"{name}.data": m.data, f"{name}.indices": m.indices,
+                           f"{name}.indptr": m.indptr, f"{name}.shape": np.asarray(m.shape)})
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, max_history: int = MAX_HISTORY) -> "CoPurchase":
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+            if meta.get("state_version") != STATE_VERSION:
+                raise ValueError(f"Co-purchase state {path} was written by another version")
+            self = cls(meta["n_neighbors"], max_history)
+            mats = {
+                name: csr_matrix((z[f"{name}.data"], z[f"{name}.indices"], z[f"{name}.indptr"]),
+                                 shape=tuple(z[f"{name}.shape"]))
+                for name in ("X", "C", "table")
+            }
+            self.tables = Tables(z["user_ids"], z["item_ids"], buyers=z["buyers"], popular=z["popular"], **mats)
+        self.sources = meta["sources"]
+        return self
+
+    @classmethod
+    def open(cls, paths: Sequence[str], state_path: Optional[str] = None, *,
+             n_neighbors: int = N_NEIGHBORS, max_history: int = MAX_HISTORY) -> "CoPurchase":
+        """Load `state_path` when it matches the settings, fold in any new rows, save."""
+        self = None
+        if state_path and os.path.exists(state_path):
+            try:
+                self = cls.load(state_path, max_history)
+            except (ValueError, KeyError, OSError):
+                self = None
+            if self is not None and self.n_neighbors != max(1, int(n_neighbors)):
+                self = None
+        if self is not None:
+            try:
+                self.update(paths)
+            except ValueError:
+                self = None   # an extract was rewritten: recount from scratch
+        if self is None:
+            self = cls(n_neighbors, max_history)
+            self.update(paths)
+        if state_path and (self.last_update["new_rows"] or not os.path.exists(state_path)):
+            self.save(state_path)
+        return self
+
+    def stats(self) -> Dict:
+        t = self.tables
+        return {
+            "users": int(len(t.user_ids)),
+            "products": int(len(t.item_ids)),
+            "purchases": int(t.X.nnz),
+            "co_purchase_pairs": int(t.C.nnz),
+            "neighbors": self.n_neighbors,
+            "table_mb": round((t.table.data.nbytes + t.table.indices.nbytes + t.table.indptr.nbytes) / 2**20, 2),
+            "version": self.version,
+            "last_update": self.last_update,
+        }
@@ -0,0 +1,196 @@
+# backend/reload.py
+# Catalog hot reload without a restart. A rebuild runs on its own thread: a new engine
+# is built from the current catalog files while the old one keeps serving (double
+# buffer), warmed with the most recent distinct /search bodies, then swapped in with a
+# single reference assignment. Request handlers read the engine reference once, so a
+# request already in flight finishes on the index it started with.
+# Rebuilds come from POST /catalog/reload or from a watcher that polls the catalog
+# files' mtime/size and fires once a change has stopped changing (writer finished).
+# The first engine is warmed too, from `history` (the query log's most frequent bodies,
+# querylog.py), so a restart does not serve its first minutes from cold caches.
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from metrics import CATALOG_RELOADS
+
+
+def _fingerprint(paths: Sequence[str]) -> Tuple:
+    out = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            out.append((p, st.st_mtime_ns, st.st_size))
+        except OSError:
+            out.append((p, None, None))
+    return tuple(out)
+
+
+class EngineReloader:
+    def __init__(
+        self,
+        build: Callable[[], Any],
+        on_swap: Callable[[Any], None],
+        *,
+        close: Optional[Callable[[Any], None]] = None,
+        watch_paths: Sequence[str] = (),
+        warm_queries: int = 200,
+        grace_s: float = 30.0,
+        history: Optional[Callable[[], List[Dict]]] = None,
+    ):
+        """
+        `build()` returns a new engine; `on_swap(engine)` publishes it. `close(engine)`
+        releases a replaced engine `grace_s` seconds after the swap (shard processes).
+        `history()` returns extra search bodies to warm with, after the recent ones.
+        """
+        self._build = build
+        self._on_swap = on_swap
+        self._close = close
+        self.watch_paths = list(watch_paths)
+        self.warm_queries = max(0, int(warm_queries))
+        self.grace_s = float(grace_s)
+        self._history = history
+        self.current: Any = None
+        self._recent: "OrderedDict[Hashable, Dict]" = OrderedDict()
+        self._recent_lock = threading.Lock()
+        self._building = threading.Lock()
+        self._seen = _fingerprint(self.watch_paths)
+        self._stop = threading.Event()
+        self._watch_s: Optional[float] = None
+        self.status: Dict[str, Any] = {
+            "state": "idle", "version": None, "build_s": None, "warm_s": None, "warmed": 0,
+            "built_at": None, "trigger": None, "reloads": 0, "last_error": None,
+        }
+
+    # ---------- build + swap ----------
+    def load(self) -> Any:
+        """First engine, built and warmed on the calling thread. Raises when the build fails."""
+        with self._building:
+            self._seen = _fingerprint(self.watch_paths)
+            t0 = time.perf_counter()
+            try:
+                eng = self._build()
+            except Exception as e:
+                self.status.update(state="failed", last_error=str(e))
+                raise
+            t1 = time.perf_counter()
+            warmed = self._warm(eng)
+            self._publish(eng, "startup", t1 - t0, time.perf_counter() - t1, warmed)
+        return eng
+
+    def reload(self, trigger: str = "admin") -> bool:
+        """Start a background rebuild; False when one is already running."""
+        if not self._building.acquire(blocking=False):
+            return False
+        self.status.update(state="building", trigger=trigger)
+        threading.Thread(target=self._rebuild, args=(trigger,), name="catalog-reload", daemon=True).start()
+        return True
+
+    def _rebuild(self, trigger: str) -> None:
+        try:
+            self._seen = _fingerprint(self.watch_paths)
+            t0 = time.perf_counter()
+            try:
+                eng = self._build()
+            except Exception as e:
+                self.status.update(state="failed", last_error=str(e))
+                CATALOG_RELOADS.inc(outcome="failed")
+                return
+            build_s = time.perf_counter() - t0
+            if self.current is not None and eng.catalog_version == self.current.catalog_version:
+                # touched but not changed: keep the warm engine
+                self._retire(eng, 0.0)
+                self.status.update(state="idle", last_error=None)
+                CATALOG_RELOADS.inc(outcome="unchanged")
+                return
+            t1 = time.perf_counter()
+            warmed = self._warm(eng)
+            old = self.current
+            self._publish(eng, trigger, build_s, time.perf_counter() - t1, warmed)
+            self.status["reloads"] += 1
+            CATALOG_RELOADS.inc(outcome="swapped")
+            if old is not None:
+                self._retire(old, self.grace_s)
+        finally:
+            self._building.release()
+
+    def _publish(self, eng: Any, trigger: str, build_s: float, warm_s: float, warmed: int) -> None:
+        self.current = eng
+        self._on_swap(eng)
+        self.status.update(
+            state="idle", version=eng.catalog_version, build_s=round(build_s, 3),
+            warm_s=round(warm_s, 3), warmed=warmed, trigger=trigger, last_error=None,
+            built_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        )
+
+    def _retire(self, eng: Any, delay: float) -> None:
+        if self._close is None:
+            return
+        timer = threading.Timer(delay, self._close, (eng,))
+        timer.daemon = True
+        timer.start()
+
+    # ---------- warm-up ----------
+    def remember(self, key: Hashable, params: Dict) -> None:
+        """Record a served /search body (most recent `warm_queries` distinct ones are kept)."""
+        if not self.warm_queries:
+            return
+        with self._recent_lock:
+            self._recent[key] = params
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.warm_queries:
+                self._recent.popitem(last=False)
+
+    def _warm(self, eng: Any) -> int:
+        """
+        Fault in the engine's mapped index pages, then replay recent queries (most recent
+        first) and the `history` bodies to fill its encode / result caches.
+        """
+        warm_pages = getattr(eng, "warm_pages", None)
+        if warm_pages is not None:
+            warm_pages()
+        with self._recent_lock:
+            bodies = list(reversed(self._recent.values()))
+        if self._history is not None:
+            try:
+                bodies.extend(self._history())
+            except Exception:
+                pass   # an unreadable log only costs the warm-up
+        n = 0
+        for params in bodies:
+            try:
+                eng.search(**params)
+                n += 1
+            except Exception:
+                continue
+        return n
+
+    # ---------- file watcher ----------
+    def watch(self, poll_s: float) -> None:
+        self._watch_s = float(poll_s)
+        threading.Thread(target=self._watch, args=(self._watch_s,), name="catalog-watch", daemon=True).start()
+
+    def _watch(self, poll_s: float) -> None:
+        pending = None
+        while not self._stop.wait(poll_s):
+            fp = _fingerprint(self.watch_paths)
+            if fp == self._seen:
+                pending = None
+                continue
+            if fp != pending:
+                # changed since the last poll: wait until the writer is done
+                pending = fp
+                continue
+            self.reload("watch")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._recent_lock:
+            recent = len(self._recent)
+        return {**self.status, "watch_s": self._watch_s, "recent_queries": recent}
@@ -0,0 +1,627 @@
+# backend/rerank.py
+# Second ranking stage for /search. Stage 1 is the usual blend (alpha * cosine +
+# (1 - alpha) * business) cut at `depth` rows, a few hundred; stage 2 builds a feature
+# matrix for just those rows and re-orders them with a small model trained offline.
+# - Catalog features (demand / revenue and their ranks, views, carts, price, margin,
+#   discount, stock, status, return rate, age) are one float32 row per catalog row,
+#   computed once per engine build; a rerank only gathers its candidates' rows.
+# - Request features: the stage-1 similarity / business / score / rank, and order-history
+#   signals read live from the co-purchase tables (recommend.py): buyers, and affinity =
+#   summed co-purchase cosine to the stage-1 head.
+# - Models ("linear": logistic regression, "gbm": gradient-boosted trees) are fitted with
+#   sklearn by `python -m rerank train` and saved as plain arrays (.npz); serving scores
+#   them in numpy and never unpickles anything.
+# Latency budgets (ms, None = no limit): stage 2 is skipped when stage 1 (timer total so
+# far) overran `retrieve_budget_ms`; its depth is cut to what the measured per-row cost
+# fits into `rerank_budget_ms`; features that still overrun are dropped before scoring.
+# A skipped / dropped rerank serves the stage-1 order and is not result-cached.
+#
+# Training labels are the newest order lines, which the catalog's demand / revenue / view /
+# cart columns already count: those ACTIVITY_FEATURES are zeroed while training (the model
+# cannot use them) unless `--asof-csv` gives a catalog export from before the label window.
+#
+#   cd perpay/backend
+#   python -m rerank train --csv ../data/product_catalog.csv --orders ../data/user_order_history.csv \
+#       --kind gbm --out rerank_model.npz
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from metrics import SEARCH_RERANK, StageTimer
+from recommend import EXCLUDED_OUTCOMES, CoPurchase
+from scoring import topk_order
+
+RERANK_VERSION = 1
+DEPTH = 300
+RETRIEVE_BUDGET_MS = 50.0
+RERANK_BUDGET_MS = 15.0
+# stage-1 rows whose co-purchase neighbours define a candidate's affinity
+AFFINITY_HEAD = 10
+
+CATALOG_FEATURES = [
+    "log_demand_30", "log_demand_90", "log_revenue_90", "demand_rank_30", "revenue_rank_90",
+    "log_viewed_30", "log_viewed_90", "log_carted_30", "log_carted_90", "cart_rate_90",
+    "log_price", "margin", "discount", "in_stock", "enabled", "return_rate", "has_return_rate",
+    "log_age_days",
+]
+REQUEST_FEATURES = [
+    "similarity", "business_score", "stage1_score", "stage1_rank", "log_buyers", "copurchase_affinity",
+]
+FEATURES = CATALOG_FEATURES + REQUEST_FEATURES
+# catalog features counted from the same orders / sessions the training labels come from
+ACTIVITY_FEATURES = [
+    "log_demand_30", "log_demand_90", "log_revenue_90", "demand_rank_30", "revenue_rank_90",
+    "log_viewed_30", "log_viewed_90", "log_carted_30", "log_carted_90", "cart_rate_90",
+]
+
+
+# ========= Features =========
+class RerankCatalog(NamedTuple):
+    matrix: np.ndarray        # rows x CATALOG_FEATURES, float32
+    product_ids: np.ndarray   # int64 per row (-1 = not numeric, never in the order history)
+
+
+def catalog_features(column: Callable[[str], Optional[pd.Series]], n_rows: int) -> RerankCatalog:
+    """Per-row catalog features; `column(name)` returns a catalog column or None."""
+
+    def num(name: str) -> np.ndarray:
+        s = column(name)
+        if s is None:
+            return np.full(n_rows, np.nan)
+        return pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64)
+
+    def log1p(name: str) -> np.ndarray:
+        return np.log1p(np.clip(num(name), 0.0, None))
+
+    def inv_rank(name: str) -> np.ndarray:
+        r = num(name)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(r >= 1, 1.0 / r, 0.0)
+
+    def text(name: str) -> pd.Series:
+        s = column(name)
+        return pd.Series([""] * n_rows) if s is None else s.astype(str).str.strip().str.lower()
+
+    price, msrp = num("current_price"), num("msrp")
+    viewed_90, carted_90 = num("distinct_users_viewed_90"), num("distinct_users_parent_carted_90")
+    rr = num("return_rate")
+    added = column("product_added_date")
+    if added is not None:
+        added = pd.to_datetime(added, format="%m/%d/%Y", errors="coerce")
+        age = (added.max() - added).dt.days.to_numpy(dtype=np.float64)
+    else:
+        age = np.full(n_rows, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cols = {
+            "log_demand_30": log1p("demand_30_days"),
+            "log_demand_90": log1p("demand_90_days"),
+            "log_revenue_90": log1p("revenue_90_days"),
+            "demand_rank_30": inv_rank("catalog_demand_30_days_rank"),
+            "revenue_rank_90": inv_rank("catalog_revenue_90_days_rank"),
+            "log_viewed_30": log1p("distinct_users_viewed_30"),
+            "log_viewed_90": np.log1p(np.clip(viewed_90, 0.0, None)),
+            "log_carted_30": log1p("distinct_users_parent_carted_30"),
+            "log_carted_90": np.log1p(np.clip(carted_90, 0.0, None)),
+            "cart_rate_90": carted_90 / (np.clip(viewed_90, 0.0, None) + 1.0),
+            "log_price": np.log1p(np.clip(price, 0.0, None)),
+            "margin": np.clip(num("_derived_margin"), -1.0, 1.0),
+            "discount": np.clip(np.where(msrp > 0, (msrp - price) / msrp, np.nan), -1.0, 1.0),
+            "in_stock": (num("current_inventory") > 0).astype(np.float64),
+            "enabled": (text("current_status") == "enabled").to_numpy(dtype=np.float64),
+            "return_rate": rr,
+            "has_return_rate": np.isfinite(rr).astype(np.float64),
+            "log_age_days": np.log1p(np.clip(age, 0.0, None)),
+        }
+    matrix = np.column_stack([cols[f] for f in CATALOG_FEATURES])
+    matrix = np.nan_to_num(matrix, nan=0.0, posinf=0.0, neginf=0.0).astype(np.float32)
+    pid = column("product_id")
+    if pid is None:
+        pids = np.full(n_rows, -1, dtype=np.int64)
+    else:
+        pids = pd.to_numeric(pid.astype(str), errors="coerce").fillna(-1).to_numpy(dtype=np.int64)
+    return RerankCatalog(matrix, pids)
+
+
+def candidate_features(
+    cat: RerankCatalog,
+    copurchase: Optional[CoPurchase],
+    idx: np.ndarray,
+    sims: np.ndarray,
+    biz: np.ndarray,
+    score: np.ndarray,
+) -> np.ndarray:
+    """len(idx) x FEATURES (float64) for stage-1 rows `idx`, in stage-1 order."""
+    n = len(idx)
+    F = np.zeros((n, len(FEATURES)))
+    F[:, : len(CATALOG_FEATURES)] = cat.matrix[idx]
+    j = len(CATALOG_FEATURES)
+    F[:, j], F[:, j + 1], F[:, j + 2] = sims, biz, score
+    F[:, j + 3] = np.log1p(np.arange(n))
+    t = copurchase.tables if copurchase is not None else None   # one read: updates swap the tables
+    if t is not None and len(t.item_ids):
+        pids = cat.product_ids[idx]
+        pos = np.minimum(np.searchsorted(t.item_ids, pids), len(t.item_ids) - 1)
+        found = t.item_ids[pos] == pids
+        F[found, j + 4] = np.log1p(t.buyers[pos[found]])
+        rows = np.flatnonzero(found)
+        head = pos[rows[:AFFINITY_HEAD]]
+        if len(rows) and len(head):
+            A = t.table[pos[rows]][:, head]
+            F[rows, j + 5] = np.asarray(A.sum(axis=1)).ravel()
+    return F
+
+
+# ========= Model =========
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _export_trees(model) -> Dict[str, np.ndarray]:
+    """A fitted binary GradientBoostingClassifier as flat node arrays (all trees concatenated)."""
+    trees = [est.tree_ for est in model.estimators_[:, 0]]
+    sizes = np.asarray([t.node_count for t in trees])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    feature, threshold, left, right, value = [], [], [], [], []
+    for t, off in zip(trees, offsets):
+        leaf = t.children_left < 0
+        feature.append(np.where(leaf, -1, t.feature))
+        threshold.append(t.threshold)
+        left.append(np.where(leaf, -1, t.children_left + off))
+        right.append(np.where(leaf, -1, t.children_right + off))
+        value.append(t.value[:, 0, 0])
+    return {
+        "roots": offsets.astype(np.int32),
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "value": np.concatenate(value).astype(np.float64),
+        "max_depth": np.asarray(max(t.max_depth for t in trees)),
+        "learning_rate": np.asarray(float(model.learning_rate)),
+    }
+
+
+class RankModel:
+    KINDS = ("linear", "gbm")
+
+    def __init__(self, kind: str, features: Sequence[str], arrays: Dict[str, np.ndarray], meta: Optional[Dict] = None):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown rank model kind '{kind}', expected one of {self.KINDS}")
+        unknown = [f for f in features if f not in FEATURES]
+        if unknown:
+            raise ValueError(f"Rank model uses unknown features {unknown}")
+        self.kind = kind
+        self.features = list(features)
+        self.columns = np.asarray([FEATURES.index(f) for f in self.features], dtype=np.int64)
+        self.arrays = arrays
+        self.meta = dict(meta or {})
+        h = hashlib.sha256(json.dumps([kind, self.features]).encode())
+        for name in sorted(arrays):
+            h.update(name.encode())
+            h.update(np.ascontiguousarray(arrays[name]).tobytes())
+        self.version = h.hexdigest()[:16]   # part of the result cache key
+        if kind == "gbm":
+            # walk tables: leaves point at themselves (so every row takes every step) and
+            # node i's children sit at 2i (left) / 2i + 1 (right)
+            leaf = arrays["feature"] < 0
+            own = np.arange(len(leaf), dtype=np.int32)
+            self._split = np.where(leaf, 0, arrays["feature"]).astype(np.int64)
+            self._children = np.column_stack([
+                np.where(leaf, own, arrays["left"]), np.where(leaf, own, arrays["right"]),
+            ]).ravel().astype(np.int64)
+
+    def raw(self, F: np.ndarray) -> np.ndarray:
+        """Log-odds per row of a FEATURES matrix."""
+        X = F[:, self.columns]
+        a = self.arrays
+        if self.kind == "linear":
+            return ((X - a["mean"]) / a["scale"]) @ a["coef"] + float(a["intercept"])
+        # all trees walked at once: one (rows x trees) node array, one step per level;
+        # float32 inputs, as sklearn compares them against the split thresholds
+        n = len(X)
+        flat = np.ascontiguousarray(X.astype(np.float32).T).ravel()   # feature-major
+        node = np.repeat(a["roots"][None, :].astype(np.int64), n, axis=0)
+        rows = np.arange(n)[:, None]
+        for _ in range(int(a["max_depth"])):
+            right = flat[self._split[node] * n + rows] > a["threshold"][node]
+            node = self._children[2 * node + right]
+        return float(a["init"]) + float(a["learning_rate"]) * a["value"][node].sum(axis=1)
+
+    def score(self, F: np.ndarray) -> np.ndarray:
+        """Purchase probability per row of a FEATURES matrix."""
+        return _sigmoid(self.raw(F))
+
+    @classmethod
+    def fit(
+        cls,
+        F: np.ndarray,
+        y: np.ndarray,
+        kind: str = "gbm",
+        *,
+        features: Sequence[str] = FEATURES,
+        n_estimators: int = 100,
+        max_depth: int = 3,
+        learning_rate: float = 0.1,
+        C: float = 1.0,
+        seed: int = 0,
+    ) -> "RankModel":
+        """Fit on a FEATURES matrix and 0/1 labels (sklearn, training only)."""
+        y = np.asarray(y, dtype=np.int64)
+        if kind not in cls.KINDS:
+            raise ValueError(f"Unknown rank model kind '{kind}', expected one of {cls.KINDS}")
+        if y.min(initial=1) == y.max(initial=0):
+            raise ValueError("Training labels need both purchased and not-purchased candidates")
+        X = F[:, [FEATURES.index(f) for f in features]]
+        if kind == "linear":
+            from sklearn.linear_model import LogisticRegression
+
+            mean, scale = X.mean(axis=0), X.std(axis=0)
+            scale[scale == 0] = 1.0
+            m = LogisticRegression(C=C, max_iter=1000).fit((X - mean) / scale, y)
+            arrays = {"mean": mean, "scale": scale, "coef": m.coef_[0].astype(np.float64),
+                      "intercept": np.asarray(float(m.intercept_[0]))}
+            expected = m.decision_function((X - mean) / scale)
+        else:
+            from sklearn.ensemble import GradientBoostingClassifier
+
+            m = GradientBoostingClassifier(
+                n_estimators=n_estimators, max_depth=max_depth, learning_rate=learning_rate,
+                subsample=0.8, random_state=seed,
+            ).fit(X, y)
+            arrays = _export_trees(m)
+            p = y.mean()
+            arrays["init"] = np.asarray(float(np.log(p / (1.0 - p))))   # the prior log-odds sklearn starts from
+            expected = m.decision_function(X)
+        model = cls(kind, features, arrays)
+        if not np.allclose(model.raw(F), expected, atol=1e-6):
+            raise RuntimeError("Exported rank model does not reproduce the fitted sklearn model")
+        return model
+
+    # ---------- model file ----------
+    def save(self, path: str, meta: Optional[Dict] = None) -> None:
+        self.meta.update(meta or {})
+        info = {"rerank_version": RERANK_VERSION, "kind": self.kind, "features": self.features, **self.meta}
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **self.arrays, meta=np.asarray(json.dumps(info)))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "RankModel":
+        with np.load(path, allow_pickle=False) as z:
+            info = json.loads(str(z["meta"]))
+            if info.get("rerank_version") != RERANK_VERSION:
+                raise ValueError(f"Rank model {path} was written by another version; retrain it")
+            arrays = {k: z[k] for k in z.files if k != "meta"}
+        meta = {k: v for k, v in info.items() if k not in ("rerank_version", "kind", "features")}
+        return cls(info["kind"], info["features"], arrays, meta)
+
+
+# ========= Serving =========
+class Reranker:
+    OUTCOMES = ("reranked", "retrieve_over_budget", "no_budget", "features_over_budget")
+
+    def __init__(
+        self,
+        model: RankModel,
+        copurchase: Optional[CoPurchase] = None,
+        *,
+        depth: int = DEPTH,
+        retrieve_budget_ms: Optional[float] = RETRIEVE_BUDGET_MS,
+        rerank_budget_ms: Optional[float] = RERANK_BUDGET_MS,
+    ):
+        self.model = model
+        self.copurchase = copurchase
+        self.depth = max(1, int(depth))
+        self.retrieve_budget_ms = retrieve_budget_ms or None
+        self.rerank_budget_ms = rerank_budget_ms or None
+        self.ms_per_row: Optional[float] = None   # moving average of stage-2 cost per candidate
+        self.outcomes = {o: 0 for o in self.OUTCOMES}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, copurchase: Optional[CoPurchase] = None, **kwargs) -> "Reranker":
+        return cls(RankModel.load(path), copurchase, **kwargs)
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.outcomes[outcome] += 1
+        SEARCH_RERANK.inc(outcome=outcome)
+
+    def rerank(
+        self,
+        cat: RerankCatalog,
+        idx: np.ndarray,
+        sims: np.ndarray,
+        biz: np.ndarray,
+        score: np.ndarray,
+        timer: StageTimer,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, bool]:
+        """
+        Stage-1 arrays -> the same arrays with the head (up to `depth` rows) re-ordered by
+        the model, whose probability becomes its `score`; rows past the head keep their
+        stage-1 order. The flag is False when the budgets skipped stage 2.
+        """
+        if self.retrieve_budget_ms is not None and timer.total() * 1000.0 > self.retrieve_budget_ms:
+            self._count("retrieve_over_budget")
+            return idx, sims, biz, score, False
+        n = min(len(idx), self.depth)
+        if n < 2:
+            return idx, sims, biz, score, True   # nothing to re-order
+        if self.rerank_budget_ms is not None and self.ms_per_row:
+            n = min(n, int(self.rerank_budget_ms / self.ms_per_row))
+            if n < 2:
+                self._count("no_budget")
+                self.ms_per_row *= 0.99   # probe again after a while: the cost may have dropped
+                return idx, sims, biz, score, False
+
+        t0 = time.perf_counter()
+        F = candidate_features(cat, self.copurchase, idx[:n], sims[:n], biz[:n], score[:n])
+        timer.lap("features")
+        spent = (time.perf_counter() - t0) * 1000.0
+        if self.rerank_budget_ms is not None and spent > self.rerank_budget_ms:
+            self._observe(spent, n, overrun=True)
+            self._count("features_over_budget")
+            return idx, sims, biz, score, False
+        p = self.model.score(F)
+        order = topk_order(p, np.arange(n), n)   # ties keep the stage-1 order
+        timer.lap("rerank")
+        self._observe((time.perf_counter() - t0) * 1000.0, n)
+        self._count("reranked")
+        head = idx[:n][order]
+        return (
+            np.concatenate([head, idx[n:]]),
+            np.concatenate([sims[:n][order], sims[n:]]),
+            np.concatenate([biz[:n][order], biz[n:]]),
+            np.concatenate([p[order], score[n:]]),
+            True,
+        )
+
+    def _observe(self, ms: float, n: int, overrun: bool = False) -> None:
+        cost = ms / n
+        # races between request threads only lose an update
+        if self.ms_per_row is None or overrun:
+            # an overrun takes effect at once: the next request already asks for fewer rows
+            self.ms_per_row = max(cost, self.ms_per_row or 0.0)
+        else:
+            self.ms_per_row = 0.9 * self.ms_per_row + 0.1 * cost
+
+    def stats(self) -> Dict:
+        with self._lock:
+            outcomes = dict(self.outcomes)
+        return {
+            "kind": self.model.kind,
+            "version": self.model.version,
+            "features": len(self.model.features),
+            "depth": self.depth,
+            "retrieve_budget_ms": self.retrieve_budget_ms,
+            "rerank_budget_ms": self.rerank_budget_ms,
+            "ms_per_row": round(self.ms_per_row, 5) if self.ms_per_row else None,
+            "outcomes": outcomes,
+            "trained": self.model.meta.get("trained"),
+        }
+
+
+# ========= Offline training =========
+def _ndcg(gains: np.ndarray, k: int) -> float:
+    """nDCG@k of gains in ranked order, against the best order of the same gains."""
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = float(gains[:k] @ discounts[: len(gains[:k])])
+    ideal = np.sort(gains)[::-1][:k]
+    idcg = float(ideal @ discounts[: len(ideal)])
+    return dcg / idcg if idcg > 0 else 0.0
+
+
+def _read_orders(paths: Sequence[str]) -> pd.DataFrame:
+    cols = ["user_id", "order_id", "order_checkout_date", "product_id", *EXCLUDED_OUTCOMES]
+    frames = [pd.read_csv(p, dtype=str, usecols=lambda c: c in cols) for p in paths]
+    orders = pd.concat(frames, ignore_index=True)
+    # oldest first; lines of one day keep order_id order
+    when = pd.to_datetime(orders.get("order_checkout_date"), format="%m/%d/%Y", errors="coerce")
+    oid = pd.to_numeric(orders.get("order_id"), errors="coerce")
+    key = pd.DataFrame({"when": when, "oid": oid, "pos": np.arange(len(orders))})
+    return orders.iloc[key.sort_values(["when", "oid", "pos"], na_position="first").index].reset_index(drop=True)
+
+
+def _training_queries(engine, bought: pd.Series, n: int, query_log: Optional[str]) -> List[Dict]:
+    """Leaf-category names of the products bought in the label window (most bought first) + logged bodies."""
+    rows = engine.rows_for_product_ids(bought.index.tolist())
+    keep = rows >= 0
+    cats = None
+    for col in ("category_name_3", "category_name_2", "category_name_1"):
+        if col not in engine.df.columns:
+            continue
+        vals = engine.df[col].to_numpy(dtype=object)[rows[keep]]
+        vals = pd.Series(vals).where(pd.Series(vals).astype(str).str.strip() != "")
+        cats = vals if cats is None else cats.fillna(vals)
+    bodies: List[Dict] = []
+    if cats is not None:
+        weight = pd.Series(bought.to_numpy()[keep]).groupby(cats.to_numpy()).sum()
+        weight = weight[[isinstance(c, str) and c != "" for c in weight.index]]
+        top = weight.sort_values(ascending=False, kind="stable").index[: max(0, n)]
+        bodies = [{"query": str(c)} for c in top]
+    if query_log:
+        from querylog import QueryLog
+
+        log = QueryLog(query_log)
+        bodies += [b for b in log.top(n) if b.get("query")]
+        log.close()
+    return bodies
+
+
+def _activity_asof(cat: RerankCatalog, asof_csv: Optional[str], label_start: pd.Timestamp) -> RerankCatalog:
+    """
+    `cat` with its ACTIVITY_FEATURES as of `asof_csv` (matched by product id, 0 when the
+    product is missing there), or zeroed when no such export is given.
+    """
+    cols = [CATALOG_FEATURES.index(f) for f in ACTIVITY_FEATURES]
+    matrix = cat.matrix.copy()
+    matrix[:, cols] = 0.0
+    if asof_csv is None:
+        return cat._replace(matrix=matrix)
+    asof = pd.read_csv(asof_csv, dtype=str)
+    added = pd.to_datetime(asof.get("product_added_date"), format="%m/%d/%Y", errors="coerce")
+    if pd.isna(label_start) or added is None or added.isna().all():
+        raise ValueError("Cannot check --asof-csv against the label window: no order or product_added dates")
+    if added.max() >= label_start:
+        raise ValueError(
+            f"--asof-csv has products added on {added.max():%Y-%m-%d}, inside the label window "
+            f"(from {label_start:%Y-%m-%d}); export the catalog before the window starts"
+        )
+    old = catalog_features(lambda c: asof[c] if c in asof.columns else None, len(asof))
+    order = np.argsort(old.product_ids, kind="stable")
+    ids = old.product_ids[order]
+    pos = np.minimum(np.searchsorted(ids, cat.product_ids), max(0, len(ids) - 1))
+    found = (ids[pos] == cat.product_ids) & (cat.product_ids >= 0) if len(ids) else np.zeros(len(pos), bool)
+    rows = np.flatnonzero(found)
+    matrix[np.ix_(rows, cols)] = old.matrix[np.ix_(order[pos[rows]], cols)]
+    return cat._replace(matrix=matrix)
+
+
+def train(
+    csv_path: str,
+    orders: Sequence[str],
+    out: str,
+    *,
+    asof_csv: Optional[str] = None,
+    kind: str = "linear",
+    label_frac: float = 0.3,
+    queries: int = 2000,
+    query_log: Optional[str] = None,
+    depth: int = DEPTH,
+    test_frac: float = 0.2,
+    seed: int = 0,
+    engine_kwargs: Optional[Dict] = None,
+) -> Dict:
+    """
+    Fit a rank model from the order history and save it to `out`; returns a summary.
+    The newest `label_frac` of the order lines are the labels (a stage-1 candidate is
+    positive when it was bought then); the older lines are the co-purchase history the
+    features see. The catalog's ACTIVITY_FEATURES count the label window too, so they are
+    taken from `asof_csv` (a catalog export from before it) or zeroed. Queries are split
+    into train / test, and so are the products; the summary reports the nDCG@10 of the
+    stage-1 and the model order over the test queries' test products. A model that does
+    not beat the stage-1 order there is not saved (ValueError).
+    """
+    from search import CosineSearch
+
+    t0 = time.perf_counter()
+    lines = _read_orders(orders)
+    cut = int(round(len(lines) * (1.0 - label_frac)))
+    history, labels = lines.iloc[:cut], lines.iloc[cut:]
+    label_start = pd.to_datetime(labels.get("order_checkout_date"), format="%m/%d/%Y", errors="coerce").min()
+    ok = pd.Series(True, index=labels.index)
+    for col in EXCLUDED_OUTCOMES:
+        if col in labels.columns:
+            ok &= labels[col].isna()
+    bought = labels.loc[ok, "product_id"].str.replace(r"[,\s]", "", regex=True).value_counts()
+
+    copurchase = CoPurchase()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.csv")
+        history.to_csv(path, index=False)
+        copurchase.update([path])
+
+    engine = CosineSearch(csv_path, result_cache_size=0, **(engine_kwargs or {}))
+    cat = _activity_asof(engine.rerank_features(), asof_csv, label_start)
+    positive = np.zeros(len(engine.df), dtype=bool)
+    rows = engine.rows_for_product_ids(bought.index.tolist())
+    positive[rows[rows >= 0]] = True
+
+    Fs, ys, held, groups = [], [], [], []
+    # a label belongs to a product, which shows up under many queries: the test queries are
+    # scored on test products only, which the model never saw (else it scores memorized ids)
+    rng = np.random.default_rng(seed)
+    test_rows = rng.random(len(engine.df)) < test_frac
+    bodies = _training_queries(engine, bought, queries, query_log)
+    for body in bodies:
+        idx, sims, biz, score = engine.retrieve(**{**body, "top_k": depth})
+        y = positive[idx]
+        if not y.any() or y.all():
+            continue   # nothing to re-order
+        Fs.append(candidate_features(cat, copurchase, idx, sims, biz, score))
+        ys.append(y)
+        held.append(test_rows[idx])
+        groups.append(len(groups))
+    if len(groups) < 2:
+        raise ValueError("Too few queries with purchased candidates to train on; use more order history")
+
+    test = set(rng.permutation(len(groups))[: max(1, int(round(len(groups) * test_frac)))].tolist())
+    fit_on = [g for g in groups if g not in test]
+    model = RankModel.fit(np.vstack([Fs[g][~held[g]] for g in fit_on]),
+                          np.concatenate([ys[g][~held[g]] for g in fit_on]), kind, seed=seed)
+
+    base, reranked = [], []
+    for g in sorted(test):
+        gains = ys[g][held[g]].astype(np.float64)
+        if not gains.any():
+            continue
+        base.append(_ndcg(gains, 10))
+        p = model.score(Fs[g][held[g]])
+        reranked.append(_ndcg(gains[topk_order(p, np.arange(len(p)), len(p))], 10))
+    if not base:
+        raise ValueError("No held-out query has a held-out purchased product; use more order history")
+    trained = {
+        "at": int(time.time()),
+        "csv": os.path.abspath(csv_path),
+        "orders": [os.path.abspath(p) for p in orders],
+        "label_frac": label_frac,
+        "activity_features": os.path.abspath(asof_csv) if asof_csv else "zeroed",
+        "depth": depth,
+        "queries": len(groups),
+        "test_queries": len(base),
+        "rows": int(sum(len(y) for y in ys)),
+        "positives": int(sum(int(y.sum()) for y in ys)),
+        "ndcg@10_stage1": round(float(np.mean(base)), 4),
+        "ndcg@10_reranked": round(float(np.mean(reranked)), 4),
+    }
+    if trained["ndcg@10_reranked"] <= trained["ndcg@10_stage1"]:
+        raise ValueError(
+            f"The {kind} model does not beat stage 1 on the held-out split (nDCG@10 "
+            f"{trained['ndcg@10_reranked']} vs {trained['ndcg@10_stage1']}); not saved"
+        )
+    model.save(out, {"trained": trained})
+    return {"kind": kind, "version": model.version, **trained, "seconds": round(time.perf_counter() - t0, 2)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Train the /search second-stage rank model from order history")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    tr = sub.add_parser("train")
+    tr.add_argument("--csv", required=True, help="product_catalog.csv the engine serves")
+    tr.add_argument("--orders", nargs="+", required=True, help="user_order_history.csv extract(s)")
+    tr.add_argument("--out", default=os.getenv("RERANK_MODEL", "rerank_model.npz"))
+    tr.add_argument("--asof-csv", default=None,
+                    help="catalog export from before the label window (else its activity columns are not used)")
+    tr.add_argument("--kind", choices=RankModel.KINDS, default="linear")
+    tr.add_argument("--label-frac", type=float, default=0.3, help="newest share of order lines used as labels")
+    tr.add_argument("--queries", type=int, default=2000, help="category queries (most bought first)")
+    tr.add_argument("--query-log", default=None, help="QUERY_LOG_DIR: add the most frequent logged bodies")
+    tr.add_argument("--depth", type=int, default=DEPTH, help="stage-1 candidates per query")
+    tr.add_argument("--test-frac", type=float, default=0.2)
+    tr.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    try:
+        summary = train(args.csv, args.orders, args.out, asof_csv=args.asof_csv, kind=args.kind, label_frac=args.label_frac,
+                        queries=args.queries, query_log=args.query_log, depth=args.depth,
+                        test_frac=args.test_frac, seed=args.seed)
+    except ValueError as e:
+        print(f"[rerank] {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
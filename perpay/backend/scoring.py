@@ -0,0 +1,203 @@
+# backend/scoring.py
+from __future__ import annotations
+
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
+
+from snapshot import sparse_arrays, sparse_from
+
+# "hybrid" lives in search.py (IVF candidates from dense.DenseIndex + fused scores)
+ENGINES = ("full", "inverted", "hybrid")
+
+# slack applied to upper bounds so float rounding can never prune a true top-k row
+_UB_RTOL = 1e-9
+_UB_ATOL = 1e-12
+
+BizFn = Callable[[np.ndarray], np.ndarray]
+
+
+def topk_order(score: np.ndarray, tiebreak: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k best entries ordered by (score desc, tiebreak asc).
+    argpartition first, so only the entries tied with the k-th value get sorted.
+    """
+    n = len(score)
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        kth = score[np.argpartition(-score, k - 1)[:k]].min()
+        sel = np.flatnonzero(score >= kth)
+    else:
+        sel = np.arange(n)
+    order = np.lexsort((tiebreak[sel], -score[sel]))
+    return sel[order[:k]]
+
+
+def signed_col_min(Xc) -> Optional[np.ndarray]:
+    """Per-column minimum of a CSC matrix with negative entries; None when all are >= 0."""
+    if not Xc.nnz or Xc.data.min() >= 0:
+        return None
+    return np.asarray(Xc.min(axis=0).todense()).ravel()
+
+
+def kth_largest(x: np.ndarray, k: int) -> float:
+    return float(-np.partition(-x, k - 1)[k - 1])
+
+
+class InvertedIndexScorer:
+    """
+    Cosine scoring over the row-normalized TF-IDF matrix.
+
+    `cosine` is the exhaustive path (one sparse product against every row).
+    `topk` walks only the posting lists (CSC columns) of the query terms and uses
+    MaxScore pruning: terms whose summed upper bounds cannot lift a row past the
+    current k-th score are "non-essential", and rows that only contain those terms
+    are never scored. Surviving rows are scored with the same per-row sparse dot
+    as `cosine`, so both paths return bit-identical similarities.
+    """
+
+    def __init__(self, X: csr_matrix):
+        self.Xn = normalize(X, norm="l2", copy=True).tocsr()
+        self.Xn.sort_indices()
+        self.Xc = self.Xn.tocsc()
+        self.Xc.sort_indices()
+        self.n_rows = self.Xn.shape[0]
+        if self.Xc.shape[1]:
+            self.col_max = np.asarray(self.Xc.max(axis=0).todense()).ravel()
+        else:
+            self.col_max = np.zeros(0)
+        self.col_min = signed_col_min(self.Xc)
+
+    def to_arrays(self, prefix: str = "scorer") -> Dict[str, np.ndarray]:
+        out = {f"{prefix}.col_max": self.col_max}
+        if self.col_min is not None:
+            out[f"{prefix}.col_min"] = self.col_min
+        out.update(sparse_arrays(f"{prefix}.Xn", self.Xn))
+        out.update(sparse_arrays(f"{prefix}.Xc", self.Xc))
+        return out
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str = "scorer") -> "InvertedIndexScorer":
+        self = cls.__new__(cls)
+        self.Xn = sparse_from(arrays, f"{prefix}.Xn", "csr")
+        self.Xc = sparse_from(arrays, f"{prefix}.Xc", "csc")
+        self.n_rows = self.Xn.shape[0]
+        self.col_max = arrays[f"{prefix}.col_max"]
+        self.col_min = arrays.get(f"{prefix}.col_min")
+        return self
+
+    # ---------- query prep ----------
+    @staticmethod
+    def normalize_query(q: csr_matrix) -> csr_matrix:
+        # sort first: the norm is summed in storage order
+        qn = q.tocsr(copy=True)
+        qn.sort_indices()
+        return normalize(qn, norm="l2", copy=False)
+
+    def postings(self, term: int) -> np.ndarray:
+        return self.Xc.indices[self.Xc.indptr[term]: self.Xc.indptr[term + 1]]
+
+    def union_postings(self, terms) -> np.ndarray:
+        """Sorted rows that hold at least one of `terms`."""
+        parts = [self.postings(t) for t in terms]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts)).astype(np.int64)
+
+    # ---------- exhaustive ----------
+    def cosine(self, qn: csr_matrix, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine of a normalized query against all rows (or just `rows`)."""
+        Xr = self.Xn if rows is None else self.Xn[rows]
+        if Xr.shape[0] == 0:
+            return np.zeros(0)
+        return np.asarray((Xr @ qn.T).todense(), dtype=np.float64).ravel()
+
+    # ---------- posting-list top-k ----------
+    def topk(
+        self,
+        qn: csr_matrix,
+        k: int,
+        alpha: float,
+        biz_fn: BizFn,
+        biz_ub: float,
+        cand_pos: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Top-k rows for `alpha * cosine + (1 - alpha) * biz`.
+
+        cand_pos: None for the whole catalog, else an int array over all rows holding
+        each candidate's position in the caller's candidate list (-1 = excluded).
+        Ties break on that position (row id when None), like a stable argsort.
+        Returns (rows, sims, biz, score), already ordered.
+        """
+        terms, qv = qn.indices, qn.data
+        rest_w = 1.0 - alpha
+        biz_ub = max(float(biz_ub), 0.0) * (1 + _UB_RTOL) + _UB_ATOL
+
+        def _keep(rows: np.ndarray) -> np.ndarray:
+            return rows if cand_pos is None else rows[cand_pos[rows] >= 0]
+
+        def _tiebreak(rows: np.ndarray) -> np.ndarray:
+            return rows if cand_pos is None else cand_pos[rows]
+
+        def _score(rows: np.ndarray):
+            sims = self.cosine(qn, rows)
+            biz = biz_fn(rows)
+            return sims, biz, alpha * sims + rest_w * biz
+
+        def _take(rows, sims, biz, score):
+            o = topk_order(score, _tiebreak(rows), k)
+            return rows[o], sims[o], biz[o], score[o]
+
+        if not len(terms):
+            bounds = np.zeros(0)
+        elif self.col_min is None:
+            bounds = alpha * qv * self.col_max[terms]
+        else:
+            # signed weights (hashed vectorizer): a term adds at most max(q*max, q*min, 0)
+            bounds = alpha * np.maximum(np.maximum(qv * self.col_max[terms], qv * self.col_min[terms]), 0.0)
+        by_bound = np.argsort(-bounds, kind="stable")
+
+        # --- seed: highest-bound terms until k candidates are covered -> threshold
+        if alpha > 0 and len(terms):
+            n_seed, seed = 0, np.zeros(0, dtype=np.int64)
+            for n_seed in range(1, len(terms) + 1):
+                seed = _keep(self.union_postings(terms[by_bound[:n_seed]]))
+                if len(seed) >= k:
+                    break
+            if len(seed) >= k:
+                _, _, s_score = _score(seed)
+                theta = kth_largest(s_score, k)
+
+                # --- MaxScore split: lowest-bound tail that cannot reach theta
+                tail = by_bound[n_seed:][::-1]
+                cum = np.cumsum(bounds[tail]) * (1 + _UB_RTOL) + _UB_ATOL + rest_w * biz_ub
+                n_non = int(np.searchsorted(cum >= theta, True))
+                outside_ub = cum[n_non - 1] if n_non else rest_w * biz_ub
+                if outside_ub < theta:
+                    essential = by_bound[: len(terms) - n_non]
+                    rows = _keep(self.union_postings(terms[essential]))
+                    return _take(rows, *_score(rows))
+
+        # --- exhaustive over touched rows (+ untouched rows when biz can reach top-k)
+        rows = _keep(self.union_postings(terms))
+        sims, biz, score = _score(rows)
+        if len(rows) >= k and kth_largest(score, k) > rest_w * biz_ub:
+            return _take(rows, sims, biz, score)
+
+        if cand_pos is None:
+            others = np.setdiff1d(np.arange(self.n_rows), rows, assume_unique=True)
+        else:
+            others = np.setdiff1d(np.flatnonzero(cand_pos >= 0), rows, assume_unique=True)
+        o_sims = np.zeros(len(others))
+        o_biz = biz_fn(others)
+        o_score = alpha * o_sims + rest_w * o_biz
+        return _take(
+            np.concatenate([rows, others]),
+            np.concatenate([sims, o_sims]),
+            np.concatenate([biz, o_biz]),
+            np.concatenate([score, o_score]),
+        )
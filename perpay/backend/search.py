@@ -1,16 +1,33 @@
 # backend/search.py
 from __future__ import annotations
 
+import bisect
+import hashlib
 import math
+import mmap
 import os
 import re
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
-from scipy.sparse import csr_matrix, hstack
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy.sparse import csr_matrix, hstack, vstack
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+
+import snapshot
+from cache import LRUCache, request_key
+from catalog_store import STORE_VERSION, CatalogStore
+from dense import DenseIndex, fuse
+from facets import FACET_COLS, PRICE_EDGES, FacetIndex
+from filters import FilterIndex, hard_spec
+from hashing import HASH_VERSION, NGRAM_MIN_DF, HashedTfidf
+from metrics import SEARCH_CACHE, StageTimer
+from rerank import RerankCatalog, Reranker, catalog_features
+from scoring import ENGINES, InvertedIndexScorer, topk_order
+from similar import SIMILAR_VERSION, SimilarityGraph
+from spelling import MAX_EDIT, MIN_WORD_LEN, PREFIX_LEN, SpellIndex, correctable
+from suggest import KEY_BYTES, MAX_WORD_STARTS, SHORT_PREFIX, WEIGHT_COLS, SuggestIndex
+from utils import native_values, records_from_columns
 
 # ========= Cleaning / normalization =========
 EXCEL_ERR = re.compile(r"^\s*#(?:REF|NAME|VALUE|NULL|N/?A|DIV/0!?|NUM|CALC)!?\s*$", re.I)
@@ -37,6 +54,29 @@ def _plural_to_singular(q: str) -> str:
             out.append(t)
     return " ".join(out)
 
+_WORD = re.compile(r"[a-z0-9]+")
+
+def _merge_fixes(out: List[Dict[str, str]], found: List[Dict[str, str]]) -> None:
+    """Append the spelling corrections in `found` that `out` does not hold yet."""
+    for f in found:
+        if f not in out:
+            out.append(f)
+
+def _map_text(s: pd.Series, fn) -> pd.Series:
+    """`s.map(fn)`; a categorical column maps each category once and stays categorical."""
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        return s.map(fn)
+    mapped = [fn(c) for c in s.cat.categories] + [fn(np.nan)]   # last slot: missing (code -1)
+    values, inverse = np.unique(np.asarray(mapped, dtype=object), return_inverse=True)
+    codes = inverse[s.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=values), index=s.index, name=s.name)
+
+def _norm_column(s: pd.Series) -> pd.Series:
+    """fillna("") -> str -> _norm_text, as a plain object column."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return _map_text(s, lambda v: _norm_text("" if pd.isna(v) else str(v))).astype(str)
+    return s.fillna("").astype(str).map(_norm_text)
+
 def _minmax(x: pd.Series) -> pd.Series:
     x = pd.to_numeric(x, errors="coerce")
     lo, hi = x.min(), x.max()
@@ -44,12 +84,6 @@ def _minmax(x: pd.Series) -> pd.Series:
         return pd.Series(np.zeros(len(x)), index=x.index)
     return (x - lo) / (hi - lo)
 
-def _norm_eq(series: pd.Series, val: Optional[str]) -> np.ndarray:
-    if not val:
-        return np.ones(len(series), dtype=bool)
-    v = val.strip().lower()
-    return series.astype(str).str.strip().str.lower().eq(v).to_numpy()
-
 # ========= Color aliases (optional prefiltering) =========
 COLOR_ALIASES: Dict[str, set[str]] = {
     "red": {"red", "crimson", "scarlet", "maroon", "burgundy", "ruby"},
@@ -67,11 +101,64 @@ COLOR_ALIASES: Dict[str, set[str]] = {
     "gold": {"gold", "golden"},
 }
 
-def _contains_any(text: str, vocab: set[str]) -> bool:
-    if not text:
-        return False
-    words = set(re.split(r"[^\w]+", text.lower()))
-    return bool(words & vocab)
+def filter_spec(
+    brand: Optional[str],
+    color: Optional[str],
+    obj: Optional[str],
+    category_name_1: Optional[str] = None,
+    category_name_2: Optional[str] = None,
+    category_name_3: Optional[str] = None,
+    category_any: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = False,
+    current_status: Optional[str] = None,
+) -> Dict:
+    """Request filters -> `FilterIndex.candidate_mask` keywords (object singularized, color aliased)."""
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise ValueError(f"min_price ({min_price}) is greater than max_price ({max_price})")
+    toks = None
+    if obj:
+        obj_l = str(obj).strip().lower()
+        if obj_l.endswith("es") and not obj_l.endswith("ses"):
+            obj_l = obj_l[:-2]
+        elif obj_l.endswith("s") and not obj_l.endswith("ss"):
+            obj_l = obj_l[:-1]
+        toks = sorted({t for t in re.findall(r"[a-z0-9]+", obj_l) if t})
+    colors = sorted(COLOR_ALIASES.get(color.lower(), {color.lower()})) if color else None
+    eq = {
+        col: val for col, val in (
+            ("category_name_1", category_name_1),
+            ("category_name_2", category_name_2),
+            ("category_name_3", category_name_3),
+        ) if val
+    }
+    return dict(
+        brand=brand, eq=eq, category_any=category_any, obj_toks=toks, color_words=colors,
+        min_price=min_price, max_price=max_price, in_stock=bool(in_stock), status=current_status,
+    )
+
+# Keyword defaults of CosineSearch.search; used to canonicalize cache keys
+SEARCH_DEFAULTS: Dict[str, object] = {
+    "pos_terms": None, "top_k": 5, "include_cols": None, "alpha": 0.7, "biz_weights": None,
+    "brand": None, "color": None, "object": None,
+    "category_name_1": None, "category_name_2": None, "category_name_3": None, "category_any": None,
+    "min_price": None, "max_price": None, "in_stock": False, "current_status": None,
+    "n_probes": None, "rerank": None,
+}
+
+# Request keywords that restrict the candidate rows (filter_spec's arguments, in order)
+FILTER_KEYS = (
+    "brand", "color", "object", "category_name_1", "category_name_2", "category_name_3", "category_any",
+    "min_price", "max_price", "in_stock", "current_status",
+)
+
+def has_filters(params: Dict) -> bool:
+    """True when a request restricts the candidate rows (a 0 price bound counts)."""
+    return any(
+        params.get(k) is not None if k in ("min_price", "max_price") else bool(params.get(k))
+        for k in FILTER_KEYS
+    )
 
 # ========= Core class =========
 class CosineSearch:
@@ -80,6 +167,7 @@ class CosineSearch:
     (query, category_name, object, joined terms), and business-score blending.
 
     Final score = alpha * cosine + (1 - alpha) * business_score
+    (engine="hybrid": cosine = fused sparse TF-IDF + dense LSA cosine, see dense.py)
     """
 
     # Only the two business features you care about:
@@ -90,9 +178,76 @@ class CosineSearch:
         "return_rate": ("return_rate", "inverse"),
     }
 
-    def __init__(self, csv_path: str, *, name_col: str = "name"):
+    # Both TF-IDF blocks share these settings; they are part of the snapshot key
+    TFIDF_PARAMS = dict(
+        lowercase=True, stop_words="english", strip_accents="unicode",
+        ngram_range=(1, 3), sublinear_tf=True, smooth_idf=True,
+        min_df=1, max_df=0.95,
+    )
+    NAME_WEIGHT = 5
+    CAT_WEIGHT = 2
+    # "exact": vocabulary TF-IDF; "hashed": fixed-size signed hashing, float32 (hashing.py)
+    VECTORIZERS = ("exact", "hashed")
+
+    # Columns loaded up front from a CatalogStore (`catalog_dir`); any other column is
+    # read from the store on first use (e.g. a non-default include_cols)
+    STORE_COLUMNS = [
+        "product_id", "brand", "product_url", "current_price", "current_cost", "current_margin",
+        "category_name_1", "category_name_2", "category_name_3", "category_name_4",
+        "request_path_1", "request_path_2", "request_path_3", "request_path_4",
+        "current_inventory", "current_status",
+    ]
+
+    def __init__(
+        self,
+        csv_path: str,
+        *,
+        name_col: str = "name",
+        engine: str = "full",
+        snapshot_dir: Optional[str] = None,
+        catalog_dir: Optional[str] = None,
+        encode_cache_size: int = 4096,
+        result_cache_size: int = 1024,
+        result_cache_ttl: Optional[float] = 300.0,
+        encode_cache: Optional[LRUCache] = None,
+        result_cache: Optional[LRUCache] = None,
+        dense: bool = False,
+        dense_dim: int = 128,
+        dense_lists: Optional[int] = None,
+        dense_probes: int = 8,
+        dense_weight: float = 0.3,
+        page_cache_bytes: int = 64 << 20,
+        page_cache_ttl: Optional[float] = 600.0,
+        page_depth: int = 1000,
+        spell_correct: bool = True,
+        vectorizer: str = "exact",
+        hash_features: int = 1 << 20,
+        similar_neighbors: int = 0,
+        similar_workers: Optional[int] = None,
+        reranker: Optional[Reranker] = None,
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        if vectorizer not in self.VECTORIZERS:
+            raise ValueError(f"Unknown vectorizer '{vectorizer}', expected one of {self.VECTORIZERS}")
         self.name_col = name_col
-        self.df = pd.read_csv(csv_path)
+        self.engine = engine
+        self.vectorizer = vectorizer
+        self.hash_features = int(hash_features)   # columns per text block in hashed mode
+        # Dense LSA + IVF (engine="hybrid"); build-time settings go into the snapshot key
+        self.dense_cfg = {"dim": int(dense_dim), "lists": dense_lists} if (dense or engine == "hybrid") else None
+        self.dense_probes = max(1, int(dense_probes))
+        self.dense_weight = float(np.clip(dense_weight, 0.0, 1.0))
+        # "More like this" kNN graph (similar.py); 0 neighbours = not built
+        self.similar_neighbors = max(0, int(similar_neighbors))
+        self.similar_workers = similar_workers
+        # Typed, memory-mapped columns (catalog_store.py) instead of a full read_csv
+        self.catalog_store: Optional[CatalogStore] = None
+        if catalog_dir:
+            self.catalog_store = CatalogStore.open(csv_path, catalog_dir)
+            self.df = self.catalog_store.frame([self.name_col] + self.STORE_COLUMNS)
+        else:
+            self.df = pd.read_csv(csv_path)
 
         # normalize product_id if present
         if "product_id" in self.df.columns:
@@ -112,7 +267,11 @@ class CosineSearch:
                 )
                 keep = [c for c in ["product_id", "return_rate"] if c in rr.columns]
                 if "product_id" in keep and "return_rate" in keep:
-                    self.df = self.df.merge(rr[keep], on="product_id", how="left")
+                    if rr["product_id"].is_unique:
+                        # same as the left merge, without copying every catalog column
+                        self.df["return_rate"] = self.df["product_id"].map(rr.set_index("product_id")["return_rate"])
+                    else:
+                        self.df = self.df.merge(rr[keep], on="product_id", how="left")
             except Exception:
                 # continue without return_rate if load fails
                 pass
@@ -124,12 +283,12 @@ class CosineSearch:
             "request_path_1", "request_path_2", "request_path_3", "request_path_4",
         ]:
             if col in self.df.columns:
-                self.df[col] = self.df[col].map(_clean_token_text)
+                self.df[col] = _map_text(self.df[col], _clean_token_text)
 
         # Derived profitability = (price - cost) / price if possible.
         if "current_price" in self.df.columns and "current_cost" in self.df.columns:
-            pr = pd.to_numeric(self.df["current_price"], errors="coerce")
-            ct = pd.to_numeric(self.df["current_cost"], errors="coerce")
+            pr = pd.to_numeric(self.df["current_price"], errors="coerce").astype(float)
+            ct = pd.to_numeric(self.df["current_cost"], errors="coerce").astype(float)
             with np.errstate(divide="ignore", invalid="ignore"):
                 self.df["_derived_margin"] = np.where(pr > 0, (pr - ct) / pr, np.nan)
 
@@ -138,33 +297,83 @@ class CosineSearch:
             if pd.isna(self.df["_derived_margin"]).all():
                 self.df["_derived_margin"] = pd.to_numeric(self.df["current_margin"], errors="coerce")
 
-        # === Build TF-IDF blocks: NAME and CATEGORY BLOB ===
-        name_series = self.df[self.name_col].fillna("").astype(str).map(_norm_text)
-        self.df["search_name"] = (name_series + " ").str.strip()
-
-        c1 = self.df.get("category_name_1", pd.Series("", index=self.df.index)).fillna("").astype(str).map(_norm_text)
-        c2 = self.df.get("category_name_2", pd.Series("", index=self.df.index)).fillna("").astype(str).map(_norm_text)
-        c3 = self.df.get("category_name_3", pd.Series("", index=self.df.index)).fillna("").astype(str).map(_norm_text)
-        c4 = self.df.get("category_name_4", pd.Series("", index=self.df.index)).fillna("").astype(str).map(_norm_text)
-        rp1 = self.df.get("request_path_1", pd.Series("", index=self.df.index)).fillna("").astype(str).map(_norm_text)
-        rp2 = self.df.get("request_path_2", pd.Series("", index=self.df.index)).fillna("").astype(str).map(_norm_text)
-        rp3 = self.df.get("request_path_3", pd.Series("", index=self.df.index)).fillna("").astype(str).map(_norm_text)
-        rp4 = self.df.get("request_path_4", pd.Series("", index=self.df.index)).fillna("").astype(str).map(_norm_text)
-        catblob = (c1 + " " + c2 + " " + c3 + " " + c4 + " " + rp1 + " " + rp2 + " " + rp3 + " " + rp4).str.strip()
-        self.df["search_cat"] = catblob
-
         # Vectorizers
-        self.v_name = TfidfVectorizer(
-            lowercase=True, stop_words="english", strip_accents="unicode",
-            ngram_range=(1, 3), sublinear_tf=True, smooth_idf=True,
-            min_df=1, max_df=0.95
+        self.v_name = self._new_vectorizer()
+        self.v_cat = self._new_vectorizer()
+
+        # Catalog version stamp: content hash of the inputs + index settings.
+        # Caches are tagged with it, so anything computed on another catalog is dropped.
+        self.catalog_version = snapshot.snapshot_key([csv_path, rr_path], self._index_settings())
+        self.encode_cache = encode_cache if encode_cache is not None else LRUCache(encode_cache_size)
+        # Out-of-vocabulary query words -> closest vocabulary term ("" = none close enough)
+        self.spell_correct = bool(spell_correct)
+        self.spell_cache = LRUCache(encode_cache_size)
+        self.result_cache = (
+            result_cache if result_cache is not None else LRUCache(result_cache_size, ttl=result_cache_ttl)
         )
-        self.v_cat = TfidfVectorizer(
-            lowercase=True, stop_words="english", strip_accents="unicode",
-            ngram_range=(1, 3), sublinear_tf=True, smooth_idf=True,
-            min_df=1, max_df=0.95
+        # Ranked arrays behind `search_page` cursors, bounded by bytes (LRU) and TTL
+        self.page_depth = max(1, int(page_depth))
+        self.page_cache = LRUCache(
+            1 << 20 if page_cache_bytes else 0, ttl=page_cache_ttl,
+            max_bytes=page_cache_bytes, sizeof=lambda hit: sum(a.nbytes for a in hit[0]),
         )
 
+        # Response columns, pre-extracted as native values (see `_records`)
+        self.default_include_cols = [
+            "score", "similarity", "business_score", "product_id",
+            self.name_col, "brand", "current_price", "product_url",
+        ]
+        self._native_cols: Dict[str, np.ndarray] = {}
+        self._product_index: Optional[pd.Index] = None   # product_id -> row, built on first use
+        for col in self.default_include_cols:
+            if self._has_column(col):
+                self._native_column(col)
+
+        # === Index: load a matching snapshot if we have one, else fit (and save) ===
+        self.snapshot_path: Optional[str] = None
+        self._mapped: List[np.ndarray] = []      # memory-mapped snapshot arrays (see warm_pages)
+        if snapshot_dir:
+            self.snapshot_path = snapshot.path_for(snapshot_dir, self.catalog_version)
+            with snapshot.build_lock(self.snapshot_path):
+                if not self._try_load_snapshot(self.snapshot_path):
+                    self._build_index()
+                    snapshot.save(self.snapshot_path, *self._index_arrays())
+        else:
+            self._build_index()
+
+        # Second ranking stage (rerank.py); its per-row catalog features are built once here
+        self.reranker = reranker
+        self.rerank_catalog = self.rerank_features() if reranker is not None else None
+
+    # ---------- Index build / snapshot ----------
+    def _new_vectorizer(self):
+        if self.vectorizer == "hashed":
+            return HashedTfidf(self.hash_features, **self.TFIDF_PARAMS)
+        return TfidfVectorizer(**self.TFIDF_PARAMS)
+
+    def _index_settings(self) -> Dict:
+        settings = {
+            "name_col": self.name_col,
+            "tfidf": self.TFIDF_PARAMS,
+            "weights": [self.NAME_WEIGHT, self.CAT_WEIGHT],
+            "biz": self.DEFAULT_FEATURE_MAP,
+            "facets": [FACET_COLS, PRICE_EDGES],
+            "suggest": [WEIGHT_COLS, KEY_BYTES, MAX_WORD_STARTS, SHORT_PREFIX],
+            "spelling": [MAX_EDIT, PREFIX_LEN, MIN_WORD_LEN],
+            "filters": [FilterIndex.PRICE_COL, FilterIndex.STOCK_COL, FilterIndex.STATUS_COL],
+        }
+        if self.catalog_store is not None:
+            # float32 prices give (slightly) different business features than the CSV
+            settings["catalog_store"] = STORE_VERSION
+        if self.dense_cfg:
+            settings["dense"] = self.dense_cfg
+        if self.similar_neighbors:
+            settings["similar"] = [self.similar_neighbors, SIMILAR_VERSION]
+        if self.vectorizer == "hashed":
+            settings["hashing"] = [self.hash_features, NGRAM_MIN_DF, HASH_VERSION]
+        return settings
+
+    def _build_index(self) -> None:
         N = len(self.df)
 
         def _fit_or_empty(vec, series):
@@ -174,14 +383,126 @@ class CosineSearch:
                 # empty vocab → return (N x 0) block to keep pipeline alive
                 return csr_matrix((N, 0))
 
-        Xn = _fit_or_empty(self.v_name, self.df["search_name"])
-        Xc = _fit_or_empty(self.v_cat,  self.df["search_cat"])
+        search_name, search_cat = self._search_texts()
+        Xn = _fit_or_empty(self.v_name, search_name)
+        Xc = _fit_or_empty(self.v_cat,  search_cat)
+        del search_name, search_cat
+        self.speller = SpellIndex(self._term_frequencies())
 
         # weights: name 5x, categories 2x (tune if you like)
-        self.X = hstack([5 * Xn, 2 * Xc]).tocsr()
+        self.X = hstack([self.NAME_WEIGHT * Xn, self.CAT_WEIGHT * Xc]).tocsr()
 
         # Business features
         self.biz_feature_names, self.biz_matrix = self._build_business_matrix()
+        self._set_biz_bounds()
+
+        # Normalized rows + CSC posting lists for the scoring engines
+        self.scorer = InvertedIndexScorer(self.X)
+
+        # Optional LSA projection + IVF lists (needs >= 2 rows and 2 features for an SVD)
+        self.dense_index: Optional[DenseIndex] = None
+        if self.dense_cfg and min(self.X.shape) >= 2:
+            self.dense_index = DenseIndex(self.scorer.Xn, self.dense_cfg["dim"], self.dense_cfg["lists"])
+
+        # Optional top-N similar rows per row for /similar (all-pairs, blocked, process pool)
+        self.similar_graph: Optional[SimilarityGraph] = None
+        if self.similar_neighbors and self.X.shape[1]:
+            self.similar_graph = SimilarityGraph.build(
+                self.scorer.Xn, self.similar_neighbors, workers=self.similar_workers
+            )
+
+        # Filter index (categorical codes + token postings), built once
+        self.filters = FilterIndex(self.df, self.name_col)
+
+        # Per-value row bitmaps for facet counts
+        self.facet_index = FacetIndex(self.df)
+
+        # Sorted word-start keys for /suggest
+        self.suggest_index = SuggestIndex(self.df, self.name_col, _norm_text, column=self._store_only_column)
+
+    def _search_texts(self) -> Tuple[pd.Series, pd.Series]:
+        """TF-IDF input texts: NAME and CATEGORY BLOB. Only needed while fitting."""
+        name_series = _norm_column(self.df[self.name_col])
+        search_name = (name_series + " ").str.strip()
+
+        empty = pd.Series("", index=self.df.index)
+        cat_cols = [
+            "category_name_1", "category_name_2", "category_name_3", "category_name_4",
+            "request_path_1", "request_path_2", "request_path_3", "request_path_4",
+        ]
+        parts = [_norm_column(self.df.get(c, empty)) for c in cat_cols]
+        catblob = parts[0]
+        for p in parts[1:]:
+            catblob = catblob + " " + p
+        return search_name, catblob.str.strip()
+
+    def _set_biz_bounds(self) -> None:
+        self.biz_max = self.biz_matrix.max(axis=0) if self.biz_matrix.size else np.zeros(0)
+        self.biz_min = self.biz_matrix.min(axis=0) if self.biz_matrix.size else np.zeros(0)
+
+    def _index_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict]:
+        arrays: Dict[str, np.ndarray] = {"biz_matrix": self.biz_matrix}
+        meta: Dict = {
+            "rows": len(self.df),
+            "biz_features": self.biz_feature_names,
+            "dense": self.dense_index is not None,
+            "similar": self.similar_graph is not None,
+        }
+        for tag, vec in (("name", self.v_name), ("cat", self.v_cat)):
+            if isinstance(vec, HashedTfidf):
+                meta[f"v_{tag}_fitted"] = vec.fitted
+                if vec.fitted:
+                    arrays.update(vec.to_arrays(f"v_{tag}"))
+                continue
+            fitted = hasattr(vec, "vocabulary_")
+            meta[f"v_{tag}_fitted"] = fitted
+            if fitted:
+                arrays.update(snapshot.SortedVocabulary.from_vocabulary(vec.vocabulary_).to_arrays(f"v_{tag}"))
+                arrays[f"v_{tag}.idf"] = vec.idf_
+        arrays.update(snapshot.sparse_arrays("X", self.X))
+        arrays.update(self.scorer.to_arrays("scorer"))
+        arrays.update(self.filters.to_arrays("filters"))
+        arrays.update(self.facet_index.to_arrays("facets"))
+        arrays.update(self.suggest_index.to_arrays("suggest"))
+        arrays.update(self.speller.to_arrays("spell"))
+        if self.dense_index is not None:
+            arrays.update(self.dense_index.to_arrays("dense"))
+        if self.similar_graph is not None:
+            arrays.update(self.similar_graph.to_arrays("similar"))
+        return arrays, meta
+
+    def _try_load_snapshot(self, path: str) -> bool:
+        if not snapshot.exists(path):
+            return False
+        try:
+            arrays, meta = snapshot.load(path, mmap=True)
+            if meta.get("rows") != len(self.df):
+                return False
+            for tag, vec in (("name", self.v_name), ("cat", self.v_cat)):
+                if meta.get(f"v_{tag}_fitted") and isinstance(vec, HashedTfidf):
+                    vec.load_arrays(arrays, f"v_{tag}")
+                elif meta.get(f"v_{tag}_fitted"):
+                    # searchsorted over the mapped terms: no per-worker dict of the n-gram vocabulary
+                    vec.vocabulary_ = snapshot.SortedVocabulary.from_arrays(arrays, f"v_{tag}")
+                    vec.idf_ = np.asarray(arrays[f"v_{tag}.idf"])
+            self.X = snapshot.sparse_from(arrays, "X", "csr")
+            self.biz_feature_names = list(meta["biz_features"])
+            self.biz_matrix = arrays["biz_matrix"]
+            self._set_biz_bounds()
+            self.scorer = InvertedIndexScorer.from_arrays(arrays, "scorer")
+            self.filters = FilterIndex.from_arrays(arrays, "filters")
+            self.facet_index = FacetIndex.from_arrays(arrays, "facets")
+            self.suggest_index = SuggestIndex.from_arrays(arrays, "suggest")
+            self.speller = SpellIndex.from_arrays(arrays, "spell")
+            self.dense_index = DenseIndex.from_arrays(arrays, "dense") if meta.get("dense") else None
+            self.similar_graph = SimilarityGraph.from_arrays(arrays, "similar") if meta.get("similar") else None
+            self._mapped = [a for a in arrays.values() if isinstance(a, np.memmap)]
+        except Exception:
+            # unreadable / stale snapshot → rebuild from the CSV
+            self.v_name = self._new_vectorizer()
+            self.v_cat = self._new_vectorizer()
+            return False
+        return True
 
     # ---------- Business features ----------
     def _build_business_matrix(self) -> Tuple[List[str], np.ndarray]:
@@ -202,11 +523,112 @@ class CosineSearch:
         return cols, M
 
     # ---------- Encoders (project any text into the same space) ----------
-    def _encode_text(self, q: str) -> csr_matrix:
-        q = _plural_to_singular(_norm_text(q or ""))
+    def _encode_text(self, q: str, fixes: Optional[List[Dict[str, str]]] = None) -> csr_matrix:
+        """Query vector of `q`; its spelling corrections are merged into `fixes` when given."""
+        q, found = self._correct_text(_norm_text(q or ""))
+        if fixes is not None:
+            _merge_fixes(fixes, found)
+        q = _plural_to_singular(q)
+        hit = self.encode_cache.get(q, self.catalog_version)
+        if hit is not None:
+            return hit
         qn = self.v_name.transform([q])
         qc = self.v_cat.transform([q])
-        return hstack([5 * qn, 2 * qc]).tocsr()
+        vec = hstack([self.NAME_WEIGHT * qn, self.CAT_WEIGHT * qc]).tocsr()
+        self.encode_cache.put(q, vec, self.catalog_version)
+        return vec
+
+    # ---------- Spelling correction ----------
+    def _term_frequencies(self) -> Dict[str, int]:
+        """Unigram terms of both vectorizers -> document frequency (from the smoothed idf)."""
+        n = len(self.df)
+        out: Dict[str, int] = {}
+        for vec in (self.v_name, self.v_cat):
+            if isinstance(vec, HashedTfidf):
+                # no vocabulary to read back: the fit kept the word counts for us
+                for t, d in vec.pop_term_df().items():
+                    out[t] = out.get(t, 0) + d
+                continue
+            if not hasattr(vec, "vocabulary_"):
+                continue
+            df = np.rint((1 + n) / np.exp(vec.idf_ - 1.0) - 1.0).astype(np.int64)
+            for t, j in vec.vocabulary_.items():
+                if " " not in t:
+                    out[t] = out.get(t, 0) + int(df[j])
+        return out
+
+    def _in_vocab(self, w: str) -> bool:
+        if self.vectorizer == "hashed":
+            # the spelling index's sorted words are the only vocabulary kept
+            i = bisect.bisect_left(self.speller.terms, w)
+            return i < len(self.speller.terms) and self.speller.terms[i] == w
+        return any(w in getattr(vec, "vocabulary_", ()) for vec in (self.v_name, self.v_cat))
+
+    def _correct_word(self, w: str) -> Optional[str]:
+        if (not correctable(w) or w in ENGLISH_STOP_WORDS
+                or self._in_vocab(w) or self._in_vocab(_plural_to_singular(w))):
+            return None
+        hit = self.spell_cache.get(w, self.catalog_version)
+        if hit is None:
+            hit = self.speller.correct(w) or ""
+            self.spell_cache.put(w, hit, self.catalog_version)
+        return hit or None
+
+    def _correct_text(self, q: str) -> Tuple[str, List[Dict[str, str]]]:
+        """Normalized text with out-of-vocabulary words replaced, plus the replacements."""
+        if not self.spell_correct:
+            return q, []
+        fixes: List[Dict[str, str]] = []
+
+        def fix(m: re.Match) -> str:
+            w = m.group(0)
+            c = self._correct_word(w)
+            if c is None:
+                return w
+            fixes.append({"from": w, "to": c})
+            return c
+
+        return _WORD.sub(fix, q), fixes
+
+    def spelling(
+        self,
+        query: str,
+        pos_terms: Optional[List[str]] = None,
+        category_any: Optional[str] = None,
+        object: Optional[str] = None,
+    ) -> List[Dict[str, str]]:
+        """
+        The corrections `search` applies to these inputs: [{"from", "to"}], first seen first.
+        `search` reports them itself (its `corrections` argument); this is for callers that
+        do not search.
+        """
+        out: List[Dict[str, str]] = []
+        for comp in self._components(query, pos_terms, category_any, object):
+            _merge_fixes(out, self._correct_text(_norm_text(comp or ""))[1])
+        return out
+
+    def _encode_many(self, texts: List[str], fixes: Optional[List[List[Dict[str, str]]]] = None) -> csr_matrix:
+        """
+        `_encode_text` for a list: cache lookups, then one transform per vectorizer for the
+        misses. With `fixes`, each text's spelling corrections are appended to it.
+        """
+        qs = []
+        for t in texts:
+            q, found = self._correct_text(_norm_text(t or ""))
+            qs.append(_plural_to_singular(q))
+            if fixes is not None:
+                fixes.append(found)
+        rows: List[Optional[csr_matrix]] = [self.encode_cache.get(q, self.catalog_version) for q in qs]
+        todo = sorted({q for q, r in zip(qs, rows) if r is None})
+        if todo:
+            qn = self.v_name.transform(todo)
+            qc = self.v_cat.transform(todo)
+            fresh = hstack([self.NAME_WEIGHT * qn, self.CAT_WEIGHT * qc]).tocsr()
+            enc = {q: fresh[i] for i, q in enumerate(todo)}
+            for q, vec in enc.items():
+                self.encode_cache.put(q, vec, self.catalog_version)
+            rows = [r if r is not None else enc[q] for q, r in zip(qs, rows)]
+        return vstack(rows, format="csr")
 
     # ---------- Candidate restriction (optional) ----------
     def _build_candidate_idx(
@@ -218,68 +640,21 @@ class CosineSearch:
         category_name_2: Optional[str] = None,
         category_name_3: Optional[str] = None,
         category_any: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+        current_status: Optional[str] = None,
     ) -> np.ndarray:
-        N = len(self.df)
-        mask = np.ones(N, dtype=bool)
-
-        if brand and "brand" in self.df.columns:
-            bmask = _norm_eq(self.df["brand"], brand)
-            if bmask.any():
-                mask &= bmask
-
-        if "category_name_1" in self.df.columns and category_name_1:
-            mask &= _norm_eq(self.df["category_name_1"], category_name_1)
-        if "category_name_2" in self.df.columns and category_name_2:
-            mask &= _norm_eq(self.df["category_name_2"], category_name_2)
-        if "category_name_3" in self.df.columns and category_name_3:
-            mask &= _norm_eq(self.df["category_name_3"], category_name_3)
-
-        if category_any:
-            parts = []
-            for col in ["category_name_1", "category_name_2", "category_name_3", "category_name_4"]:
-                if col in self.df.columns:
-                    parts.append(_norm_eq(self.df[col], category_any))
-            if parts:
-                anymask = parts[0]
-                for p in parts[1:]:
-                    anymask = np.logical_or(anymask, p)
-                if anymask.any():
-                    mask &= anymask
-
-        if obj:
-            obj_l = str(obj).strip().lower()
-            if obj_l.endswith("es") and not obj_l.endswith("ses"):
-                obj_l = obj_l[:-2]
-            elif obj_l.endswith("s") and not obj_l.endswith("ss"):
-                obj_l = obj_l[:-1]
-            toks = {t for t in re.findall(r"[a-z0-9]+", obj_l) if t}
-            if toks:
-                text = (
-                    self.df[self.name_col].fillna("").astype(str) + " " +
-                    self.df.get("category_name_1", "").fillna("").astype(str) + " " +
-                    self.df.get("category_name_2", "").fillna("").astype(str) + " " +
-                    self.df.get("category_name_3", "").fillna("").astype(str) + " " +
-                    self.df.get("category_name_4", "").fillna("").astype(str) + " " +
-                    self.df.get("request_path_1", "").fillna("").astype(str) + " " +
-                    self.df.get("request_path_2", "").fillna("").astype(str) + " " +
-                    self.df.get("request_path_3", "").fillna("").astype(str) + " " +
-                    self.df.get("request_path_4", "").fillna("").astype(str)
-                ).str.lower()
-                mask &= text.apply(lambda t: any(tok in t for tok in toks)).to_numpy()
-
-        if color:
-            aliases = COLOR_ALIASES.get(color.lower(), {color.lower()})
-            text = (
-                self.df[self.name_col].fillna("").astype(str) + " " +
-                self.df.get("category_name_1", "").fillna("").astype(str) + " " +
-                self.df.get("category_name_2", "").fillna("").astype(str) + " " +
-                self.df.get("category_name_3", "").fillna("").astype(str) + " " +
-                self.df.get("category_name_4", "").fillna("").astype(str)
-            ).str.lower()
-            mask &= text.apply(lambda t: _contains_any(t, aliases)).to_numpy()
-
-        idx = np.where(mask)[0]
-        return idx if idx.size else np.arange(N)
+        spec = filter_spec(
+            brand, color, obj, category_name_1, category_name_2, category_name_3, category_any,
+            min_price, max_price, in_stock, current_status,
+        )
+        idx = np.where(self.filters.candidate_mask(**spec))[0]
+        if idx.size:
+            return idx
+        # nothing matched: relax to the whole catalog, but price / stock / status still hold
+        hard = hard_spec(spec)
+        return np.arange(len(self.df)) if hard is None else np.flatnonzero(self.filters.candidate_mask(**hard))
 
     # ---------- Main search ----------
     def search(
@@ -299,18 +674,576 @@ class CosineSearch:
         category_name_2: Optional[str] = None,
         category_name_3: Optional[str] = None,
         category_any: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+        current_status: Optional[str] = None,
+        engine: Optional[str] = None,
+        n_probes: Optional[int] = None,
+        rerank: Optional[bool] = None,
+        timings: Optional[Dict[str, float]] = None,
+        corrections: Optional[List[Dict[str, str]]] = None,
     ) -> List[dict]:
+        """
+        Pass a dict as `timings` to get this call's per-stage latency (ms) written into it;
+        the same laps always feed the /metrics histograms. Pass a list as `corrections` to
+        get the spelling corrections applied to the inputs (see `spelling`) appended to it.
+        `rerank`: None = the engine's reranker when it has one, False = stage 1 only,
+        True = require it (ValueError without one).
+        """
         if not query or not query.strip():
             return []
+        timer = StageTimer()
+        reranker = self._reranker_for(rerank)
 
+        # Result cache (skipped when the caller hands in its own candidate rows)
+        cache_key = None
+        if candidates_idx is None:
+            cache_key = self._result_key(dict(
+                query=query, pos_terms=pos_terms, top_k=top_k, include_cols=include_cols, alpha=alpha,
+                biz_weights=biz_weights, brand=brand, color=color, object=object,
+                category_name_1=category_name_1, category_name_2=category_name_2,
+                category_name_3=category_name_3, category_any=category_any, min_price=min_price,
+                max_price=max_price, in_stock=in_stock, current_status=current_status, engine=engine,
+                n_probes=n_probes, rerank=reranker.model.version if reranker is not None else None,
+            ))
+            hit = self.result_cache.get(cache_key, self.catalog_version)
+            timer.lap("cache")
+            SEARCH_CACHE.inc(outcome="hit" if hit is not None else "miss")
+            if hit is not None:
+                items, fixes = hit
+                self._record_timings(timer, len(items), timings)
+                if corrections is not None:
+                    corrections.extend(fixes)
+                return items
+
+        items, complete, fixes = self._search_uncached(
+            query, pos_terms, top_k, include_cols, candidates_idx, alpha, biz_weights,
+            brand, color, object, category_name_1, category_name_2, category_name_3, category_any,
+            min_price, max_price, in_stock, current_status, engine, n_probes, reranker, timer,
+        )
+        if cache_key is not None and complete:
+            self.result_cache.put(cache_key, (items, fixes), self.catalog_version)
+        self._record_timings(timer, len(items), timings)
+        if corrections is not None:
+            corrections.extend(fixes)
+        return items
+
+    @staticmethod
+    def _record_timings(timer: StageTimer, n_results: int, timings: Optional[Dict[str, float]]) -> None:
+        stages = timer.record(n_results)
+        if timings is not None:
+            timings.update(stages)
+
+    def _search_uncached(
+        self,
+        query: str,
+        pos_terms: Optional[List[str]],
+        top_k: int,
+        include_cols: Optional[List[str]],
+        candidates_idx: Optional[np.ndarray],
+        alpha: float,
+        biz_weights: Optional[Dict[str, float]],
+        brand: Optional[str],
+        color: Optional[str],
+        object: Optional[str],
+        category_name_1: Optional[str],
+        category_name_2: Optional[str],
+        category_name_3: Optional[str],
+        category_any: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        in_stock: bool,
+        current_status: Optional[str],
+        engine: Optional[str],
+        n_probes: Optional[int],
+        reranker: Optional[Reranker],
+        timer: StageTimer,
+    ) -> Tuple[List[dict], bool, List[Dict[str, str]]]:
+        """
+        Items; False when the reranker's budgets served the stage-1 order instead; the
+        spelling corrections applied to the query.
+        """
+        k = int(top_k)
+        idx, sims, biz, score, fixes = self._rank(
+            query, pos_terms, max(k, reranker.depth) if reranker is not None else k, candidates_idx,
+            alpha, biz_weights, brand, color, object, category_name_1, category_name_2, category_name_3,
+            category_any, min_price, max_price, in_stock, current_status, engine, n_probes, timer,
+        )
+        complete = True
+        if reranker is not None:
+            idx, sims, biz, score, complete = reranker.rerank(self.rerank_catalog, idx, sims, biz, score, timer)
+        items = self._records(idx[:k], sims[:k], biz[:k], score[:k], include_cols)
+        timer.lap("finalize")
+        return items, complete, fixes
+
+    def retrieve(self, query: str, *, top_k: int = 300, **params) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The stage-1 ranking of a request (`search` keywords) as arrays: catalog rows,
+        similarity, business score, blended score. No caches, no reranking, no metrics.
+        """
+        p = {k: params.get(k, d) for k, d in SEARCH_DEFAULTS.items()}
+        idx, sims, biz, score, _ = self._rank(
+            query, p["pos_terms"], int(top_k), params.get("candidates_idx"), p["alpha"], p["biz_weights"],
+            *(p[k] for k in FILTER_KEYS), params.get("engine"), p["n_probes"], StageTimer(),
+        )
+        return idx, sims, biz, score
+
+    def _rank(
+        self,
+        query: str,
+        pos_terms: Optional[List[str]],
+        top_k: int,
+        candidates_idx: Optional[np.ndarray],
+        alpha: float,
+        biz_weights: Optional[Dict[str, float]],
+        brand: Optional[str],
+        color: Optional[str],
+        object: Optional[str],
+        category_name_1: Optional[str],
+        category_name_2: Optional[str],
+        category_name_3: Optional[str],
+        category_any: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        in_stock: bool,
+        current_status: Optional[str],
+        engine: Optional[str],
+        n_probes: Optional[int],
+        timer: StageTimer,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[Dict[str, str]]]:
+        """(rows, sims, biz, score) of the top `top_k`, and the spelling corrections applied to the query."""
         # Restrict candidate pool if any filters present
-        if candidates_idx is None and (
-            brand or color or object or category_name_1 or category_name_2 or category_name_3 or category_any
-        ):
-            candidates_idx = self._build_candidate_idx(
-                brand, color, object, category_name_1, category_name_2, category_name_3, category_any
+        if candidates_idx is None:
+            candidates_idx = self._candidates(dict(
+                brand=brand, color=color, object=object, category_name_1=category_name_1,
+                category_name_2=category_name_2, category_name_3=category_name_3, category_any=category_any,
+                min_price=min_price, max_price=max_price, in_stock=in_stock, current_status=current_status,
+            ))
+        timer.n_candidates = len(self.df) if candidates_idx is None else len(candidates_idx)
+        timer.lap("filter")
+
+        centroid, fixes = self._centroid(self._components(query, pos_terms, category_any, object))
+        timer.lap("encode")
+
+        # If vector space ended up empty, rank by business score only
+        if self.X.shape[1] == 0:
+            N = len(self.df)
+            idx_all = np.arange(N) if candidates_idx is None else candidates_idx
+            biz = self._compute_biz(idx_all, biz_weights)
+            order = np.argsort(-biz, kind="stable")[: int(top_k)]
+            timer.lap("blend")
+            return idx_all[order], np.zeros(len(order)), biz[order], biz[order], fixes
+
+        alpha = float(np.clip(alpha, 0.0, 1.0))
+        qn = InvertedIndexScorer.normalize_query(centroid)
+        engine = engine or self.engine
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+
+        if engine == "inverted":
+            # Posting-list walk + MaxScore pruning; same ranking as "full".
+            # Biz blending happens inside the walk, so it is all charged to "score".
+            cand_pos = None
+            if candidates_idx is not None:
+                cand_pos = np.full(self.X.shape[0], -1, dtype=np.int64)
+                cand_pos[candidates_idx] = np.arange(len(candidates_idx))
+            idx, sims, biz, score = self.scorer.topk(
+                qn, int(top_k), alpha,
+                lambda rows: self._compute_biz(rows, biz_weights),
+                self._biz_upper_bound(biz_weights),
+                cand_pos,
+            )
+            timer.lap("score")
+        elif engine == "hybrid":
+            idx, sims, biz, score = self._hybrid_topk(
+                qn, int(top_k), alpha, biz_weights, candidates_idx, n_probes, timer
             )
+        else:
+            # Cosine similarity once against the centroid vector
+            if candidates_idx is None:
+                sims = self.scorer.cosine(qn)
+                idx_all = np.arange(self.X.shape[0])
+            else:
+                sims = self.scorer.cosine(qn, candidates_idx)
+                idx_all = candidates_idx
+            timer.lap("score")
+
+            # Business score (only profitability + return_rate)
+            biz = self._compute_biz(idx_all, biz_weights)
+
+            # Blend + rank
+            score = alpha * sims + (1.0 - alpha) * biz
 
+            order = np.argsort(-score, kind="stable")[: int(top_k)]
+            idx, sims, biz, score = idx_all[order], sims[order], biz[order], score[order]
+            timer.lap("blend")
+
+        return idx, sims, biz, score, fixes
+
+    def _hybrid_topk(
+        self,
+        qn: csr_matrix,
+        k: int,
+        alpha: float,
+        biz_weights: Optional[Dict[str, float]],
+        candidates_idx: Optional[np.ndarray],
+        n_probes: Optional[int],
+        timer: StageTimer,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Candidates = rows in the n_probes closest k-means lists, and only those rows are
+        scored: `fuse(sparse cosine, dense cosine)`, then blended with biz like "full".
+        The work grows with the probed lists, not with the query terms' posting lists,
+        so fewer probes = fewer rows scored, lower recall; n_probes >= n_lists is exact.
+        """
+        if self.dense_index is None:
+            raise ValueError("Dense index not built; start the engine with dense=True (DENSE_INDEX=1)")
+        qd = self.dense_index.encode(qn)
+        timer.lap("encode")
+
+        N = self.X.shape[0]
+        cand_pos = None
+        if candidates_idx is not None:
+            cand_pos = np.full(N, -1, dtype=np.int64)
+            cand_pos[candidates_idx] = np.arange(len(candidates_idx))
+
+        # an all-zero query has no direction to probe: rank every candidate (biz only)
+        if qd.any():
+            rows = self.dense_index.probe(qd, n_probes or self.dense_probes)
+        else:
+            rows = np.arange(N)
+        if cand_pos is not None:
+            rows = rows[cand_pos[rows] >= 0]
+        if len(rows) < k:
+            # too few rows in the probed lists (tight filters): score all candidates
+            rows = np.arange(N) if cand_pos is None else np.sort(candidates_idx)
+
+        sparse = self.scorer.cosine(qn, None if len(rows) == N else rows)
+        sims = fuse(sparse, self.dense_index.scores(qd, rows), self.dense_weight)
+        timer.lap("score")
+        biz = self._compute_biz(rows, biz_weights)
+        score = alpha * sims + (1.0 - alpha) * biz
+        order = topk_order(score, rows if cand_pos is None else cand_pos[rows], k)
+        timer.lap("blend")
+        return rows[order], sims[order], biz[order], score[order]
+
+    # ---------- Pagination ----------
+    def search_page(
+        self,
+        query: str,
+        *,
+        page_size: int = 20,
+        cursor: Optional[str] = None,
+        pos_terms: Optional[List[str]] = None,
+        include_cols: Optional[List[str]] = None,
+        alpha: float = 0.7,
+        biz_weights: Optional[Dict[str, float]] = None,
+        brand: Optional[str] = None,
+        color: Optional[str] = None,
+        object: Optional[str] = None,
+        category_name_1: Optional[str] = None,
+        category_name_2: Optional[str] = None,
+        category_name_3: Optional[str] = None,
+        category_any: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+        current_status: Optional[str] = None,
+        engine: Optional[str] = None,
+        n_probes: Optional[int] = None,
+        rerank: Optional[bool] = None,
+        timings: Optional[Dict[str, float]] = None,
+        corrections: Optional[List[Dict[str, str]]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        One page of a query's ranking, plus the cursor of the next page (None at the end).
+
+        The first page ranks the top `page_depth` rows once and keeps them in `page_cache`
+        as int32 rows + float32 similarity/business/score arrays. Later pages slice those
+        arrays without rescoring; if the ranking was evicted it is ranked again.
+        With a reranker its head is re-ordered before it is stored (see `search`).
+        `timings` and `corrections` work as in `search`.
+        """
+        if not query or not query.strip():
+            return [], None
+        timer = StageTimer()
+        reranker = self._reranker_for(rerank)
+        key = self._result_key(dict(
+            query=query, pos_terms=pos_terms, top_k=self.page_depth, alpha=alpha,
+            biz_weights=biz_weights, brand=brand, color=color, object=object,
+            category_name_1=category_name_1, category_name_2=category_name_2,
+            category_name_3=category_name_3, category_any=category_any, min_price=min_price,
+            max_price=max_price, in_stock=in_stock, current_status=current_status, engine=engine,
+            n_probes=n_probes, rerank=reranker.model.version if reranker is not None else None,
+        ))
+        offset = self._cursor_offset(cursor, key) if cursor else 0
+
+        hit = self.page_cache.get(key, self.catalog_version)
+        timer.lap("cache")
+        if hit is not None:
+            ranking, fixes = hit
+        else:
+            idx, sims, biz, score, fixes = self._rank(
+                query, pos_terms, self.page_depth, None, alpha, biz_weights,
+                brand, color, object, category_name_1, category_name_2, category_name_3, category_any,
+                min_price, max_price, in_stock, current_status, engine, n_probes, timer,
+            )
+            complete = True
+            if reranker is not None:
+                idx, sims, biz, score, complete = reranker.rerank(self.rerank_catalog, idx, sims, biz, score, timer)
+            ranking = (
+                idx.astype(np.int32), sims.astype(np.float32), biz.astype(np.float32), score.astype(np.float32)
+            )
+            if complete:   # a budget-skipped rerank is served once, not kept for later pages
+                self.page_cache.put(key, (ranking, fixes), self.catalog_version)
+
+        end = min(offset + max(1, int(page_size)), len(ranking[0]))
+        idx, sims, biz, score = (a[offset:end] for a in ranking)
+        items = self._records(idx, sims.astype(float), biz.astype(float), score.astype(float), include_cols)
+        timer.lap("finalize")
+        self._record_timings(timer, len(items), timings)
+        if corrections is not None:
+            corrections.extend(fixes)
+        return items, (self._cursor_for(key, end) if end < len(ranking[0]) else None)
+
+    def _cursor_token(self, key: str) -> str:
+        # ties a cursor to its request and catalog version
+        return hashlib.sha256(f"{self.catalog_version}|{key}".encode()).hexdigest()[:16]
+
+    def _cursor_for(self, key: str, offset: int) -> str:
+        return f"{self._cursor_token(key)}.{offset}"
+
+    def _cursor_offset(self, cursor: str, key: str) -> int:
+        token, _, offset = cursor.partition(".")
+        if not offset.isdigit():
+            raise ValueError("Malformed cursor")
+        if token != self._cursor_token(key):
+            raise ValueError("Cursor does not match this request or the catalog changed; start without a cursor")
+        return int(offset)
+
+    # ---------- Autocomplete ----------
+    def suggest(self, prefix: str, limit: int = 10, kinds: Optional[Sequence[str]] = None) -> List[dict]:
+        """
+        Completions for a partially typed query: brand / category / product names with
+        a word starting with `prefix`, by demand + revenue. Never touches the TF-IDF matrix.
+        """
+        p = _norm_text(prefix)
+        if p and prefix[-1:].isspace():
+            p += " "   # "apple " completes the next word
+        ids = self.suggest_index.lookup(p, limit, kinds)
+        out = self.suggest_index.suggestions(ids)
+        if self._has_column("product_id"):
+            pid = self._native_column("product_id")
+            for rec, i in zip(out, ids):
+                row = self.suggest_index.rows[i]
+                if row >= 0:
+                    rec["product_id"] = pid[row]
+        return out
+
+    # ---------- Similar products ----------
+    def similar(
+        self,
+        product_id,
+        *,
+        top_k: int = 10,
+        alpha: float = 0.7,
+        biz_weights: Optional[Dict[str, float]] = None,
+        include_cols: Optional[List[str]] = None,
+    ) -> List[dict]:
+        """
+        "More like this" for one product: its precomputed nearest rows (similar.py),
+        re-ranked with the business blend. Costs O(similar_neighbors), no matrix pass.
+        Raises KeyError for a product_id that is not in the catalog.
+        """
+        if self.similar_graph is None:
+            raise RuntimeError("Similar-products graph not built (similar_neighbors=0)")
+        row = int(self.rows_for_product_ids([product_id])[0])
+        if row < 0:
+            raise KeyError(f"Unknown product_id '{product_id}'")
+        idx, sims = self.similar_graph.row(row)
+        biz = self._compute_biz(idx, biz_weights)
+        alpha = float(np.clip(alpha, 0.0, 1.0))
+        score = alpha * sims + (1.0 - alpha) * biz
+        order = topk_order(score, idx, int(top_k))
+        return self._records(idx[order], sims[order], biz[order], score[order], include_cols)
+
+    # ---------- Facets ----------
+    def facets(
+        self,
+        query: str,
+        *,
+        pos_terms: Optional[List[str]] = None,
+        brand: Optional[str] = None,
+        color: Optional[str] = None,
+        object: Optional[str] = None,
+        category_name_1: Optional[str] = None,
+        category_name_2: Optional[str] = None,
+        category_name_3: Optional[str] = None,
+        category_any: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+        current_status: Optional[str] = None,
+        size: int = 20,
+    ) -> Dict[str, List[Dict]]:
+        """
+        Facet counts over the candidate set of a search: rows passing the filters that
+        share at least one term with the query (just the filtered rows when the query
+        has no known terms). Counted from the FacetIndex bitmaps.
+        """
+        rows = self._candidates(dict(
+            brand=brand, color=color, object=object, category_name_1=category_name_1,
+            category_name_2=category_name_2, category_name_3=category_name_3, category_any=category_any,
+            min_price=min_price, max_price=max_price, in_stock=in_stock, current_status=current_status,
+        ))
+        if query and query.strip() and self.X.shape[1]:
+            qn = InvertedIndexScorer.normalize_query(
+                self._centroid(self._components(query, pos_terms, category_any, object))[0]
+            )
+            if qn.nnz:
+                matched = self.scorer.union_postings(qn.indices)
+                rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        return self.facet_index.counts(rows, size)
+
+    # ---------- Batch search ----------
+    def search_many(
+        self,
+        requests: List[Dict],
+        *,
+        chunk_size: int = 256,
+        corrections: Optional[List[List[Dict[str, str]]]] = None,
+    ) -> List[List[dict]]:
+        """
+        Score many queries at once. Each request takes the same keywords as `search`.
+        All centroids are encoded in one pass into a sparse query matrix Q and scored
+        with `Q @ X.T`, `chunk_size` queries at a time to bound memory; filters,
+        alpha and biz_weights still apply per query. Results match `search`.
+        Requests on the "hybrid" engine or with a reranker go through `search` one by one.
+        With `corrections`, one list of spelling corrections per request is appended to it.
+        """
+        results: List[List[dict]] = [[] for _ in requests]
+        fixes: List[List[Dict[str, str]]] = [[] for _ in requests]
+        if corrections is not None:
+            corrections.extend(fixes)   # filled in place below
+        keys: Dict[int, str] = {}
+        todo = []
+        for i, r in enumerate(requests):
+            if not (r.get("query") and str(r["query"]).strip()):
+                continue
+            engine = r.get("engine") or self.engine
+            if engine not in ENGINES:
+                raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+            if engine == "hybrid" or self._reranker_for(r.get("rerank")) is not None:
+                results[i] = self.search(**r, corrections=fixes[i])   # no shared exact scoring pass for these
+                continue
+            if r.get("candidates_idx") is None:
+                keys[i] = self._result_key({**r, "rerank": None})
+                hit = self.result_cache.get(keys[i], self.catalog_version)
+                if hit is not None:
+                    results[i] = hit[0]
+                    fixes[i].extend(hit[1])
+                    continue
+            todo.append(i)
+        if not todo:
+            return results
+        if self.X.shape[1] == 0:
+            for i in todo:
+                results[i] = self.search(**requests[i], corrections=fixes[i])
+            return results
+
+        # one encode for every component of every query, then per-query centroids
+        texts: List[str] = []
+        owner: List[int] = []
+        n_comp = np.zeros(len(todo))
+        for qi, i in enumerate(todo):
+            r = requests[i]
+            comps = self._components(r["query"], r.get("pos_terms"), r.get("category_any"), r.get("object"))
+            texts.extend(comps)
+            owner.extend([qi] * len(comps))
+            n_comp[qi] = len(comps)
+        text_fixes: List[List[Dict[str, str]]] = []
+        E = self._encode_many(texts, text_fixes)
+        for qi, found in zip(owner, text_fixes):
+            _merge_fixes(fixes[todo[qi]], found)
+        S = csr_matrix((np.ones(len(texts)), (owner, np.arange(len(texts)))), shape=(len(todo), len(texts)))
+        Q = (S @ E).tocsr()
+        Q.data *= np.repeat(1.0 / n_comp, np.diff(Q.indptr))
+        Qn = InvertedIndexScorer.normalize_query(Q)
+
+        N = self.X.shape[0]
+        XnT = self.scorer.Xc.T          # CSR view of the postings, no copy
+        biz_cache: Dict[Optional[Tuple], np.ndarray] = {}
+
+        chunk_size = max(1, int(chunk_size))
+        for start in range(0, len(todo), chunk_size):
+            P = (Qn[start: start + chunk_size] @ XnT).tocsr()
+            for row in range(P.shape[0]):
+                i = todo[start + row]
+                r = requests[i]
+                sims_full = np.zeros(N)
+                lo, hi = P.indptr[row], P.indptr[row + 1]
+                sims_full[P.indices[lo:hi]] = P.data[lo:hi]
+
+                idx_all = r.get("candidates_idx")
+                if idx_all is None:
+                    idx_all = self._candidates(r)
+                if idx_all is None:
+                    idx_all = np.arange(N)
+
+                weights = r.get("biz_weights")
+                wkey = tuple(sorted(weights.items())) if weights else None
+                if wkey not in biz_cache:
+                    biz_cache[wkey] = self._compute_biz(np.arange(N), weights)
+
+                sims = sims_full[idx_all]
+                biz = biz_cache[wkey][idx_all]
+                alpha = float(np.clip(r.get("alpha", 0.7), 0.0, 1.0))
+                score = alpha * sims + (1.0 - alpha) * biz
+                order = topk_order(score, np.arange(len(idx_all)), int(r.get("top_k", 5)))
+                results[i] = self._records(
+                    idx_all[order], sims[order], biz[order], score[order], r.get("include_cols")
+                )
+                if i in keys:
+                    self.result_cache.put(keys[i], (results[i], fixes[i]), self.catalog_version)
+        return results
+
+    # ---------- Warm-up ----------
+    def warm_pages(self) -> int:
+        """
+        Read one byte per OS page of every memory-mapped snapshot array, so the first
+        queries after a load do not stall on page faults. Returns the bytes mapped in.
+        """
+        total = 0
+        for a in self._mapped:
+            flat = a.reshape(-1).view(np.uint8)
+            flat[:: mmap.PAGESIZE].sum()     # the strided read is what faults the pages in
+            total += flat.size
+        return total
+
+    # ---------- helpers ----------
+    def _result_key(self, params: Dict) -> str:
+        p = {k: params.get(k, d) for k, d in SEARCH_DEFAULTS.items()}
+        p["query"] = params.get("query")
+        p["top_k"] = int(p["top_k"])
+        p["engine"] = params.get("engine") or self.engine
+        return request_key(p)
+
+    def cache_stats(self) -> Dict[str, Dict]:
+        return {
+            "catalog_version": self.catalog_version,
+            "encode": self.encode_cache.stats(),
+            "results": self.result_cache.stats(),
+            "pages": self.page_cache.stats(),
+        }
+
+    @staticmethod
+    def _components(
+        query: str,
+        pos_terms: Optional[List[str]],
+        category_any: Optional[str],
+        object: Optional[str],
+    ) -> List[str]:
         # --------- Build a single CENTROID vector from 4 components ----------
         # 1) free-text query, 2) category name, 3) object, 4) joined terms
         components: List[str] = []
@@ -326,75 +1259,147 @@ class CosineSearch:
                 components.append(joined_terms)
         if not components:
             components = [query]
+        return components
 
-        q_vecs = [self._encode_text(t) for t in components]
+    def _centroid(self, components: List[str]) -> Tuple[csr_matrix, List[Dict[str, str]]]:
+        """Mean query vector of the components, and the spelling corrections applied to them."""
+        fixes: List[Dict[str, str]] = []
+        q_vecs = [self._encode_text(t, fixes) for t in components]
         centroid = q_vecs[0]
         for qv in q_vecs[1:]:
             centroid = centroid + qv
-        centroid = centroid * (1.0 / float(len(q_vecs)))
+        return centroid * (1.0 / float(len(q_vecs))), fixes
 
-        # If vector space ended up empty, rank by business score only
-        if self.X.shape[1] == 0:
-            N = len(self.df)
-            idx_all = np.arange(N) if candidates_idx is None else candidates_idx
-            biz = self._compute_biz(idx_all, biz_weights)
-            order = np.argsort(-biz)[: int(top_k)]
-            out = self.df.iloc[idx_all[order]].copy()
-            out.insert(0, "similarity", 0.0)
-            out.insert(1, "business_score", np.round(biz[order], 4))
-            out.insert(2, "score", np.round(biz[order], 4))
-            return self._finalize(out, include_cols)
-
-        # Cosine similarity once against the centroid vector
-        if candidates_idx is None:
-            sims = cosine_similarity(centroid, self.X).ravel()
-            idx_all = np.arange(self.X.shape[0])
-        else:
-            sims = cosine_similarity(centroid, self.X[candidates_idx]).ravel()
-            idx_all = candidates_idx
+    def _candidates(self, r: Dict) -> Optional[np.ndarray]:
+        """Candidate rows for a request dict, or None when it carries no filters."""
+        if not has_filters(r):
+            return None
+        return self._build_candidate_idx(*(r.get(k) for k in FILTER_KEYS))
 
-        # Business score (only profitability + return_rate)
-        biz = self._compute_biz(idx_all, biz_weights)
+    def _reranker_for(self, rerank: Optional[bool]) -> Optional[Reranker]:
+        if rerank is False:
+            return None
+        if rerank and self.reranker is None:
+            raise ValueError("No rerank model loaded; set RERANK_MODEL")
+        return self.reranker
 
-        # Blend + rank
-        alpha = float(np.clip(alpha, 0.0, 1.0))
-        score = alpha * sims + (1.0 - alpha) * biz
+    def _has_column(self, col: str) -> bool:
+        return col in self.df.columns or (self.catalog_store is not None and col in self.catalog_store)
 
-        order = np.argsort(-score)[: int(top_k)]
-        idx = idx_all[order]
+    def _store_only_column(self, col: str) -> Optional[pd.Series]:
+        """A catalog column that was not loaded into `df` (CatalogStore), or None."""
+        if self.catalog_store is not None and col in self.catalog_store:
+            return self.catalog_store.column(col)
+        return None
 
-        out = self.df.iloc[idx].copy()
-        out.insert(0, "similarity", np.round(sims[order], 4))
-        out.insert(1, "business_score", np.round(biz[order], 4))
-        out.insert(2, "score", np.round(score[order], 4))
-        return self._finalize(out, include_cols)
+    def _catalog_column(self, col: str) -> Optional[pd.Series]:
+        """A catalog column from `df` or the CatalogStore, or None."""
+        return self.df[col] if col in self.df.columns else self._store_only_column(col)
 
-    # ---------- helpers ----------
-    def _compute_biz(self, idx_all: np.ndarray, biz_weights: Optional[Dict[str, float]]) -> np.ndarray:
+    def _native_column(self, col: str) -> np.ndarray:
+        arr = self._native_cols.get(col)
+        if arr is None:
+            # non-default include_cols are extracted on first use
+            s = self.df[col] if col in self.df.columns else self.catalog_store.column(col)
+            arr = self._native_cols[col] = native_values(s)
+        return arr
+
+    def rerank_features(self) -> RerankCatalog:
+        """Per-row catalog features of the second ranking stage (rerank.py)."""
+        return catalog_features(self._catalog_column, len(self.df))
+
+    def rows_for_product_ids(self, product_ids: Sequence) -> np.ndarray:
+        """Catalog row per product id (-1 when not in the catalog)."""
+        if self._product_index is None:
+            if "product_id" not in self.df.columns:
+                return np.full(len(product_ids), -1, dtype=np.int64)
+            self._product_index = pd.Index(self.df["product_id"].astype(str))
+        ids = [str(p).replace(",", "").strip() for p in product_ids]
+        return self._product_index.get_indexer(ids).astype(np.int64)
+
+    def product_records(
+        self,
+        product_ids: Sequence,
+        scored: Dict[str, np.ndarray],
+        include_cols: Optional[List[str]] = None,
+    ) -> List[dict]:
+        """
+        Result dicts for arbitrary product ids, in order, with the `scored` values attached.
+        Ids missing from the catalog keep just product_id and the scored values.
+        """
+        if include_cols is None:
+            include_cols = [c for c in self.default_include_cols if c not in ("similarity", "business_score")]
+        rows = self.rows_for_product_ids(product_ids)
+        out = [{"product_id": str(p)} for p in product_ids]
+        for col in scored:
+            if col in include_cols:
+                for rec, v in zip(out, np.round(scored[col], 4).tolist()):
+                    rec[col] = v
+        found = np.flatnonzero(rows >= 0)
+        if len(found):
+            cols = [c for c in include_cols if c not in scored]
+            for i, rec in zip(found, self._row_records(rows[found], {}, cols)):
+                out[i].update(rec)
+        if "product_id" not in include_cols:
+            for rec in out:
+                rec.pop("product_id", None)
+        return out
+
+    def _records(
+        self,
+        idx: np.ndarray,
+        sims: np.ndarray,
+        biz: np.ndarray,
+        score: np.ndarray,
+        include_cols: Optional[List[str]],
+    ) -> List[dict]:
+        """Result dicts straight from the pre-extracted columns; no per-request DataFrame."""
+        scored = {"similarity": sims, "business_score": biz, "score": score}
+        return self._row_records(idx, scored, include_cols)
+
+    def _row_records(
+        self,
+        idx: np.ndarray,
+        scored: Dict[str, np.ndarray],
+        include_cols: Optional[List[str]],
+    ) -> List[dict]:
+        """Dicts for catalog rows `idx`; `scored` holds per-row values (rounded to 4 places)."""
+        if include_cols is None:
+            include_cols = self.default_include_cols
+        names, columns = [], []
+        for col in include_cols:
+            if col in scored:
+                columns.append(np.round(scored[col], 4).tolist())
+            elif self._has_column(col):
+                columns.append(self._native_column(col)[idx].tolist())
+            else:
+                continue
+            names.append(col)
+        if not names:
+            return [{} for _ in range(len(idx))]
+        return records_from_columns(names, columns)
+
+    def _biz_weight_vector(self, biz_weights: Optional[Dict[str, float]]) -> Optional[np.ndarray]:
         if self.biz_matrix.size and (biz_weights is not None) and len(biz_weights) > 0:
             w = np.array([biz_weights.get(f, 0.0) for f in self.biz_feature_names], dtype=float)
             if np.allclose(w.sum(), 0.0):
-                return np.zeros(len(idx_all))
-            w = w / (abs(w).sum())
-            biz_full = self.biz_matrix @ w
-            return biz_full[idx_all]
-        return np.zeros(len(idx_all))
+                return None
+            return w / (abs(w).sum())
+        return None
 
-    def _finalize(self, out: pd.DataFrame, include_cols: Optional[List[str]]) -> List[dict]:
-        if include_cols is None:
-            include_cols = [
-                "score", "similarity", "business_score", "product_id",
-                self.name_col, "brand", "current_price", "product_url"
-            ]
-        include_cols = [c for c in include_cols if c in out.columns]
-        result = out[include_cols].copy()
-
-        # to native types for JSON
-        def _to_native(v):
-            return v.item() if isinstance(v, np.generic) else v
-
-        records = result.where(pd.notna(result), None).to_dict(orient="records")
-        for r in records:
-            for k, v in list(r.items()):
-                r[k] = _to_native(v)
-        return records
+    def _compute_biz(self, idx_all: np.ndarray, biz_weights: Optional[Dict[str, float]]) -> np.ndarray:
+        w = self._biz_weight_vector(biz_weights)
+        if w is None:
+            return np.zeros(len(idx_all))
+        # column-by-column so a row's value does not depend on which rows are asked for
+        M = self.biz_matrix[idx_all]
+        biz = M[:, 0] * w[0]
+        for f in range(1, len(w)):
+            biz = biz + M[:, f] * w[f]
+        return biz
+
+    def _biz_upper_bound(self, biz_weights: Optional[Dict[str, float]]) -> float:
+        w = self._biz_weight_vector(biz_weights)
+        if w is None:
+            return 0.0
+        return float(np.maximum(w * self.biz_max, w * self.biz_min).sum())
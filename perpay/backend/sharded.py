@@ -0,0 +1,320 @@
+# backend/sharded.py
+# Row-sharded CosineSearch: the parent fits the vectorizers once (global vocabulary + IDF,
+# global business min-max), then hands each worker process a contiguous slice of the
+# normalized TF-IDF rows, the business matrix and its own filter index. A query is encoded
+# once in the parent, scattered to every shard, and the per-shard top-k lists are merged.
+# Per-row cosine and biz values are computed exactly as in one process, so the merged
+# ranking is identical to CosineSearch's.
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from filters import FilterIndex, hard_spec
+from metrics import StageTimer
+from scoring import InvertedIndexScorer, signed_col_min, topk_order
+from search import CosineSearch, filter_spec, has_filters
+from snapshot import sparse_arrays, sparse_from
+
+SHARD_ENGINES = ("full", "inverted")
+
+
+# ========= Worker side =========
+class _Shard:
+    def __init__(self, state: Dict):
+        self.offset = int(state["offset"])
+        Xn = sparse_from(state, "Xn", "csr")
+        Xc = Xn.tocsc()
+        Xc.sort_indices()
+        bounds = {"s.col_max": state["col_max"]}
+        if "col_min" in state:
+            bounds["s.col_min"] = state["col_min"]
+        self.scorer = InvertedIndexScorer.from_arrays(
+            {**bounds, **sparse_arrays("s.Xn", Xn), **sparse_arrays("s.Xc", Xc)}, "s"
+        )
+        self.biz = state["biz"]
+        self.biz_max = self.biz.max(axis=0) if self.biz.size else np.zeros(0)
+        self.biz_min = self.biz.min(axis=0) if self.biz.size else np.zeros(0)
+        self.filters = FilterIndex.from_arrays(state, "filters")
+        self.n_rows = Xn.shape[0]
+
+    def _biz(self, rows: np.ndarray, w: Optional[np.ndarray]) -> np.ndarray:
+        # same column-by-column sum as CosineSearch._compute_biz
+        if w is None:
+            return np.zeros(len(rows))
+        M = self.biz[rows]
+        out = M[:, 0] * w[0]
+        for f in range(1, len(w)):
+            out = out + M[:, f] * w[f]
+        return out
+
+    def topk(self, msg: Dict) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, int]:
+        """-> (global rows, sims, biz, score, tiebreak, n_candidates) of this shard's top-k."""
+        qn = csr_matrix(
+            (msg["q_data"], msg["q_indices"], np.array([0, len(msg["q_indices"])])),
+            shape=(1, msg["n_features"]),
+        )
+        k, alpha, w = msg["k"], msg["alpha"], msg["w"]
+
+        if msg.get("rows") is not None:
+            rows, tiebreak = msg["rows"], msg["tiebreak"]
+        elif msg.get("spec") is not None:
+            rows = np.flatnonzero(self.filters.candidate_mask(soft=False, **msg["spec"]))
+            tiebreak = rows + self.offset
+        else:
+            rows = None
+        n_cand = self.n_rows if rows is None else len(rows)
+        if n_cand == 0:
+            e = np.zeros(0)
+            return e.astype(np.int64), e, e, e, e.astype(np.int64), 0
+
+        if msg["engine"] == "inverted":
+            cand_pos = None
+            if rows is not None:
+                cand_pos = np.full(self.n_rows, -1, dtype=np.int64)
+                cand_pos[rows] = tiebreak
+            ub = float(np.maximum(w * self.biz_max, w * self.biz_min).sum()) if w is not None else 0.0
+            idx, sims, biz, score = self.scorer.topk(qn, k, alpha, lambda r: self._biz(r, w), ub, cand_pos)
+            tb = idx + self.offset if cand_pos is None else cand_pos[idx]
+        else:
+            idx = np.arange(self.n_rows) if rows is None else rows
+            sims = self.scorer.cosine(qn, rows)
+            biz = self._biz(idx, w)
+            score = alpha * sims + (1.0 - alpha) * biz
+            tb_all = idx + self.offset if rows is None else tiebreak
+            o = topk_order(score, tb_all, k)
+            idx, sims, biz, score, tb = idx[o], sims[o], biz[o], score[o], tb_all[o]
+        return idx + self.offset, sims, biz, score, tb, n_cand
+
+    def candidate_rows(self, msg: Dict) -> Tuple[np.ndarray, int]:
+        """-> (global rows passing the filters and sharing a query term, n rows passing the filters)."""
+        rows = None
+        if msg.get("spec") is not None:
+            rows = np.flatnonzero(self.filters.candidate_mask(soft=False, **msg["spec"]))
+        n_filtered = self.n_rows if rows is None else len(rows)
+        if len(msg["q_indices"]):
+            matched = self.scorer.union_postings(msg["q_indices"])
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        if rows is None:
+            rows = np.arange(self.n_rows)
+        return rows.astype(np.int64) + self.offset, n_filtered
+
+
+_SHARD: Optional[_Shard] = None
+
+
+def _init_shard(state: Dict) -> None:
+    global _SHARD
+    _SHARD = _Shard(state)
+
+
+def _shard_topk(msg: Dict):
+    return _SHARD.topk(msg)
+
+
+def _shard_rows(msg: Dict):
+    return _SHARD.candidate_rows(msg)
+
+
+def _shard_ping() -> int:
+    return os.getpid()
+
+
+# ========= Parent side =========
+class ShardedSearch(CosineSearch):
+    """
+    CosineSearch whose scoring runs on `n_shards` worker processes (one dedicated
+    single-process pool per shard, so each shard's slice stays resident in its worker).
+    Encoding, filter-value resolution, merging and record building stay in the parent.
+    """
+
+    def __init__(self, csv_path: str, *, n_shards: Optional[int] = None, **kwargs):
+        if kwargs.get("engine", "full") not in SHARD_ENGINES:
+            raise ValueError(f"Sharded search supports engines {SHARD_ENGINES}")
+        kwargs["dense"] = False
+        super().__init__(csv_path, **kwargs)
+        N = len(self.df)
+        self.n_shards = max(1, min(int(n_shards or os.cpu_count() or 1), max(N, 1)))
+        self.shard_bounds = np.linspace(0, N, self.n_shards + 1).astype(np.int64)
+
+        # global categorical dictionaries, to resolve the "match anything?" filter rules once
+        self._cat_lookup = {col: cc.lookup for col, cc in self.filters.categorical.items()}
+        self._empty_space = self.X.shape[1] == 0
+
+        ctx = mp.get_context("spawn")
+        self._pools: List[ProcessPoolExecutor] = []
+        Xn = self.scorer.Xn
+        for lo, hi in zip(self.shard_bounds[:-1], self.shard_bounds[1:]):
+            part = Xn[lo:hi]
+            part.sort_indices()
+            col_max = np.asarray(part.max(axis=0).todense()).ravel() if part.shape[1] else np.zeros(0)
+            state = {
+                "offset": int(lo),
+                "col_max": col_max,
+                "biz": np.ascontiguousarray(self.biz_matrix[lo:hi]),
+                **sparse_arrays("Xn", part),
+                **FilterIndex(self.df.iloc[lo:hi].reset_index(drop=True), self.name_col).to_arrays("filters"),
+            }
+            col_min = signed_col_min(part.tocsc()) if self.scorer.col_min is not None else None
+            if col_min is not None:
+                state["col_min"] = col_min
+            self._pools.append(
+                ProcessPoolExecutor(max_workers=1, mp_context=ctx, initializer=_init_shard, initargs=(state,))
+            )
+        # start every worker now (not on the first query) and surface init errors early
+        self.shard_pids = [f.result() for f in [p.submit(_shard_ping) for p in self._pools]]
+
+        # the parent no longer scores or filters: keep the shape, drop the matrices
+        self.X = csr_matrix(self.X.shape)
+        self.scorer = None
+        self.filters = None
+
+    def close(self) -> None:
+        for p in self._pools:
+            p.shutdown(wait=True, cancel_futures=True)
+        self._pools = []
+
+    def _resolve_spec(self, spec: Dict) -> Dict:
+        """Apply the soft brand / category_any rules against the global dictionaries."""
+        spec = dict(spec)
+        if spec.get("brand") and spec["brand"].strip().lower() not in self._cat_lookup.get("brand", {}):
+            spec["brand"] = None
+        if spec.get("category_any"):
+            val = spec["category_any"].strip().lower()
+            if not any(val in self._cat_lookup.get(c, {}) for c in FilterIndex.ANY_CATEGORY_COLS):
+                spec["category_any"] = None
+        return spec
+
+    def _scatter(self, msg: Dict):
+        futures = [p.submit(_shard_topk, msg) for p in self._pools]
+        return [f.result() for f in futures]
+
+    def _rank(
+        self,
+        query: str,
+        pos_terms: Optional[List[str]],
+        top_k: int,
+        candidates_idx: Optional[np.ndarray],
+        alpha: float,
+        biz_weights: Optional[Dict[str, float]],
+        brand: Optional[str],
+        color: Optional[str],
+        object: Optional[str],
+        category_name_1: Optional[str],
+        category_name_2: Optional[str],
+        category_name_3: Optional[str],
+        category_any: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        in_stock: bool,
+        current_status: Optional[str],
+        engine: Optional[str],
+        n_probes: Optional[int],
+        timer: StageTimer,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[Dict[str, str]]]:
+        engine = engine or self.engine
+        if engine not in SHARD_ENGINES:
+            raise ValueError(f"Unknown engine '{engine}' for sharded search, expected one of {SHARD_ENGINES}")
+
+        filters = dict(
+            brand=brand, color=color, obj=object, category_name_1=category_name_1,
+            category_name_2=category_name_2, category_name_3=category_name_3, category_any=category_any,
+            min_price=min_price, max_price=max_price, in_stock=in_stock, current_status=current_status,
+        )
+        spec = None
+        if candidates_idx is None and has_filters(dict(filters, object=object)):
+            spec = self._resolve_spec(filter_spec(**filters))
+        timer.lap("filter")
+
+        centroid, fixes = self._centroid(self._components(query, pos_terms, category_any, object))
+        qn = InvertedIndexScorer.normalize_query(centroid)
+        timer.lap("encode")
+
+        # empty vector space: rank by business score only (score = biz), like CosineSearch
+        alpha = 0.0 if self._empty_space else float(np.clip(alpha, 0.0, 1.0))
+        msg = {
+            "q_indices": qn.indices, "q_data": qn.data, "n_features": self.X.shape[1],
+            "k": int(top_k), "alpha": alpha,
+            "w": self._biz_weight_vector(biz_weights), "engine": engine, "spec": spec,
+        }
+        if candidates_idx is not None:
+            # explicit rows: split per shard, tie-break on the caller's order
+            candidates_idx = np.asarray(candidates_idx, dtype=np.int64)
+            shard_of = np.searchsorted(self.shard_bounds, candidates_idx, side="right") - 1
+            parts = []
+            for s, pool in enumerate(self._pools):
+                sel = np.flatnonzero(shard_of == s)
+                m = dict(msg, rows=candidates_idx[sel] - self.shard_bounds[s], tiebreak=sel)
+                parts.append(pool.submit(_shard_topk, m))
+            parts = [f.result() for f in parts]
+        else:
+            parts = self._scatter(msg)
+            if spec is not None and sum(p[5] for p in parts) == 0:
+                # no row passes the filters anywhere: same fallback as one process
+                # (whole catalog, minus what the price / stock / status filters exclude)
+                parts = self._scatter(dict(msg, spec=hard_spec(spec)))
+        timer.n_candidates = sum(p[5] for p in parts)
+        timer.lap("score")
+
+        rows, sims, biz, score, tb = (np.concatenate([p[j] for p in parts]) for j in range(5))
+        order = topk_order(score, tb, int(top_k))
+        timer.lap("blend")
+        return rows[order], sims[order], biz[order], score[order], fixes
+
+    def facets(
+        self,
+        query: str,
+        *,
+        pos_terms: Optional[List[str]] = None,
+        brand: Optional[str] = None,
+        color: Optional[str] = None,
+        object: Optional[str] = None,
+        category_name_1: Optional[str] = None,
+        category_name_2: Optional[str] = None,
+        category_name_3: Optional[str] = None,
+        category_any: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+        current_status: Optional[str] = None,
+        size: int = 20,
+    ) -> Dict[str, List[Dict]]:
+        # shards resolve their candidate rows; counting uses the parent's global FacetIndex
+        filters = dict(
+            brand=brand, color=color, obj=object, category_name_1=category_name_1,
+            category_name_2=category_name_2, category_name_3=category_name_3, category_any=category_any,
+            min_price=min_price, max_price=max_price, in_stock=in_stock, current_status=current_status,
+        )
+        spec = self._resolve_spec(filter_spec(**filters)) if has_filters(dict(filters, object=object)) else None
+        q_indices = np.zeros(0, dtype=np.int32)
+        if query and query.strip() and not self._empty_space:
+            centroid, _ = self._centroid(self._components(query, pos_terms, category_any, object))
+            q_indices = InvertedIndexScorer.normalize_query(centroid).indices
+        msg = {"q_indices": q_indices, "spec": spec}
+        parts = [f.result() for f in [p.submit(_shard_rows, msg) for p in self._pools]]
+        if spec is not None and sum(n for _, n in parts) == 0:
+            msg["spec"] = hard_spec(spec)
+            parts = [f.result() for f in [p.submit(_shard_rows, msg) for p in self._pools]]
+        rows = np.concatenate([r for r, _ in parts])
+        return self.facet_index.counts(rows, size)
+
+    def search_many(
+        self,
+        requests: List[Dict],
+        *,
+        chunk_size: int = 256,
+        corrections: Optional[List[List[Dict[str, str]]]] = None,
+    ) -> List[List[dict]]:
+        # no shared sparse product across processes; each query fans out on its own
+        fixes: List[List[Dict[str, str]]] = [[] for _ in requests]
+        if corrections is not None:
+            corrections.extend(fixes)
+        return [
+            self.search(**r, corrections=f) if (r.get("query") and str(r["query"]).strip()) else []
+            for r, f in zip(requests, fixes)
+        ]
@@ -0,0 +1,138 @@
+# backend/similar.py
+# "More like this" graph: every catalog row's top-N most similar rows by cosine over the
+# normalized TF-IDF rows (CosineSearch.scorer.Xn), computed once per catalog version
+# (it is part of the index snapshot) so GET /similar is a table lookup plus the business
+# blend over N neighbours.
+# - All pairs are scored in blocks: `block_rows` rows against `block_cols` rows at a time,
+#   one sparse product densified into a block_rows x block_cols float32 array, so memory
+#   is bounded whatever the catalog size. A partition finds each row's N-th best value
+#   in the block; the candidates at or above it are merged into the row's running top-N
+#   (cosine desc, then row asc, so the result does not depend on the block sizes).
+# - Row blocks are independent and run on a (spawned) process pool, each worker holding
+#   one float32 copy of Xn.
+# - Stored as N x n int32 neighbour rows (-1 = no more neighbours) and float16 cosines,
+#   best first.
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from snapshot import sparse_arrays, sparse_from
+
+SIMILAR_VERSION = 1
+BLOCK_ROWS = 256
+BLOCK_COLS = 32768
+
+
+def _keep_topn(r: np.ndarray, c: np.ndarray, s: np.ndarray, n: int):
+    """The `n` best (r, c, s) entries of each r: cosine desc, then row asc."""
+    order = np.lexsort((c, -s, r))
+    r, c, s = r[order], c[order], s[order]
+    keep = np.arange(len(r)) - np.searchsorted(r, r) < n
+    return r[keep], c[keep], s[keep]
+
+
+def topn_block(Xn: csr_matrix, lo: int, hi: int, n: int, block_cols: int = BLOCK_COLS) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-`n` (rows, cosines) of rows lo..hi against every other row, (hi-lo) x n, best first."""
+    A = Xn[lo:hi]
+    m, N = hi - lo, Xn.shape[0]
+    r = np.zeros(0, dtype=np.int64)
+    c = np.zeros(0, dtype=np.int64)
+    s = np.zeros(0, dtype=np.float32)
+    for c0 in range(0, N, block_cols):
+        c1 = min(N, c0 + block_cols)
+        S = (A @ Xn[c0:c1].T).toarray().astype(np.float32, copy=False)
+        own = np.arange(max(lo, c0), min(hi, c1))
+        S[own - lo, own - c0] = 0.0               # a row is not its own neighbour
+        k = min(n, S.shape[1])
+        # each row's k-th best value; everything tied with it stays a candidate so the
+        # row-order tie-break does not depend on the block layout
+        kth = -np.partition(-S, k - 1, axis=1)[:, k - 1]
+        br, bc = np.nonzero((S >= kth[:, None]) & (S > 0))
+        r, c, s = _keep_topn(
+            np.concatenate([r, br]), np.concatenate([c, bc + c0]), np.concatenate([s, S[br, bc]]), n
+        )
+    neighbors = np.full((m, n), -1, dtype=np.int32)
+    sims = np.zeros((m, n), dtype=np.float16)
+    rank = np.arange(len(r)) - np.searchsorted(r, r)
+    neighbors[r, rank], sims[r, rank] = c, s
+    return neighbors, sims
+
+
+# ========= Worker side =========
+_XN: Optional[csr_matrix] = None
+
+
+def _init_worker(state: Dict) -> None:
+    global _XN
+    _XN = sparse_from(state, "Xn", "csr")
+
+
+def _worker_block(lo: int, hi: int, n: int, block_cols: int) -> Tuple[int, np.ndarray, np.ndarray]:
+    return (lo, *topn_block(_XN, lo, hi, n, block_cols))
+
+
+# ========= Graph =========
+class SimilarityGraph:
+    def __init__(self, neighbors: np.ndarray, sims: np.ndarray):
+        self.neighbors = neighbors    # N x n int32 rows, -1 padded
+        self.sims = sims              # N x n float16 cosines
+
+    @classmethod
+    def build(
+        cls,
+        Xn: csr_matrix,
+        n_neighbors: int,
+        *,
+        workers: Optional[int] = None,
+        block_rows: int = BLOCK_ROWS,
+        block_cols: int = BLOCK_COLS,
+    ) -> "SimilarityGraph":
+        """All-pairs top-`n_neighbors` over the rows of `Xn` (L2-normalized rows)."""
+        n = max(1, int(n_neighbors))
+        N = Xn.shape[0]
+        X32 = csr_matrix(Xn, dtype=np.float32)
+        X32.sort_indices()
+        neighbors = np.full((N, n), -1, dtype=np.int32)
+        sims = np.zeros((N, n), dtype=np.float16)
+        blocks = [(lo, min(N, lo + block_rows)) for lo in range(0, N, max(1, int(block_rows)))]
+        workers = max(1, min(int(workers or os.cpu_count() or 1), len(blocks)))
+        if workers == 1:
+            for lo, hi in blocks:
+                neighbors[lo:hi], sims[lo:hi] = topn_block(X32, lo, hi, n, block_cols)
+        else:
+            ctx = mp.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                     initargs=(sparse_arrays("Xn", X32),)) as pool:
+                futures = [pool.submit(_worker_block, lo, hi, n, block_cols) for lo, hi in blocks]
+                for f in futures:
+                    lo, c, s = f.result()
+                    neighbors[lo: lo + len(c)], sims[lo: lo + len(c)] = c, s
+        return cls(neighbors, sims)
+
+    def row(self, r: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Neighbour rows and cosines (float64) of row `r`, best first."""
+        c = self.neighbors[r]
+        keep = c >= 0
+        return c[keep].astype(np.int64), self.sims[r][keep].astype(np.float64)
+
+    # ---------- snapshot support ----------
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {f"{prefix}.neighbors": self.neighbors, f"{prefix}.sims": self.sims}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str) -> "SimilarityGraph":
+        return cls(arrays[f"{prefix}.neighbors"], arrays[f"{prefix}.sims"])
+
+    def stats(self) -> Dict:
+        return {
+            "rows": int(self.neighbors.shape[0]),
+            "n_neighbors": int(self.neighbors.shape[1]),
+            "edges": int((self.neighbors >= 0).sum()),
+            "mb": round((self.neighbors.nbytes + self.sims.nbytes) / 2**20, 2),
+        }
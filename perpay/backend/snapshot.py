@@ -0,0 +1,184 @@
+# backend/snapshot.py
+# On-disk index snapshots: one directory of flat .npy files + meta.json per key.
+# The key hashes the catalog CSV, the return-rates file and the index settings, so a
+# changed input simply misses and gets rebuilt. Arrays load with mmap_mode="r", which
+# lets every uvicorn worker share one copy of the pages through the OS page cache.
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: no cross-process lock, last writer wins
+    fcntl = None
+
+FORMAT_VERSION = 2
+META_FILE = "meta.json"
+
+
+# ---------- keys ----------
+def file_digest(path: Optional[str], chunk: int = 1 << 20) -> str:
+    if not path or not os.path.exists(path):
+        return "missing"
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def snapshot_key(paths: Iterable[Optional[str]], settings: Dict) -> str:
+    h = hashlib.sha256()
+    h.update(f"v{FORMAT_VERSION}".encode())
+    for p in paths:
+        h.update(file_digest(p).encode())
+    h.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:24]
+
+
+# ---------- strings <-> flat uint8 ----------
+def pack_strings(items: Iterable[str]) -> np.ndarray:
+    """NUL-terminated UTF-8 blob; round-trips empty strings and empty lists."""
+    blob = "".join(f"{s}\0" for s in items).encode("utf-8")
+    return np.frombuffer(blob, dtype=np.uint8).copy()
+
+
+def unpack_strings(arr: np.ndarray) -> List[str]:
+    if arr.size == 0:
+        return []
+    return bytes(arr).decode("utf-8").split("\0")[:-1]
+
+
+# ---------- vocabularies ----------
+class SortedVocabulary(Mapping):
+    """
+    Read-only TfidfVectorizer `vocabulary_` (term -> column) over two flat arrays: the
+    terms as sorted fixed-width UTF-8 bytes and the column of each. A lookup is one
+    np.searchsorted; loaded from a snapshot the arrays stay memory-mapped, so a worker
+    builds no term dict.
+    """
+
+    __slots__ = ("terms", "cols")
+
+    def __init__(self, terms: np.ndarray, cols: np.ndarray):
+        self.terms = terms
+        self.cols = cols
+
+    @classmethod
+    def from_vocabulary(cls, vocabulary: Mapping) -> "SortedVocabulary":
+        if isinstance(vocabulary, cls):
+            return vocabulary
+        terms = np.array([t.encode("utf-8") for t in vocabulary], dtype=bytes)
+        cols = np.fromiter(vocabulary.values(), dtype=np.int32, count=len(vocabulary))
+        order = np.argsort(terms, kind="stable")
+        return cls(terms[order], cols[order])
+
+    def __getitem__(self, term: str) -> int:
+        key = term.encode("utf-8")
+        i = int(self.terms.searchsorted(key))
+        if i < len(self.terms) and self.terms[i] == key:
+            return int(self.cols[i])
+        raise KeyError(term)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __iter__(self) -> Iterator[str]:
+        return (t.decode("utf-8") for t in self.terms)
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {f"{prefix}.vocab": self.terms, f"{prefix}.vocab_cols": self.cols}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str) -> "SortedVocabulary":
+        # plain ndarray views of the memmaps: same pages, without np.memmap's per-call overhead
+        return cls(np.asarray(arrays[f"{prefix}.vocab"]), np.asarray(arrays[f"{prefix}.vocab_cols"]))
+
+
+# ---------- sparse <-> flat arrays ----------
+def sparse_arrays(prefix: str, m) -> Dict[str, np.ndarray]:
+    return {
+        f"{prefix}.data": m.data,
+        f"{prefix}.indices": m.indices,
+        f"{prefix}.indptr": m.indptr,
+        f"{prefix}.shape": np.asarray(m.shape, dtype=np.int64),
+    }
+
+
+def sparse_from(arrays: Dict[str, np.ndarray], prefix: str, fmt: str = "csr"):
+    cls = csr_matrix if fmt == "csr" else csc_matrix
+    shape = tuple(int(x) for x in arrays[f"{prefix}.shape"])
+    # copy=False keeps the memmaps; scipy only validates, it does not rewrite
+    m = cls(
+        (arrays[f"{prefix}.data"], arrays[f"{prefix}.indices"], arrays[f"{prefix}.indptr"]),
+        shape=shape, copy=False,
+    )
+    m.has_sorted_indices = True
+    return m
+
+
+# ---------- read / write ----------
+def path_for(root: str, key: str) -> str:
+    return os.path.join(root, key)
+
+
+def exists(path: str) -> bool:
+    return os.path.exists(os.path.join(path, META_FILE))
+
+
+def save(path: str, arrays: Dict[str, np.ndarray], meta: Dict) -> None:
+    """Write into a temp dir next to `path`, then rename into place (atomic)."""
+    root = os.path.dirname(os.path.abspath(path)) or "."
+    os.makedirs(root, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".tmp-", dir=root)
+    try:
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(arr), allow_pickle=False)
+        with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({**meta, "format_version": FORMAT_VERSION, "arrays": sorted(arrays)}, f)
+        if exists(path):
+            shutil.rmtree(tmp)        # another worker beat us to it
+            return
+        os.rename(tmp, path)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load(path: str, mmap: bool = True) -> Tuple[Dict[str, np.ndarray], Dict]:
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Snapshot format {meta.get('format_version')} != {FORMAT_VERSION}")
+    mode = "r" if mmap else None
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode, allow_pickle=False)
+        for name in meta["arrays"]
+    }
+    return arrays, meta
+
+
+@contextlib.contextmanager
+def build_lock(path: str) -> Iterator[None]:
+    """Serialize builders of one key so N pre-forked workers build it once."""
+    if fcntl is None:
+        yield
+        return
+    root = os.path.dirname(os.path.abspath(path)) or "."
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, f".{os.path.basename(path)}.lock"), "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
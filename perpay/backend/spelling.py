@@ -0,0 +1,126 @@
+# backend/spelling.py
+# Symmetric-delete (SymSpell) spelling correction over the fitted TF-IDF vocabulary.
+# At build time every term's prefix and all strings within MAX_EDIT deletes of it are
+# hashed into one sorted uint64 array. A misspelled word generates its own deletes, and
+# the terms sharing any of them are the only candidates. Candidates are checked with the
+# real (optimal string alignment) distance and ranked by distance, then document
+# frequency. A lookup is a few dozen hash probes; no vocabulary scan.
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from snapshot import pack_strings, unpack_strings
+
+MAX_EDIT = 2          # words shorter than 8 characters get 1
+PREFIX_LEN = 7        # deletes are generated from the first PREFIX_LEN characters
+MIN_WORD_LEN = 3      # shorter words are never corrected
+
+
+def _deletes(word: str, max_edit: int) -> Set[str]:
+    out: Set[str] = set()
+    frontier = {word}
+    for _ in range(max_edit):
+        nxt = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        nxt -= out
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+def _hash(strings) -> np.ndarray:
+    return pd.util.hash_array(np.asarray(list(strings), dtype=object))
+
+
+def edit_distance(a: str, b: str, max_d: int) -> int:
+    """Optimal string alignment distance, or max_d + 1 once it is certainly above max_d."""
+    if abs(len(a) - len(b)) > max_d:
+        return max_d + 1
+    prev2: Optional[List[int]] = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > max_d:
+            return max_d + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def correctable(word: str) -> bool:
+    return len(word) >= MIN_WORD_LEN and word.isalpha()
+
+
+class SpellIndex:
+    def __init__(self, term_df: Dict[str, int]):
+        """`term_df`: vocabulary term -> document frequency (only alphabetic words are indexed)."""
+        items = sorted((t, int(df)) for t, df in term_df.items() if correctable(t))
+        self.terms: List[str] = [t for t, _ in items]
+        self.df = np.asarray([df for _, df in items], dtype=np.int32)
+        keys: List[str] = []
+        owners: List[int] = []
+        for i, t in enumerate(self.terms):
+            p = t[:PREFIX_LEN]
+            ds = _deletes(p, MAX_EDIT)
+            ds.add(p)
+            keys.extend(ds)
+            owners.extend([i] * len(ds))
+        h = _hash(keys) if keys else np.zeros(0, dtype=np.uint64)
+        order = np.argsort(h, kind="stable")
+        self.del_hash = h[order]
+        self.del_term = np.asarray(owners, dtype=np.int32)[order]
+
+    # ---------- snapshot support ----------
+    def to_arrays(self, prefix: str = "spell") -> Dict[str, np.ndarray]:
+        return {
+            f"{prefix}.terms": pack_strings(self.terms),
+            f"{prefix}.df": self.df,
+            f"{prefix}.del_hash": self.del_hash,
+            f"{prefix}.del_term": self.del_term,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str = "spell") -> "SpellIndex":
+        self = cls.__new__(cls)
+        self.terms = unpack_strings(arrays[f"{prefix}.terms"])
+        self.df = arrays[f"{prefix}.df"]
+        self.del_hash = arrays[f"{prefix}.del_hash"]
+        self.del_term = arrays[f"{prefix}.del_term"]
+        return self
+
+    # ---------- query ----------
+    def correct(self, word: str) -> Optional[str]:
+        """Closest vocabulary term (distance, then frequency), or None when none is close."""
+        if not correctable(word) or not len(self.del_hash):
+            return None
+        max_d = 1 if len(word) < 8 else MAX_EDIT
+        p = word[:PREFIX_LEN]
+        probes = _deletes(p, max_d)
+        probes.add(p)
+        h = _hash(probes)
+        lo = np.searchsorted(self.del_hash, h, side="left")
+        hi = np.searchsorted(self.del_hash, h, side="right")
+        cands = {int(t) for a, b in zip(lo, hi) if b > a for t in self.del_term[a:b]}
+        best = None
+        for i in cands:
+            d = edit_distance(word, self.terms[i], max_d)
+            if d <= max_d:
+                key = (d, -int(self.df[i]), i)
+                if best is None or key < best:
+                    best = key
+        return self.terms[best[2]] if best is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        return {"terms": len(self.terms), "deletes": int(len(self.del_hash)),
+                "bytes": int(self.del_hash.nbytes + self.del_term.nbytes)}
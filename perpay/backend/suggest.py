@@ -0,0 +1,188 @@
+# backend/suggest.py
+# Keystroke autocomplete over product names, brands and categories. No TF-IDF involved.
+# Every completion is indexed under each of its word starts ("apple iphone 15" is found
+# by "app", "iph" and "15"). The index is a sorted array of fixed-width ASCII keys: a
+# prefix is a searchsorted range, which is a flattened trie. Completions rank by a
+# demand + revenue weight (demand_30_days, revenue_30_days; brands and categories
+# sum their products).
+# The 1..SHORT_PREFIX character prefixes match the most entries, so their top
+# completions are precomputed. A lookup therefore only ever scans a narrow range.
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from scoring import topk_order
+from snapshot import pack_strings, unpack_strings
+
+KINDS = ["brand", "category", "product"]
+SUGGEST_COLS = ["brand", "category_name_1", "category_name_2", "category_name_3"]
+WEIGHT_COLS = ["demand_30_days", "revenue_30_days"]
+KEY_BYTES = 24            # keys are truncated; longer prefixes are verified on the text
+MAX_WORD_STARTS = 8       # word starts indexed per completion
+SHORT_PREFIX = 3          # prefixes up to this length are answered from precomputed lists
+MAX_SUGGEST = 20          # completions kept per precomputed prefix (= the largest limit)
+
+
+def _log_share(x: np.ndarray) -> np.ndarray:
+    x = np.log1p(np.clip(np.nan_to_num(x, nan=0.0), 0.0, None))
+    top = x.max() if len(x) else 0.0
+    return x / top if top > 0 else np.zeros_like(x)
+
+
+class SuggestIndex:
+    def __init__(self, df: pd.DataFrame, name_col: str, norm: Callable[[str], str],
+                 column: Optional[Callable[[str], Optional[pd.Series]]] = None):
+        """
+        `norm` is the search normalizer (search._norm_text); `column(col)` returns a column
+        that is not in `df` (e.g. from a CatalogStore), or None.
+        """
+        def get(col: str) -> Optional[pd.Series]:
+            if col in df.columns:
+                return df[col]
+            return column(col) if column is not None else None
+
+        n = len(df)
+        metrics = []
+        for col in WEIGHT_COLS:
+            s = get(col)
+            metrics.append(np.zeros(n) if s is None else pd.to_numeric(s, errors="coerce").fillna(0.0).to_numpy(dtype=float))
+        rows = pd.DataFrame({f"m{j}": m for j, m in enumerate(metrics)})
+
+        frames = []
+        for kind, cols in ((0, SUGGEST_COLS[:1]), (1, SUGGEST_COLS[1:]), (2, [name_col])):
+            for col in cols:
+                s = get(col)
+                if s is None:
+                    continue
+                text = s.astype(object).where(s.notna(), "").astype(str).str.strip()
+                text = text.where(~text.isin(["", "nan"]), "")
+                frames.append(rows.assign(text=text.to_numpy(), kind=kind, row=np.arange(n)))
+        if frames:
+            allv = pd.concat(frames, ignore_index=True)
+            allv = allv[allv["text"] != ""]
+            allv["key"] = allv["text"].map(norm)
+            allv = allv[allv["key"] != ""]
+        else:
+            allv = pd.DataFrame(columns=["text", "kind", "row", "key", "m0", "m1"])
+        # one completion per (kind, normalized text): brands / categories sum their rows,
+        # a product name shared by several rows keeps its best-selling row
+        agg = allv.groupby(["kind", "key"], sort=True).agg(
+            text=("text", "first"), m0=("m0", "sum"), m1=("m1", "sum"))
+        best = allv.sort_values("m0", ascending=False, kind="stable").drop_duplicates(["kind", "key"])
+        agg["row"] = best.set_index(["kind", "key"])["row"].reindex(agg.index).to_numpy()
+        agg = agg.reset_index()
+
+        self.texts: List[str] = agg["text"].tolist()
+        self.norm_texts: List[str] = agg["key"].tolist()
+        self.kinds = agg["kind"].to_numpy(dtype=np.int8)
+        self.rows = np.where(self.kinds == 2, agg["row"].to_numpy(), -1).astype(np.int32)
+        self.weights = (0.5 * _log_share(agg["m0"].to_numpy(dtype=float))
+                        + 0.5 * _log_share(agg["m1"].to_numpy(dtype=float))).astype(np.float32)
+        self._index_keys()
+
+    def _index_keys(self) -> None:
+        keys, targets = [], []
+        for i, t in enumerate(self.norm_texts):
+            words = t.split(" ")
+            pos = 0
+            for w in words[:MAX_WORD_STARTS]:
+                keys.append(t[pos:pos + KEY_BYTES])
+                targets.append(i)
+                pos += len(w) + 1
+        keys_arr = np.asarray([k.encode("ascii", "ignore") for k in keys], dtype=f"S{KEY_BYTES}")
+        order = np.argsort(keys_arr, kind="stable")
+        self.keys = keys_arr[order]
+        self.targets = np.asarray(targets, dtype=np.int32)[order]
+        self.short: Dict[int, Dict[str, np.ndarray]] = {
+            n: self._top_for_prefixes(n) for n in range(1, SHORT_PREFIX + 1)
+        }
+
+    def _top_for_prefixes(self, n: int) -> Dict[str, np.ndarray]:
+        """Every distinct n-character prefix with its best MAX_SUGGEST completions."""
+        long_enough = np.char.str_len(self.keys) >= n
+        pre, tgt = self.keys[long_enough].astype(f"S{n}"), self.targets[long_enough]
+        prefixes, group = np.unique(pre, return_inverse=True)
+        pairs = np.unique(group.astype(np.int64) * max(1, len(self.texts)) + tgt)
+        group, tgt = pairs // max(1, len(self.texts)), (pairs % max(1, len(self.texts))).astype(np.int32)
+        order = np.lexsort((tgt, -self.weights[tgt], group))
+        group, tgt = group[order], tgt[order]
+        keep = (np.arange(len(group)) - np.searchsorted(group, group)) < MAX_SUGGEST
+        counts = np.bincount(group[keep], minlength=len(prefixes))
+        return {
+            "keys": prefixes,
+            "ptr": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            "ids": tgt[keep],
+        }
+
+    # ---------- snapshot support ----------
+    def to_arrays(self, prefix: str = "suggest") -> Dict[str, np.ndarray]:
+        out = {
+            f"{prefix}.texts": pack_strings(self.texts),
+            f"{prefix}.norm_texts": pack_strings(self.norm_texts),
+            f"{prefix}.kinds": self.kinds,
+            f"{prefix}.rows": self.rows,
+            f"{prefix}.weights": self.weights,
+            f"{prefix}.keys": self.keys,
+            f"{prefix}.targets": self.targets,
+        }
+        for n, tab in self.short.items():
+            out.update({f"{prefix}.short{n}.{k}": v for k, v in tab.items()})
+        return out
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str = "suggest") -> "SuggestIndex":
+        self = cls.__new__(cls)
+        self.texts = unpack_strings(arrays[f"{prefix}.texts"])
+        self.norm_texts = unpack_strings(arrays[f"{prefix}.norm_texts"])
+        for name in ("kinds", "rows", "weights", "keys", "targets"):
+            setattr(self, name, arrays[f"{prefix}.{name}"])
+        self.short = {
+            n: {k: arrays[f"{prefix}.short{n}.{k}"] for k in ("keys", "ptr", "ids")}
+            for n in range(1, SHORT_PREFIX + 1)
+        }
+        return self
+
+    # ---------- query ----------
+    def lookup(self, prefix: str, limit: int = 10, kinds: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Completion ids for an already normalized `prefix`, best first."""
+        limit = max(0, min(int(limit), MAX_SUGGEST))
+        if not prefix or not limit:
+            return np.zeros(0, dtype=np.int32)
+        want = None if not kinds else np.isin(self.kinds, [KINDS.index(k) for k in kinds if k in KINDS])
+        p = prefix.encode("ascii", "ignore")
+        if len(p) <= SHORT_PREFIX and want is None:
+            tab = self.short[len(p)]
+            i = int(np.searchsorted(tab["keys"], p))
+            if i == len(tab["keys"]) or tab["keys"][i] != p:
+                return np.zeros(0, dtype=np.int32)
+            return tab["ids"][tab["ptr"][i]:tab["ptr"][i + 1]][:limit]
+        key = p[:KEY_BYTES]
+        lo = int(np.searchsorted(self.keys, key, side="left"))
+        if len(p) < KEY_BYTES:
+            hi = int(np.searchsorted(self.keys, key + b"\xff", side="left"))
+        else:
+            hi = int(np.searchsorted(self.keys, key, side="right"))
+        ids = np.unique(self.targets[lo:hi])
+        if want is not None:
+            ids = ids[want[ids]]
+        if len(p) >= KEY_BYTES:
+            ids = np.asarray([i for i in ids if self.norm_texts[i].startswith(prefix)
+                              or f" {prefix}" in self.norm_texts[i]], dtype=np.int32)
+        return ids[topk_order(self.weights[ids].astype(np.float64), ids, limit)]
+
+    def suggestions(self, ids: np.ndarray) -> List[Dict]:
+        return [
+            {"text": self.texts[i], "type": KINDS[self.kinds[i]], "score": round(float(self.weights[i]), 4)}
+            for i in ids
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "completions": len(self.texts),
+            "keys": int(len(self.keys)),
+            "bytes": int(self.keys.nbytes + self.targets.nbytes
+                         + sum(a.nbytes for tab in self.short.values() for a in tab.values())),
+        }
@@ -1,8 +1,42 @@
 # backend/utils.py
 from __future__ import annotations
-from typing import Iterable, Mapping, Optional, Union, Dict
+from typing import Iterable, Mapping, Optional, Union, Dict, List, Sequence
 import json, numpy as np, pandas as pd
 
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+
+def native_values(s: pd.Series) -> np.ndarray:
+    """
+    Object array of JSON-ready values: numpy scalars unwrapped to int/float/bool/str,
+    NaN/None/NA resolved to None. Index it with row ids and `.tolist()` to get a column
+    of a response without touching the DataFrame.
+    """
+    if s.dtype == np.float32:
+        # shortest repr that round-trips the float32: 19.99 stays 19.99, not 19.989999771118164
+        s = pd.Series(s.to_numpy().astype(str).astype(np.float64), index=s.index)
+    out = s.to_numpy(dtype=object, copy=True)
+    if len(out) and isinstance(out[0], np.generic):
+        out[:] = [v.item() if isinstance(v, np.generic) else v for v in out]
+    out[pd.isna(s).to_numpy()] = None
+    return out
+
+
+def records_from_columns(names: Sequence[str], columns: Sequence[List]) -> List[dict]:
+    """Row dicts from parallel column lists (`names[j]` -> `columns[j][i]`)."""
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def dumps(obj) -> bytes:
+    """Fast JSON bytes (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
 def topn_df_to_json_map(
     df: pd.DataFrame,
     n: int = 10,
@@ -18,14 +52,12 @@ def topn_df_to_json_map(
         raise ValueError(f"Missing key_col '{key_col}' in DataFrame.")
     if len(cols) == 1:
         raise ValueError("No value columns found from `include` in DataFrame.")
-    sub = df[cols].head(n).copy()
-    if rename:
-        sub = sub.rename(columns=rename)
-    sub = sub.where(pd.notna(sub), None)
-    def _to_native(v):
-        return v.item() if isinstance(v, np.generic) else v
-    sub = sub.applymap(_to_native)
-    out = {str(row[key_col]): {k: row[k] for k in sub.columns if k != key_col} for _, row in sub.iterrows()}
+    sub = df[cols].head(n)
+    # column-wise native conversion; no applymap / iterrows
+    keys = [str(k) for k in native_values(sub.iloc[:, 0]).tolist()]
+    names = [(rename or {}).get(c, c) for c in cols[1:]]
+    values = [native_values(sub.iloc[:, j]).tolist() for j in range(1, len(cols))]
+    out = {k: row for k, row in zip(keys, records_from_columns(names, values))}
     if write_path:
         with open(write_path, "w", encoding="utf-8") as f:
             json.dump(out, f, ensure_ascii=False, indent=2)
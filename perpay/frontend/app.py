@@ -17,10 +17,15 @@ st.set_page_config(page_title="LLM + Cosine Search", page_icon="🛍️", layout
 st.title("🛍️ LLM-powered Product Finder")
 st.caption("We parse your intent, derive an object and three terms, filter by taxonomy/type, then rank by cosine + business weights.")
 
-# ---- Discover taxonomy from backend
-tax = {"category_name_1": [], "category_name_2": [], "category_name_3": [], "brand": []}
+# ---- Discover taxonomy from backend (conditional GET: 304 while the catalog is unchanged)
+tax = st.session_state.get("taxonomy") or {"category_name_1": [], "category_name_2": [], "category_name_3": [], "brand": []}
 try:
-    tax = requests.get(f"{BACKEND_URL}/taxonomy", timeout=10).json()
+    etag = st.session_state.get("taxonomy_etag")
+    resp = requests.get(f"{BACKEND_URL}/taxonomy", headers={"If-None-Match": etag} if etag else {}, timeout=10)
+    if resp.status_code == 200:
+        tax = resp.json()
+        st.session_state["taxonomy"] = tax
+        st.session_state["taxonomy_etag"] = resp.headers.get("ETag")
 except Exception:
     pass
 